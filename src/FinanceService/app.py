@@ -1,104 +1,402 @@
 import sys
+import os
+import io
 import json
-from flask import Flask, jsonify, request
+import logging
+from flask import Flask, jsonify, request, Response, stream_with_context
 import asyncio
+import grpc
 import websockets
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+import multiprocessing
+import signal
+import threading
 from threading import Thread
 from pymongo import MongoClient
+from pymongo.collation import Collation
+from pymongo.write_concern import WriteConcern
 from bson import ObjectId
+from bson.errors import InvalidId
+from async_mongo import AsyncCollection, get_executor
+from contributions import ContributionEngine, ContributionBatcher
+from rooms import GroupRooms
+from pubsub import RedisBackbone
+from summaries import summary_update, serialize_summary, valid_amount, valid_transaction_type
+import bulk_ingest
+import rollups
+from status_monitor import StatusMonitor, PoolMonitor
+from ttl_cache import TTLCache
+import protocol
+from protocol import ProtocolError
+from event_log import SampledLog
+import tracing
 
 # Initialize Flask app
 app = Flask(__name__)
+logging.basicConfig(level=logging.INFO)
+# websockets logs every connection opened and closed at INFO
+logging.getLogger('websockets').setLevel(logging.WARNING)
+
+# Per-request traces and the /debug endpoints, when enabled (see tracing.py)
+tracing.init_flask(app)
+
+# Tracks the connection usage of both Mongo clients for /status
+pool_monitor = PoolMonitor()
 
 # MongoDB connection to the Finances database
-finance_client = MongoClient('mongodb://localhost:27017/')
+finance_client = MongoClient('mongodb://localhost:27017/', event_listeners=[pool_monitor] + tracing.mongo_listeners())
 finance_db = finance_client['finances']
 contributions_collection = finance_db['transactions']
 groups_collection = finance_db['groups']
+summaries_collection = finance_db['summaries']
+rollups_collection = finance_db['rollups']
 
 # MongoDB connection to the Users database (separate)
-user_client = MongoClient('mongodb://localhost:27017/')
+user_client = MongoClient('mongodb://localhost:27017/', event_listeners=[pool_monitor] + tracing.mongo_listeners())
 user_db = user_client['users']
 users_collection = user_db['users']
 
-# Get ports from command-line arguments
-http_port = int(sys.argv[1]) if len(sys.argv) > 1 else 5003  # Default HTTP port
-websocket_port = int(sys.argv[2]) if len(sys.argv) > 2 else 5001  # Default WebSocket port
+# Awaitable wrappers used by the WebSocket server so Mongo I/O never blocks its event loop
+async_contributions = AsyncCollection(contributions_collection)
+async_groups = AsyncCollection(groups_collection)
+async_summaries = AsyncCollection(summaries_collection)
+async_rollups = AsyncCollection(rollups_collection)
+async_users = AsyncCollection(users_collection)
+
+# Write-behind batching of contributions, off by default. When enabled,
+# contributions are flushed every CONTRIBUTION_BATCH_SIZE events or
+# CONTRIBUTION_BATCH_MS milliseconds, whichever comes first, and only confirmed
+# to the client once the batch is acknowledged with a journaled write.
+CONTRIBUTION_BATCHING = os.getenv('CONTRIBUTION_BATCHING', '0') == '1'
+CONTRIBUTION_BATCH_SIZE = int(os.getenv('CONTRIBUTION_BATCH_SIZE', 500))
+CONTRIBUTION_BATCH_MS = float(os.getenv('CONTRIBUTION_BATCH_MS', 20))
+
+# Records contributions and updates group totals atomically
+if CONTRIBUTION_BATCHING:
+    durable = WriteConcern(w=1, j=True)
+    contribution_engine = ContributionBatcher(
+        AsyncCollection(contributions_collection.with_options(write_concern=durable)),
+        AsyncCollection(groups_collection.with_options(write_concern=durable)),
+        AsyncCollection(summaries_collection.with_options(write_concern=durable)),
+        max_batch=CONTRIBUTION_BATCH_SIZE,
+        max_delay=CONTRIBUTION_BATCH_MS / 1000.0,
+        rollups=AsyncCollection(rollups_collection.with_options(write_concern=durable))
+    )
+else:
+    contribution_engine = ContributionEngine(async_contributions, async_groups, async_summaries, async_rollups)
+
+# Sockets that joined each group, used to push group totals to every member
+group_rooms = GroupRooms()
+
+# Number of WebSocket worker processes. With more than one, the workers share
+# the WebSocket port through SO_REUSEPORT (or listen on consecutive ports when
+# WEBSOCKET_REUSE_PORT=0) and exchange group updates over Redis pub/sub.
+WEBSOCKET_WORKERS = int(os.getenv('WEBSOCKET_WORKERS', 1))
+WEBSOCKET_REUSE_PORT = os.getenv('WEBSOCKET_REUSE_PORT', '1') == '1'
+GROUP_UPDATES_REDIS_URL = os.getenv('GROUP_UPDATES_REDIS_URL', 'redis://localhost:6379/0')
+
+# Usernames are matched case-insensitively through this collation and the
+# index created with it in ensure_indexes
+USERNAME_COLLATION = Collation(locale='en', strength=2)
+
+# Cache of the username -> user_id and group_name -> group_id lookups done on
+# every WebSocket join. Entries expire after JOIN_CACHE_TTL seconds, which
+# bounds how long a renamed or deleted user or group can still be resolved.
+JOIN_CACHE_TTL = float(os.getenv('JOIN_CACHE_TTL', 60))
+JOIN_CACHE_SIZE = int(os.getenv('JOIN_CACHE_SIZE', 100000))
+user_id_cache = TTLCache(JOIN_CACHE_SIZE, JOIN_CACHE_TTL)
+group_id_cache = TTLCache(JOIN_CACHE_SIZE, JOIN_CACHE_TTL)
+
+# With USER_SERVICE_TARGETS set (comma-separated host:port of the
+# UserService gRPC endpoints), users are resolved through UserService instead
+# of reading its database. user_client.py and the generated stubs are copies
+# of UserService's (test_shared_modules.py keeps them identical). UserService
+# matches usernames exactly.
+USER_SERVICE_TARGETS = os.getenv('USER_SERVICE_TARGETS')
+if USER_SERVICE_TARGETS:
+    from user_client import get_client
+    user_service = get_client([t.strip() for t in USER_SERVICE_TARGETS.split(',') if t.strip()])
+else:
+    user_service = None
+
+# UserService failed to answer a lookup (after the client's retries)
+class UserServiceUnavailable(Exception):
+    pass
+
+async def find_user_id(username):
+    if user_service is not None:
+        # The client blocks, so it runs on the Mongo executor
+        try:
+            user = await asyncio.get_running_loop().run_in_executor(
+                get_executor(), tracing.bind(user_service.get_user), username
+            )
+        except grpc.RpcError as e:
+            logging.warning(f"UserService lookup of {username!r} failed: {e.code()}")
+            raise UserServiceUnavailable(e.code())
+        return ObjectId(user.user_id) if user else None
+    user = await async_users.find_one({"username": username}, {"_id": True}, collation=USERNAME_COLLATION)
+    return user['_id'] if user else None
+
+async def resolve_user_id(username):
+    key = username.lower() if user_service is None else username
+    user_id = user_id_cache.get(key)
+    if user_id is None:
+        user_id = await find_user_id(username)
+        if not user_id:
+            return None
+        user_id_cache.set(key, user_id)
+    return user_id
+
+async def resolve_group_id(group_name):
+    group_id = group_id_cache.get(group_name)
+    if group_id is None:
+        group = await async_groups.find_one({"group_name": group_name}, {"_id": True})
+        if not group:
+            return None
+        group_id = group['_id']
+        group_id_cache.set(group_name, group_id)
+    return group_id
+
+# Open WebSocket connections in this process
+active_websockets = 0
 
-# WebSocket handler function for group saving goals
+# Default ports, overridden by the command-line arguments when run as a script
+http_port = int(os.getenv('PORT', 5003))
+websocket_port = 5001
+
+# permessage-deflate for the WebSocket frames: 'deflate' (the default) or
+# 'none'. Frames of a few dozen bytes barely shrink, while every compressed
+# socket keeps its own zlib state (see bench_protocol.py); the window bits and
+# memory level trade compression ratio for memory per socket.
+WEBSOCKET_COMPRESSION = os.getenv('WEBSOCKET_COMPRESSION', 'deflate')
+WEBSOCKET_DEFLATE_WINDOW_BITS = int(os.getenv('WEBSOCKET_DEFLATE_WINDOW_BITS', 12))
+WEBSOCKET_DEFLATE_MEM_LEVEL = int(os.getenv('WEBSOCKET_DEFLATE_MEM_LEVEL', 5))
+
+# Keyword arguments of websockets.serve for the group-savings server: the
+# subprotocols it accepts (see protocol.py) and its compression
+def websocket_server_options(compression=None):
+    compression = compression or WEBSOCKET_COMPRESSION
+    options = {'subprotocols': protocol.SUBPROTOCOLS, 'compression': None}
+    if compression == 'deflate':
+        options['extensions'] = [ServerPerMessageDeflateFactory(
+            server_max_window_bits=WEBSOCKET_DEFLATE_WINDOW_BITS,
+            client_max_window_bits=WEBSOCKET_DEFLATE_WINDOW_BITS,
+            compress_settings={'memLevel': WEBSOCKET_DEFLATE_MEM_LEVEL}
+        )]
+    elif compression != 'none':
+        raise ValueError(f"WEBSOCKET_COMPRESSION must be 'deflate' or 'none', not {compression!r}")
+    return options
+
+# Fraction of the WebSocket events (joins, contributions, disconnects,
+# rejected messages) that are logged
+WEBSOCKET_LOG_SAMPLE_RATE = float(os.getenv('WEBSOCKET_LOG_SAMPLE_RATE', 0.01))
+websocket_log = SampledLog(logging.getLogger('finance.websocket'), WEBSOCKET_LOG_SAMPLE_RATE)
+
+# WebSocket handler function for group saving goals. Every socket speaks the
+# protocol it negotiated, JSON text frames by default (see protocol.py). Each
+# message is traced on its own, under the trace_id it carries if any.
 async def group_saving_goal_handler(websocket, path):
+    global active_websockets
+    codec = protocol.codec_for(websocket.subprotocol)
     username = None
     group_name = None
+    group_id = None
+    active_websockets += 1
     
     try:
         async for message in websocket:
-            data = json.loads(message)  # Parse JSON instead of using eval
-            print(f"Received message: {data}")
-
-            if data['event'] == 'join':
-                username = data['username']
-                group_name = data['group_name']
-
-                user = users_collection.find_one({"username": {"$regex": f"^{username}$", "$options": "i"}})
-                if not user:
-                    await websocket.send(f"User {username} not found!")
-                    continue
-                user_id = user['_id']
-
-                group = groups_collection.find_one({"group_name": group_name})
-                if not group:
-                    await websocket.send(f"Group {group_name} not found!")
-                    continue
-                group_id = group['_id']
-
-                print(f"User {username} joined group {group_name}")
-                await websocket.send(f"User {username} joined group {group_name}")
+            try:
+                data = codec.decode(message)
+            except ProtocolError as e:
+                websocket_log.log('ws.rejected', logging.WARNING, error=str(e))
+                await websocket.send(codec.error(protocol.BAD_MESSAGE, str(e)))
+                continue
+            event = data.get('event')
+
+            with tracing.tracer.trace(f'ws.{event}', data.get('trace_id')):
+                if event == 'join':
+                    try:
+                        new_user_id = await resolve_user_id(data['username'])
+                    except UserServiceUnavailable:
+                        await websocket.send(codec.error(protocol.SERVICE_UNAVAILABLE,
+                                                         "Users can't be looked up right now, try again shortly."))
+                        continue
+                    if not new_user_id:
+                        await websocket.send(codec.error(protocol.USER_NOT_FOUND, f"User {data['username']} not found!"))
+                        continue
+
+                    new_group_id = await resolve_group_id(data['group_name'])
+                    if not new_group_id:
+                        await websocket.send(codec.error(protocol.GROUP_NOT_FOUND, f"Group {data['group_name']} not found!"))
+                        continue
+
+                    # Switching groups moves the socket to the new group's room
+                    if group_id is not None:
+                        group_rooms.leave(str(group_id), websocket)
+
+                    username = data['username']
+                    group_name = data['group_name']
+                    user_id = new_user_id
+                    group_id = new_group_id
+                    group_rooms.join(str(group_id), websocket)
+
+                    websocket_log.log('ws.join', username=username, group=group_name, protocol=codec.subprotocol)
+                    await websocket.send(codec.joined(username, group_name))
             
-            elif data['event'] == 'contribute':
-                amount = data['amount']
-
-                if not username or not group_name:
-                    await websocket.send("You must join a group first.")
-                    continue
-
-                print(f"User {username} contributed {amount} to group {group_name}")
-
-                contribution = {
-                    'user_id': user_id,
-                    'group_id': group_id,
-                    'amount': amount
-                }
-                contributions_collection.insert_one(contribution)
-
-                group = groups_collection.find_one({"_id": group_id})
-                if group:
-                    new_current_amount = group['current_amount'] + amount
-                    groups_collection.update_one(
-                        {"_id": group_id},
-                        {"$set": {"current_amount": new_current_amount}}
-                    )
-                    print(f"Updated group {group_name}'s current amount to {new_current_amount}")
-
-                await websocket.send(f"User {username} contributed {amount} to the group saving goal!")
+                elif event == 'contribute':
+                    amount = data.get('amount')
+
+                    if not username or not group_name:
+                        await websocket.send(codec.error(protocol.NOT_IN_GROUP, "You must join a group first."))
+                        continue
+                    if not valid_amount(amount) or amount <= 0:
+                        await websocket.send(codec.error(protocol.BAD_MESSAGE, "The amount must be a positive number."))
+                        continue
+
+                    new_current_amount = await contribution_engine.contribute(user_id, group_id, amount)
+                    if new_current_amount is None:
+                        # The group is gone; don't keep resolving its name to it
+                        group_id_cache.invalidate(group_name)
+                    else:
+                        update = {
+                            'event': 'group_update',
+                            'group_name': group_name,
+                            'username': username,
+                            'amount': amount,
+                            'current_amount': new_current_amount
+                        }
+                        trace_id = tracing.current_trace_id()
+                        if trace_id is not None:
+                            update['trace_id'] = trace_id
+                        group_rooms.publish(str(group_id), update)
+                    websocket_log.log('ws.contribute', username=username, group=group_name, amount=amount,
+                                      current_amount=new_current_amount)
+
+                    await websocket.send(codec.contributed(username, amount, new_current_amount))
     
     except websockets.exceptions.ConnectionClosed as e:
-        print(f"User {username} disconnected from group {group_name}")
+        websocket_log.log('ws.disconnect', username=username, group=group_name, code=e.code)
+    finally:
+        active_websockets -= 1
+        if group_id is not None:
+            group_rooms.leave(str(group_id), websocket)
+
+# Seconds the WebSocket workers get to close their connections on shutdown
+SHUTDOWN_GRACE = float(os.getenv('SHUTDOWN_GRACE', 10))
 
-# Function to run the WebSocket server in its own thread
-def run_websocket_server():
-    print(f"Starting WebSocket server on port {websocket_port}...")
-    asyncio.set_event_loop(asyncio.new_event_loop())
-    start_server = websockets.serve(group_saving_goal_handler, "localhost", websocket_port)
-    asyncio.get_event_loop().run_until_complete(start_server)
-    print(f"WebSocket server running on ws://localhost:{websocket_port}")
-    asyncio.get_event_loop().run_forever()
+# Function to run the WebSocket server in its own thread. When it runs on the
+# main thread of a process, SIGTERM closes the listener, closes every socket
+# with 1001 (going away) and returns once their handlers have finished, so
+# contributions in flight are still written and confirmed.
+def run_websocket_server(port=None, reuse_port=False):
+    port = port or websocket_port
+    print(f"Starting WebSocket server on port {port}...")
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(group_rooms.start())
+    server = loop.run_until_complete(
+        websockets.serve(group_saving_goal_handler, "localhost", port, reuse_port=reuse_port,
+                         **websocket_server_options())
+    )
+    print(f"WebSocket server running on ws://localhost:{port}")
+    if threading.current_thread() is not threading.main_thread():
+        loop.run_forever()
+        return
+    loop.add_signal_handler(signal.SIGTERM, server.close)
+    # No /debug endpoints in this process; SIGUSR2 toggles the profiler
+    tracing.install_profiler_signal()
+    loop.run_until_complete(server.wait_closed())
+    if group_rooms.backbone is not None:
+        loop.run_until_complete(group_rooms.backbone.close())
+    print(f"WebSocket server on port {port} stopped")
+
+# Entry point of one WebSocket worker process
+def run_websocket_worker(port, reuse_port, redis_url):
+    group_rooms.backbone = RedisBackbone(redis_url)
+    run_websocket_server(port, reuse_port)
+
+# Start the WebSocket workers as separate processes. They are spawned rather
+# than forked so each one opens its own Mongo connections.
+def start_websocket_workers(workers):
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    for i in range(workers):
+        port = websocket_port if WEBSOCKET_REUSE_PORT else websocket_port + i
+        process = context.Process(
+            target=run_websocket_worker,
+            args=(port, WEBSOCKET_REUSE_PORT, GROUP_UPDATES_REDIS_URL),
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+# The WebSocket tier on its own, run until SIGTERM: the entry point of the
+# side process gunicorn.conf.py starts next to the HTTP workers
+def serve_websockets():
+    ensure_indexes()
+    if WEBSOCKET_WORKERS <= 1:
+        run_websocket_server()
+        return
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    workers = start_websocket_workers(WEBSOCKET_WORKERS)
+    stop.wait()
+    # Each worker drains its own connections
+    for process in workers:
+        process.terminate()
+    for process in workers:
+        process.join(SHUTDOWN_GRACE)
+
+# Indexes the queries below rely on, created at startup
+def ensure_indexes():
+    # Keyset pagination of a user's transactions
+    contributions_collection.create_index([('user_id', 1), ('_id', 1)])
+    # A user's transactions by time
+    contributions_collection.create_index([('user_id', 1), ('ts', 1)])
+    # Rollup upserts and range queries, one bucket per document
+    rollups_collection.create_index([('scope', 1), ('owner_id', 1), ('period', 1), ('start', 1)], unique=True)
+    # Case-insensitive username lookups and group lookups on WebSocket join
+    users_collection.create_index('username', collation=USERNAME_COLLATION, name='username_ci')
+    groups_collection.create_index('group_name')
+    # Idempotent bulk imports
+    contributions_collection.create_index(
+        'import_key', unique=True, partialFilterExpression={'import_key': {'$exists': True}}
+    )
+
+# Seconds between refreshes of the transaction count reported by /status
+STATUS_REFRESH_INTERVAL = float(os.getenv('STATUS_REFRESH_INTERVAL', 10))
+
+# Serves /status from memory; the transaction count is refreshed in the
+# background. The WebSocket metrics only cover this process, so they read 0
+# when the WebSocket tier runs in separate worker processes.
+status_monitor = StatusMonitor(contributions_collection, STATUS_REFRESH_INTERVAL)
+status_monitor.add_gauge('active_websockets', lambda: active_websockets)
+status_monitor.add_gauge('group_room_members', lambda: group_rooms.connections)
+status_monitor.add_gauge('pending_contribution_writes', lambda: contribution_engine.pending)
+status_monitor.add_gauge('mongo_connections_open', lambda: pool_monitor.open_connections)
+status_monitor.add_gauge('mongo_connections_in_use', lambda: pool_monitor.checked_out)
+status_monitor.add_gauge('mongo_max_pool_size', lambda: finance_client.options.pool_options.max_pool_size)
 
 # REST Endpoints for Transactions and Status
 
+# Health probe. total_transactions is an estimate refreshed every
+# STATUS_REFRESH_INTERVAL seconds; ?exact=1 counts the collection instead.
 @app.route('/status', methods=['GET'])
 def status():
-    total_transactions = contributions_collection.count_documents({})
-    return jsonify({'status': f'Finance Service is running on HTTP port {http_port}', 'total_transactions': total_transactions}), 200
+    if request.args.get('exact') in ('1', 'true'):
+        total_transactions = contributions_collection.count_documents({})
+        estimated = False
+    else:
+        total_transactions = status_monitor.transactions_estimate
+        estimated = True
+    return jsonify({
+        'status': f'Finance Service is running on HTTP port {http_port}',
+        'total_transactions': total_transactions,
+        'total_transactions_estimated': estimated,
+        'total_transactions_refreshed_at': status_monitor.refreshed_at,
+        'metrics': status_monitor.metrics()
+    }), 200
 
 @app.route('/transactions', methods=['POST'])
 def create_transaction():
@@ -110,35 +408,176 @@ def create_transaction():
 
     if not user_id or not amount or not transaction_type:
         return jsonify({'error': 'Missing required fields'}), 400
+    # Checked before anything is written, so the summary and rollups can't
+    # miss a stored transaction
+    if not valid_amount(amount):
+        return jsonify({'error': 'amount must be a number'}), 400
+    if not valid_transaction_type(transaction_type):
+        return jsonify({'error': "transaction_type can't contain '.' or start with '$'"}), 400
+    try:
+        user_id = ObjectId(user_id)
+    except (InvalidId, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
 
     transaction = {
-        'user_id': ObjectId(user_id),
+        'user_id': user_id,
         'amount': amount,
         'transaction_type': transaction_type,
-        'description': description
+        'description': description,
+        'ts': rollups.timestamp()
     }
     
     contributions_collection.insert_one(transaction)
+    summaries_collection.update_one(
+        {'_id': transaction['user_id']}, summary_update(amount, transaction_type), upsert=True
+    )
+    rollups_collection.bulk_write(rollups.rollup_updates([transaction]), ordered=False)
     
     return jsonify({'message': 'Transaction created successfully'}), 201
 
+# Bulk import of transactions from a JSON array or an NDJSON stream
+# (Content-Type: application/x-ndjson). Invalid rows are reported by row number
+# without failing the rest. Retrying an upload with the same Idempotency-Key
+# header skips the rows that were already stored.
+@app.route('/transactions/bulk', methods=['POST'])
+def create_transactions_bulk():
+    if request.mimetype == 'application/x-ndjson':
+        # Buffered so lines aren't read from the request stream byte by byte
+        rows = bulk_ingest.parse_ndjson(io.BufferedReader(request.stream, 1 << 16))
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({'error': 'Body must be a JSON array or NDJSON'}), 400
+
+    result = bulk_ingest.ingest(rows, contributions_collection, summaries_collection,
+                                request.headers.get('Idempotency-Key'), rollups=rollups_collection)
+    return jsonify(result), 200
+
+# Page size of /transactions/<user_id> when no limit is given, and its upper bound
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Only the fields returned to the client are read from Mongo
+TRANSACTION_PROJECTION = {'amount': True, 'transaction_type': True, 'description': True}
+
+def serialize_transaction(t):
+    # Contributions made over the WebSocket have no type or description
+    return {'id': str(t['_id']), 'amount': t['amount'], 'type': t.get('transaction_type'), 'description': t.get('description')}
+
+# Transactions are returned oldest first, one page at a time: pass the
+# next_after value of a page as ?after= to get the next one. With
+# ?format=ndjson the transactions are streamed one JSON object per line
+# straight from the cursor instead (all of them unless ?limit= is given).
 @app.route('/transactions/<user_id>', methods=['GET'])
 def get_transactions(user_id):
     try:
-        transactions = list(contributions_collection.find({'user_id': ObjectId(user_id)}))
-        if transactions:
-            transaction_list = [{'id': str(t['_id']), 'amount': t['amount'], 'type': t['transaction_type'], 'description': t['description']} for t in transactions]
-            return jsonify({'transactions': transaction_list}), 200
+        query = {'user_id': ObjectId(user_id)}
+        after = request.args.get('after')
+        if after:
+            query['_id'] = {'$gt': ObjectId(after)}
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+    except InvalidId as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        cursor = contributions_collection.find(query, TRANSACTION_PROJECTION).sort('_id', 1)
+
+        if request.args.get('format') == 'ndjson':
+            if limit:
+                cursor = cursor.limit(limit)
+
+            def generate():
+                for t in cursor.batch_size(DEFAULT_PAGE_SIZE):
+                    yield json.dumps(serialize_transaction(t)) + '\n'
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        transaction_list = [serialize_transaction(t) for t in cursor.limit(limit)]
+        if transaction_list or after:
+            next_after = transaction_list[-1]['id'] if len(transaction_list) == limit else None
+            return jsonify({'transactions': transaction_list, 'next_after': next_after}), 200
         else:
             return jsonify({'error': 'No transactions found for this user'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Totals per user and per transaction type, read from the user's summary document
+@app.route('/transactions/<user_id>/summary', methods=['GET'])
+def get_transaction_summary(user_id):
+    try:
+        summary = summaries_collection.find_one({'_id': ObjectId(user_id)})
+    except InvalidId as e:
+        return jsonify({'error': str(e)}), 400
+    if summary:
+        return jsonify(serialize_summary(summary)), 200
+    else:
+        return jsonify({'error': 'No transactions found for this user'}), 404
+
+# Most buckets returned by one rollup query
+MAX_ROLLUP_BUCKETS = 1000
+
+# Totals per day or per month (?period=day|month, month by default) read from
+# the rollups, so the cost grows with the number of buckets rather than the
+# transactions in the range. ?from= and ?to= take YYYY-MM-DD or YYYY-MM and
+# are rounded down to the start of their bucket; the range includes the from
+# bucket but not the to bucket. Only buckets with transactions are listed,
+# oldest first, at most ?limit= of them: pass next_from as ?from= to continue.
+def rollup_range(scope, owner_id):
+    period = request.args.get('period', 'month')
+    if period not in rollups.PERIODS:
+        return jsonify({'error': f"period must be one of {', '.join(rollups.PERIODS)}"}), 400
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    limit = min(limit or MAX_ROLLUP_BUCKETS, MAX_ROLLUP_BUCKETS)
+    try:
+        owner = ObjectId(owner_id)
+        start, end = (rollups.parse_bucket(request.args[name], period) if name in request.args else None
+                      for name in ('from', 'to'))
+    except (InvalidId, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    buckets = rollups.find_range(rollups_collection, scope, owner, period, start, end, limit + 1)
+    next_from = None
+    if len(buckets) > limit:
+        next_from = buckets[limit]['start'].date().isoformat()
+        buckets = buckets[:limit]
+    return jsonify({
+        'period': period,
+        'buckets': [rollups.serialize_rollup(b) for b in buckets],
+        'next_from': next_from
+    }), 200
+
+# A user's spending and income over time
+@app.route('/transactions/<user_id>/rollups', methods=['GET'])
+def get_transaction_rollups(user_id):
+    return rollup_range('user', user_id)
+
+# A group's contributions over time
+@app.route('/groups/<group_id>/rollups', methods=['GET'])
+def get_group_rollups(group_id):
+    return rollup_range('group', group_id)
+
 # Main function to start both Flask and WebSocket servers
 if __name__ == "__main__":
-    # Start the WebSocket server in a separate thread
-    websocket_thread = Thread(target=run_websocket_server)
-    websocket_thread.start()
+    # Get ports from command-line arguments
+    if len(sys.argv) > 1:
+        http_port = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        websocket_port = int(sys.argv[2])
+
+    ensure_indexes()
+    status_monitor.start()
+
+    if WEBSOCKET_WORKERS > 1:
+        # Start the WebSocket workers in their own processes
+        websocket_workers = start_websocket_workers(WEBSOCKET_WORKERS)
+    else:
+        # Start the WebSocket server in a separate thread
+        websocket_thread = Thread(target=run_websocket_server)
+        websocket_thread.start()
 
     # Start the Flask HTTP server on the provided HTTP port
     app.run(port=http_port)
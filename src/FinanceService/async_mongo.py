@@ -0,0 +1,63 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import tracing
+
+# Blocking pymongo calls are run on this thread pool so they never stall the
+# WebSocket event loop. Its size bounds how many Mongo operations the WebSocket
+# server can have in flight at once, so keep it at or below pymongo's
+# connection pool size (maxPoolSize, 100 by default).
+MONGO_EXECUTOR_WORKERS = int(os.getenv('MONGO_EXECUTOR_WORKERS', 32))
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MONGO_EXECUTOR_WORKERS, thread_name_prefix='mongo-io')
+    return _executor
+
+
+class AsyncCollection:
+    """Awaitable wrapper around a pymongo collection.
+
+    Every method mirrors the pymongo method of the same name but runs it on
+    the bounded Mongo executor and returns its result to the awaiting coroutine.
+    """
+
+    def __init__(self, collection, executor=None):
+        self.collection = collection
+        self._executor = executor
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor or get_executor(), tracing.bind(partial(fn, *args, **kwargs)))
+
+    async def find_one(self, *args, **kwargs):
+        return await self._run(self.collection.find_one, *args, **kwargs)
+
+    async def find_list(self, filter, limit=0, **kwargs):
+        # Cursors are iterated on the executor as well, so only materialized
+        # results ever reach the event loop
+        return await self._run(lambda: list(self.collection.find(filter, **kwargs).limit(limit)))
+
+    async def insert_one(self, *args, **kwargs):
+        return await self._run(self.collection.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await self._run(self.collection.insert_many, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await self._run(self.collection.update_one, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return await self._run(self.collection.find_one_and_update, *args, **kwargs)
+
+    async def bulk_write(self, *args, **kwargs):
+        return await self._run(self.collection.bulk_write, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return await self._run(self.collection.count_documents, *args, **kwargs)
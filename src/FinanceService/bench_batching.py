@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import time
+
+from async_mongo import AsyncCollection
+from bench_support import mongo_database, standin_collection, print_table
+from contributions import ContributionEngine, ContributionBatcher
+
+# Compares contribute throughput and Mongo operation counts with write-behind
+# batching off (ContributionEngine) and on (ContributionBatcher).
+#
+#   python bench_batching.py --events 20000 --producers 2000 --groups 10
+
+
+async def drive(engine, args, group_ids):
+    # Each producer stands in for one connected socket contributing in a loop
+    per_producer = args.events // args.producers
+
+    async def producer(index):
+        for _ in range(per_producer):
+            await engine.contribute(f'user{index}', group_ids[index % len(group_ids)], 1)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(producer(i) for i in range(args.producers)))
+    return per_producer * args.producers, time.perf_counter() - start
+
+
+def run_mode(batching, args):
+    db = mongo_database('bench_batching', args.mongo_uri)
+    for name in db.list_collection_names():
+        db[name].drop()
+    group_ids = db['groups'].insert_many([{'group_name': f'group{i}', 'current_amount': 0} for i in range(args.groups)]).inserted_ids
+
+    groups = standin_collection(db, 'groups', args.latency_ms, args.mongo_uri)
+    contributions = standin_collection(db, 'transactions', args.latency_ms, args.mongo_uri)
+    if batching:
+        engine = ContributionBatcher(AsyncCollection(contributions), AsyncCollection(groups),
+                                     max_batch=args.batch_size, max_delay=args.batch_ms / 1000.0)
+    else:
+        engine = ContributionEngine(AsyncCollection(contributions), AsyncCollection(groups))
+
+    events, elapsed = asyncio.run(drive(engine, args, group_ids))
+
+    total = sum(g['current_amount'] for g in db['groups'].find())
+    assert total == events, f"lost updates: {total} != {events}"
+    # Operation counts are only tracked by the stand-in
+    ops = getattr(groups, 'calls', 0) + getattr(contributions, 'calls', 0)
+    return events, elapsed, ops
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Contribution batching benchmark')
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--producers', type=int, default=2000)
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--batch-ms', type=float, default=20)
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='simulated Mongo round trip')
+    parser.add_argument('--mongo-uri', help='benchmark against a real Mongo instead of the stand-in')
+    args = parser.parse_args()
+
+    rows = []
+    for batching in (False, True):
+        events, elapsed, ops = run_mode(batching, args)
+        rows.append(('on' if batching else 'off', events, f"{events / elapsed:.0f}",
+                     ops or 'n/a', f"{ops / elapsed:.0f}" if ops else 'n/a'))
+
+    print(f"simulated Mongo latency: {args.latency_ms} ms, batch: {args.batch_size} events / {args.batch_ms} ms")
+    print_table(('batching', 'events', 'events/s', 'mongo ops', 'mongo ops/s'), rows)
+
+
+if __name__ == '__main__':
+    main()
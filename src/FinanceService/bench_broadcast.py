@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+
+import websockets
+
+from bench_support import percentile, raise_fd_limit, print_table
+from rooms import GroupRooms
+
+# Fan-out benchmark for GroupRooms: one room with many real WebSocket
+# subscribers, spread over several client processes, receives a series of
+# group updates. Each frame carries its publish time so clients can report how
+# long they waited for it. A fraction of the clients read slowly to check that
+# they don't hold up everyone else.
+#
+#   python bench_broadcast.py --subscribers 10000 --updates 20 --slow 0.01
+
+
+def client_process(port, count, first_index, args, results):
+    raise_fd_limit(count + 256)
+
+    async def subscriber(index, latencies, connect_limit):
+        slow = args.slow and index % int(1 / args.slow) == 0
+        async with connect_limit:
+            ws = await websockets.connect(f"ws://127.0.0.1:{port}", open_timeout=120)
+        received = 0
+        try:
+            while True:
+                frame = json.loads(await ws.recv())
+                received += 1
+                if not slow:
+                    latencies.append(time.time() - frame['sent_at'])
+                else:
+                    await asyncio.sleep(args.slow_delay_ms / 1000.0)
+                if frame['seq'] == args.updates - 1:
+                    return slow, received
+        finally:
+            await ws.close()
+
+    async def run():
+        latencies = []
+        connect_limit = asyncio.Semaphore(100)
+        outcomes = await asyncio.gather(*(subscriber(first_index + i, latencies, connect_limit) for i in range(count)))
+        slow_frames = [received for slow, received in outcomes if slow]
+        results.put((latencies, slow_frames))
+
+    asyncio.run(run())
+
+
+async def publish_updates(args, ready):
+    rooms = GroupRooms()
+
+    async def handler(websocket, path):
+        rooms.join('bench_group', websocket)
+        try:
+            await websocket.wait_closed()
+        finally:
+            rooms.leave('bench_group', websocket)
+
+    server = await websockets.serve(handler, "127.0.0.1", 0, backlog=4096)
+    port = server.sockets[0].getsockname()[1]
+    ready.put(port)
+
+    while rooms.members('bench_group') < args.subscribers:
+        await asyncio.sleep(0.1)
+
+    publish_times = []
+    for seq in range(args.updates):
+        start = time.perf_counter()
+        rooms.publish('bench_group', {'event': 'group_update', 'seq': seq, 'current_amount': seq, 'sent_at': time.time()})
+        publish_times.append(time.perf_counter() - start)
+        await asyncio.sleep(args.interval_ms / 1000.0)
+
+    while rooms.members('bench_group'):
+        await asyncio.sleep(0.1)
+    server.close()
+    return publish_times
+
+
+def server_process(args, ports, publish_results):
+    publish_results.put(asyncio.run(publish_updates(args, ports)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Group room broadcast benchmark')
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--updates', type=int, default=20)
+    parser.add_argument('--interval-ms', type=float, default=50, help='time between published updates')
+    parser.add_argument('--slow', type=float, default=0.01, help='fraction of slow subscribers')
+    parser.add_argument('--slow-delay-ms', type=float, default=500, help='time a slow subscriber takes per frame')
+    parser.add_argument('--client-processes', type=int, default=4)
+    args = parser.parse_args()
+
+    raise_fd_limit(args.subscribers + 256)
+    ports = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+
+    # The server runs in a child process too, so the client processes can be
+    # started once its port is known
+    publish_results = multiprocessing.Queue()
+    server = multiprocessing.Process(target=server_process, args=(args, ports, publish_results))
+    server.start()
+    port = ports.get()
+
+    per_process = args.subscribers // args.client_processes
+    clients = []
+    for i in range(args.client_processes):
+        count = per_process if i < args.client_processes - 1 else args.subscribers - per_process * i
+        clients.append(multiprocessing.Process(target=client_process, args=(port, count, per_process * i, args, results)))
+        clients[-1].start()
+
+    latencies, slow_frames = [], []
+    for _ in clients:
+        process_latencies, process_slow = results.get()
+        latencies.extend(process_latencies)
+        slow_frames.extend(process_slow)
+    publish_times = publish_results.get()
+    for process in clients + [server]:
+        process.join()
+
+    print(f"{args.subscribers} subscribers, {args.updates} updates every {args.interval_ms} ms, "
+          f"{len(slow_frames)} slow subscribers at {args.slow_delay_ms} ms per frame")
+    print_table(('metric', 'p50 ms', 'p99 ms', 'max ms'), [
+        ('publish() call', f"{percentile(publish_times, 50) * 1000:.2f}",
+         f"{percentile(publish_times, 99) * 1000:.2f}", f"{max(publish_times) * 1000:.2f}"),
+        ('delivery (fast members)', f"{percentile(latencies, 50) * 1000:.2f}",
+         f"{percentile(latencies, 99) * 1000:.2f}", f"{max(latencies) * 1000:.2f}"),
+    ])
+    if slow_frames:
+        print(f"slow members received {sum(slow_frames) / len(slow_frames):.1f} of {args.updates} frames on average, "
+              f"the rest were coalesced")
+
+
+if __name__ == '__main__':
+    main()
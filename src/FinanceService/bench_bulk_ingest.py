@@ -0,0 +1,74 @@
+import argparse
+import io
+import json
+import time
+from unittest.mock import patch
+
+from bson import ObjectId
+
+import app
+from bench_support import mongo_database, standin_collection, print_table
+
+# Bank-statement import benchmark: N rows through POST /transactions one
+# request at a time (measured on a sample and extrapolated) versus one
+# NDJSON upload to POST /transactions/bulk.
+#
+#   python bench_bulk_ingest.py --rows 1000000 --single-rows 10000
+
+
+def make_rows(count, users):
+    user_ids = [str(ObjectId()) for _ in range(users)]
+    for i in range(count):
+        yield {
+            'user_id': user_ids[i % users],
+            'amount': round(1 + (i % 500) * 0.37, 2),
+            'transaction_type': 'expense' if i % 3 else 'income',
+            'description': f'Statement line {i}'
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk transaction import benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--single-rows', type=int, default=10000, help='rows sent one request at a time')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=0.5, help='simulated Mongo round trip')
+    parser.add_argument('--mongo-uri', help='benchmark against a real Mongo instead of the stand-in')
+    args = parser.parse_args()
+
+    db = mongo_database('bench_bulk', args.mongo_uri)
+    for name in db.list_collection_names():
+        db[name].drop()
+    transactions = standin_collection(db, 'transactions', args.latency_ms, args.mongo_uri)
+    summaries = standin_collection(db, 'summaries', args.latency_ms, args.mongo_uri)
+    rollups = standin_collection(db, 'rollups', args.latency_ms, args.mongo_uri)
+    client = app.app.test_client()
+
+    rows = []
+    with patch('app.contributions_collection', transactions), patch('app.summaries_collection', summaries), \
+            patch('app.rollups_collection', rollups):
+        start = time.perf_counter()
+        for row in make_rows(args.single_rows, args.users):
+            client.post('/transactions', json=row)
+        single = time.perf_counter() - start
+        rows.append(('POST /transactions', args.single_rows, f"{args.single_rows / single:.0f}",
+                     f"{single * args.rows / args.single_rows:.1f} (extrapolated)"))
+
+        body = io.BytesIO()
+        for row in make_rows(args.rows, args.users):
+            body.write(json.dumps(row).encode('utf-8') + b'\n')
+        body.seek(0)
+        start = time.perf_counter()
+        response = client.post('/transactions/bulk', input_stream=body, content_type='application/x-ndjson',
+                               headers={'Content-Length': str(len(body.getbuffer()))})
+        bulk = time.perf_counter() - start
+        result = response.get_json()
+        assert result['inserted'] == args.rows, result
+        rows.append(('POST /transactions/bulk', args.rows, f"{args.rows / bulk:.0f}", f"{bulk:.1f}"))
+
+    print(f"simulated Mongo latency: {args.latency_ms} ms")
+    print_table(('endpoint', 'rows', 'rows/s', f'seconds for {args.rows} rows'), rows)
+
+
+if __name__ == '__main__':
+    main()
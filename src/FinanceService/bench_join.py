@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import random
+import time
+
+import app
+from async_mongo import AsyncCollection
+from bench_support import mongo_database, standin_collection, percentile, print_table
+
+# Join latency benchmark: resolving the username and group name of a
+# WebSocket join with N users stored, comparing the old case-insensitive
+# $regex lookup with the collation-indexed lookup, cold and cached.
+#
+#   python bench_join.py --users 1000000 --mongo-uri mongodb://localhost:27017/
+#
+# Without --mongo-uri the mongomock stand-in is used. It has no indexes, so
+# every uncached lookup there is a scan and only the cached rows are
+# representative; run against a real Mongo to see the index at work.
+
+
+async def regex_join(username, group_name):
+    # The lookups the join branch used to run
+    user = await app.async_users.find_one({"username": {"$regex": f"^{username}$", "$options": "i"}})
+    group = await app.async_groups.find_one({"group_name": group_name})
+    return user['_id'], group['_id']
+
+
+async def indexed_join(username, group_name):
+    return await app.resolve_user_id(username), await app.resolve_group_id(group_name)
+
+
+async def measure(join, samples, cold):
+    latencies = []
+    for username, group_name in samples:
+        if cold:
+            app.user_id_cache.clear()
+            app.group_id_cache.clear()
+        start = time.perf_counter()
+        user_id, group_id = await join(username, group_name)
+        latencies.append(time.perf_counter() - start)
+        assert user_id and group_id
+    return latencies
+
+
+def seed(users, groups, count, group_count, batch=10000):
+    for first in range(0, count, batch):
+        users.insert_many([{'username': f'User{i}'} for i in range(first, min(first + batch, count))])
+    groups.insert_many([{'group_name': f'group-{i}', 'current_amount': 0} for i in range(group_count)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSocket join lookup benchmark')
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--groups', type=int, default=1000)
+    parser.add_argument('--joins', type=int, default=20, help='joins measured per mode')
+    parser.add_argument('--latency-ms', type=float, default=0.5, help='simulated Mongo round trip')
+    parser.add_argument('--mongo-uri', help='benchmark against a real Mongo instead of the stand-in')
+    args = parser.parse_args()
+
+    db = mongo_database('bench_join', args.mongo_uri)
+    db['users'].drop()
+    db['groups'].drop()
+    seed(db['users'], db['groups'], args.users, args.groups)
+    if args.mongo_uri:
+        db['users'].create_index('username', collation=app.USERNAME_COLLATION, name='username_ci')
+        db['groups'].create_index('group_name')
+    app.async_users = AsyncCollection(standin_collection(db, 'users', args.latency_ms, args.mongo_uri))
+    app.async_groups = AsyncCollection(standin_collection(db, 'groups', args.latency_ms, args.mongo_uri))
+
+    # Clients send usernames in any case; the stand-in ignores collations, so
+    # it only gets exact-case names
+    rng = random.Random(1)
+    samples = []
+    for _ in range(args.joins):
+        username = f'User{rng.randrange(args.users)}'
+        samples.append((username.lower() if args.mongo_uri else username, f'group-{rng.randrange(args.groups)}'))
+
+    rows = []
+    for label, join, cold in (('$regex', regex_join, True),
+                              ('collation index, cold cache', indexed_join, True),
+                              ('collation index, warm cache', indexed_join, False)):
+        if not cold:
+            asyncio.run(measure(join, samples, cold))  # fill the caches
+        latencies = asyncio.run(measure(join, samples, cold))
+        rows.append((label, len(latencies),
+                     f"{percentile(latencies, 50) * 1000:.2f}",
+                     f"{percentile(latencies, 99) * 1000:.2f}"))
+
+    print(f"{args.users} users, simulated Mongo latency: {args.latency_ms if not args.mongo_uri else 'real'} ms")
+    print_table(('lookup', 'joins', 'p50 ms', 'p99 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
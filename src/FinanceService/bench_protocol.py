@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import websockets
+from websockets.legacy.client import WebSocketClientProtocol
+
+import app
+import protocol
+from bench_support import percentile, print_table
+from bench_websocket import setup_collections, start_server
+
+# Messages per second and bytes on the wire of the two group-savings
+# protocols, JSON text frames and the binary protobuf subprotocol, each with
+# and without permessage-deflate.
+#
+#   python bench_protocol.py --sockets 50 --contributions 200
+#
+# Every socket joins a group of its own and then contributes in a loop; each
+# contribute is three frames (the contribute, the group update pushed to the
+# room and the confirmation). Bytes are counted on the client's TCP transport
+# after the handshake and join, so they include the WebSocket framing and
+# masking. The second table is the CPU cost of the codecs alone.
+
+
+class CountingTransport:
+    def __init__(self, transport, counts):
+        self.transport = transport
+        self.counts = counts
+
+    def write(self, data):
+        self.counts['sent'] += len(data)
+        self.transport.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+
+class CountingClientProtocol(WebSocketClientProtocol):
+    def connection_made(self, transport):
+        self.wire = {'sent': 0, 'received': 0}
+        super().connection_made(CountingTransport(transport, self.wire))
+
+    def data_received(self, data):
+        self.wire['received'] += len(data)
+        super().data_received(data)
+
+
+def client_messages(binary):
+    if binary:
+        return protocol.encode_join, protocol.encode_contribute, lambda frame: protocol.decode_server_message(frame).event == protocol.pb.GROUP_UPDATE
+    return (lambda username, group_name: json.dumps({'event': 'join', 'username': username, 'group_name': group_name}),
+            lambda amount: json.dumps({'event': 'contribute', 'amount': amount}),
+            lambda frame: frame.startswith('{"event": "group_update"'))
+
+
+async def client(uri, index, args, binary, compression, latencies, wire):
+    join, contribute, is_update = client_messages(binary)
+    ws = await websockets.connect(uri, create_protocol=CountingClientProtocol,
+                                  subprotocols=protocol.SUBPROTOCOLS if binary else None,
+                                  compression='deflate' if compression == 'deflate' else None)
+    try:
+        await ws.send(join(f'user{index % args.users}', f'bench_group{index}'))
+        await ws.recv()
+        sent, received = ws.wire['sent'], ws.wire['received']
+        for i in range(args.contributions):
+            start = time.perf_counter()
+            await ws.send(contribute(i % 100 + 0.5))
+            while is_update(await ws.recv()):
+                pass
+            latencies.append(time.perf_counter() - start)
+        wire['sent'] += ws.wire['sent'] - sent
+        wire['received'] += ws.wire['received'] - received
+    finally:
+        await ws.close()
+
+
+async def run_mode(port, args, binary, compression):
+    uri = f"ws://127.0.0.1:{port}"
+    latencies = []
+    wire = {'sent': 0, 'received': 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(uri, i, args, binary, compression, latencies, wire) for i in range(args.sockets)))
+    return latencies, time.perf_counter() - start, wire
+
+
+def codec_rates(seconds):
+    # Encode/decode operations per second of one contribute's three frames
+    update = {'event': 'group_update', 'group_name': 'bench_group1', 'username': 'user1', 'amount': 10.5,
+              'current_amount': 12345.5}
+    rows = []
+    for name, binary in (('json', False), ('binary', True)):
+        codec = protocol.codec_for(protocol.BINARY_SUBPROTOCOL if binary else None)
+        _, contribute, _ = client_messages(binary)
+        request = contribute(10.5)
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            for _ in range(1000):
+                codec.decode(request)
+                codec.update(update)
+                codec.contributed('user1', 10.5, 12345.5)
+            count += 1000
+        elapsed = time.perf_counter() - start
+        rows.append((name, f"{count / elapsed:.0f}", f"{elapsed / count * 1e6:.2f}",
+                     len(request), len(codec.update(update)), len(codec.contributed('user1', 10.5, 12345.5))))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON vs binary group-savings WebSocket protocol')
+    parser.add_argument('--sockets', type=int, default=50)
+    parser.add_argument('--contributions', type=int, default=200, help='contribute events per socket')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated Mongo round trip')
+    parser.add_argument('--mongo-uri', help='benchmark against a real Mongo instead of the stand-in')
+    parser.add_argument('--log-sample-rate', type=float, default=app.WEBSOCKET_LOG_SAMPLE_RATE,
+                        help='fraction of WebSocket events logged (the records are discarded)')
+    args = parser.parse_args()
+
+    # Records are still sampled and formatted, just not written anywhere
+    logger = app.websocket_log.logger
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    app.websocket_log.sample_rate = args.log_sample_rate
+
+    setup_collections(args, args.sockets)
+    ports = {compression: start_server(app.websocket_server_options(compression)) for compression in ('none', 'deflate')}
+
+    rows = []
+    for compression in ('none', 'deflate'):
+        for name, binary in (('json', False), ('binary', True)):
+            latencies, elapsed, wire = asyncio.run(run_mode(ports[compression], args, binary, compression))
+            contributes = len(latencies)
+            rows.append((name, compression, f"{contributes * 3 / elapsed:.0f}",
+                         f"{percentile(latencies, 50) * 1000:.2f}", f"{percentile(latencies, 99) * 1000:.2f}",
+                         f"{wire['sent'] / contributes:.1f}", f"{wire['received'] / contributes:.1f}"))
+
+    print(f"{args.sockets} sockets x {args.contributions} contributions, simulated Mongo latency: {args.latency_ms} ms, "
+          f"log sample rate: {args.log_sample_rate}")
+    print_table(('protocol', 'deflate', 'msgs/s', 'p50 ms', 'p99 ms', 'B sent/contrib', 'B recv/contrib'), rows)
+    print()
+    print_table(('codec', 'contribs/s', 'us/contrib', 'B request', 'B update', 'B reply'), codec_rates(1.0))
+
+
+if __name__ == '__main__':
+    main()
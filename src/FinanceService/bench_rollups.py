@@ -0,0 +1,101 @@
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import rollups
+from bench_support import mongo_database, print_table
+
+# Spend per month and per day over a year for one user, answered from the
+# rollups versus by reading the user's transactions in the range and
+# bucketing them, which is what a client had to do before the rollups.
+#
+#   python bench_rollups.py --transactions 1000 10000 50000
+#   python bench_rollups.py --mongo-uri mongodb://localhost:27017/
+#
+# Also reports the cost of keeping the rollups up to date: the extra
+# bulk_write per transaction.
+
+
+def seed(transactions, rollup_collection, user_id, count):
+    transactions.drop()
+    rollup_collection.drop()
+    transactions.create_index([('user_id', 1), ('ts', 1)])
+    rollup_collection.create_index([('scope', 1), ('owner_id', 1), ('period', 1), ('start', 1)], unique=True)
+    start = datetime(2025, 1, 1)
+    documents = [{
+        'user_id': user_id,
+        'amount': random.randint(1, 100),
+        'transaction_type': random.choice(('expense', 'income')),
+        'ts': start + timedelta(seconds=random.randrange(365 * 86400))
+    } for _ in range(count)]
+    for i in range(0, count, 10000):
+        chunk = documents[i:i + 10000]
+        transactions.insert_many(chunk)
+        rollup_collection.bulk_write(rollups.rollup_updates(chunk), ordered=False)
+
+
+def scan(transactions, user_id, period, start, end):
+    totals = defaultdict(int)
+    for t in transactions.find({'user_id': user_id, 'ts': {'$gte': start, '$lt': end}}, {'amount': True, 'ts': True}):
+        totals[rollups.bucket_start(t['ts'], period)] += t['amount']
+    return totals
+
+
+def from_rollups(rollup_collection, user_id, period, start, end):
+    return {b['start']: b['total_amount']
+            for b in rollups.find_range(rollup_collection, 'user', user_id, period, start, end)}
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - began)
+    return best, result
+
+
+def write_cost(rollup_collection, count):
+    user_id, group_id = ObjectId(), ObjectId()
+    began = time.perf_counter()
+    for i in range(count):
+        transaction = {'user_id': user_id, 'group_id': group_id, 'amount': 1,
+                       'transaction_type': 'group_contribution', 'ts': rollups.timestamp()}
+        rollup_collection.bulk_write(rollups.rollup_updates([transaction]), ordered=False)
+    return (time.perf_counter() - began) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rollup range queries versus transaction scans')
+    parser.add_argument('--transactions', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many runs per query')
+    parser.add_argument('--mongo-uri', help='benchmark against a real Mongo instead of mongomock')
+    args = parser.parse_args()
+
+    db = mongo_database('bench_rollups', args.mongo_uri)
+    transactions, rollup_collection = db['transactions'], db['rollups']
+    start, end = datetime(2025, 1, 1), datetime(2026, 1, 1)
+
+    rows = []
+    for count in args.transactions:
+        user_id = ObjectId()
+        seed(transactions, rollup_collection, user_id, count)
+        for period in rollups.PERIODS:
+            scan_time, expected = timed(lambda: scan(transactions, user_id, period, start, end), args.repeat)
+            rollup_time, answer = timed(lambda: from_rollups(rollup_collection, user_id, period, start, end), args.repeat)
+            assert answer == expected
+            rows.append((count, period, len(answer), f"{scan_time * 1000:.2f}", f"{rollup_time * 1000:.2f}",
+                         f"{scan_time / rollup_time:.0f}x"))
+
+    print(f"One user's transactions over a year ({'Mongo' if args.mongo_uri else 'mongomock'}):")
+    print_table(('transactions', 'period', 'buckets', 'scan ms', 'rollups ms', 'speedup'), rows)
+    print(f"Rollup upkeep: {write_cost(rollup_collection, 1000) * 1e6:.0f} us per transaction "
+          f"(4 buckets, one bulk_write)")
+
+
+if __name__ == '__main__':
+    main()
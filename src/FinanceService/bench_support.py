@@ -0,0 +1,83 @@
+import threading
+import time
+
+# Shared helpers for the FinanceService benchmark scripts (bench_*.py).
+# They run against a local stand-in Mongo (mongomock) with an injected
+# round-trip latency, or against a real server when --mongo-uri is given.
+
+
+class LatencyCollection:
+    """Collection proxy that sleeps for a fixed round trip before every call.
+
+    The sleep happens outside the lock so concurrent callers overlap their
+    "network" time like they would against a real server, while the lock keeps
+    the (not thread-safe) mongomock store consistent.
+    """
+
+    def __init__(self, collection, latency):
+        self.collection = collection
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                self.calls += 1
+                result = attr(*args, **kwargs)
+                # Materialize cursors while holding the lock
+                if name in ('find', 'aggregate'):
+                    result = iter(list(result))
+                return result
+        return call
+
+
+def mongo_database(name, mongo_uri=None):
+    if mongo_uri:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri)[name]
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("The local Mongo stand-in needs mongomock: pip install -r requirements-dev.txt")
+    return mongomock.MongoClient()[name]
+
+
+def standin_collection(db, name, latency_ms, mongo_uri=None):
+    collection = db[name]
+    # A real server already has its own round-trip time
+    if mongo_uri:
+        return collection
+    return LatencyCollection(collection, latency_ms / 1000.0)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def raise_fd_limit(needed):
+    # Each benchmark socket costs a file descriptor on both ends
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import threading
+import time
+
+import websockets
+from bson import ObjectId
+
+import app
+import async_mongo
+from contributions import ContributionEngine
+from bench_support import (mongo_database, standin_collection, percentile,
+                           raise_fd_limit, print_table)
+
+# Load benchmark for the group-savings WebSocket server: N concurrent sockets
+# join groups of --group-size members and contribute, and the per-contribute
+# round trip is measured.
+#
+#   python bench_websocket.py --sockets 10 100 1000 5000 --latency-ms 2
+#
+# --blocking runs the same queries inline on the event loop, which is how the
+# handler behaved before the Mongo calls were moved to the executor.
+
+
+# Group ids are fixed so every worker process of bench_workers.py seeds the
+# same groups
+def bench_group_id(index):
+    return ObjectId(f'{index + 1:024x}')
+
+
+class BlockingCollection:
+    # Awaitable facade that runs the pymongo call directly on the event loop
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+def setup_collections(args, groups, seed=True, blocking=False):
+    finance_db = mongo_database('bench_finances', args.mongo_uri)
+    user_db = mongo_database('bench_users', args.mongo_uri)
+    if seed:
+        for db in (finance_db, user_db):
+            for name in db.list_collection_names():
+                db[name].drop()
+        user_db['users'].insert_many([{'username': f'user{i}', 'email': f'user{i}@example.com'} for i in range(args.users)])
+        finance_db['groups'].insert_many([
+            {'_id': bench_group_id(i), 'group_name': f'bench_group{i}', 'current_amount': 0} for i in range(groups)
+        ])
+
+    wrap = BlockingCollection if blocking else async_mongo.AsyncCollection
+    app.async_users = wrap(standin_collection(user_db, 'users', args.latency_ms, args.mongo_uri))
+    app.async_groups = wrap(standin_collection(finance_db, 'groups', args.latency_ms, args.mongo_uri))
+    app.async_contributions = wrap(standin_collection(finance_db, 'transactions', args.latency_ms, args.mongo_uri))
+    app.async_summaries = wrap(standin_collection(finance_db, 'summaries', args.latency_ms, args.mongo_uri))
+    app.contribution_engine = ContributionEngine(app.async_contributions, app.async_groups, app.async_summaries)
+
+
+def start_server(options=None):
+    # Same layout as run_websocket_server: the server gets its own loop and thread
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    holder = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(websockets.serve(app.group_saving_goal_handler, "127.0.0.1", 0, **(options or {})))
+        holder['port'] = server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait()
+    return holder['port']
+
+
+async def recv_reply(ws):
+    # Skips the group_update frames broadcast to the room and returns the
+    # number of them seen before the reply to this socket's own message
+    updates = 0
+    while True:
+        message = await ws.recv()
+        if not message.startswith('{"event": "group_update"'):
+            return updates
+        updates += 1
+
+
+async def client(uri, index, args, connect_limit, latencies, updates=None):
+    async with connect_limit:
+        ws = await websockets.connect(uri, open_timeout=60)
+    try:
+        await ws.send(json.dumps({'event': 'join', 'username': f'user{index % args.users}', 'group_name': f'bench_group{index // args.group_size}'}))
+        await recv_reply(ws)
+        for _ in range(args.contributions):
+            start = time.perf_counter()
+            await ws.send(json.dumps({'event': 'contribute', 'amount': 1}))
+            seen = await recv_reply(ws)
+            latencies.append(time.perf_counter() - start)
+            if updates is not None:
+                updates.append(seen)
+    finally:
+        await ws.close()
+
+
+async def run_level(port, sockets, args):
+    uri = f"ws://127.0.0.1:{port}"
+    latencies = []
+    connect_limit = asyncio.Semaphore(200)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(uri, i, args, connect_limit, latencies) for i in range(sockets)))
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Group-savings WebSocket load benchmark')
+    parser.add_argument('--sockets', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--contributions', type=int, default=5, help='contribute events per socket')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--group-size', type=int, default=10, help='sockets per group room')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='simulated Mongo round trip')
+    parser.add_argument('--mongo-uri', help='benchmark against a real Mongo instead of the stand-in')
+    parser.add_argument('--blocking', action='store_true', help='run Mongo calls inline on the event loop')
+    args = parser.parse_args()
+
+    raise_fd_limit(max(args.sockets) * 2 + 256)
+    setup_collections(args, -(-max(args.sockets) // args.group_size), blocking=args.blocking)
+    port = start_server()
+
+    rows = []
+    for sockets in args.sockets:
+        # Keep anything the handler prints out of the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, elapsed = asyncio.run(run_level(port, sockets, args))
+        rows.append((sockets, len(latencies), f"{len(latencies) / elapsed:.0f}",
+                     f"{percentile(latencies, 50) * 1000:.1f}", f"{percentile(latencies, 99) * 1000:.1f}"))
+
+    mode = 'blocking' if args.blocking else f'executor ({async_mongo.MONGO_EXECUTOR_WORKERS} workers)'
+    print(f"mode: {mode}, simulated Mongo latency: {args.latency_ms} ms")
+    print_table(('sockets', 'contributions', 'contrib/s', 'p50 ms', 'p99 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
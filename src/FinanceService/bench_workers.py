@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import time
+
+from bench_support import percentile, raise_fd_limit, print_table
+
+# Throughput scaling of the WebSocket tier with 1/2/4/8 worker processes
+# sharing one port through SO_REUSEPORT and exchanging group updates over Redis
+# pub/sub. Client processes open sockets, join groups and contribute; the
+# table reports contributions/s and how many group_update frames from other
+# sockets reached the contributors, which shows updates crossing workers.
+#
+#   python bench_workers.py --workers 1 2 4 8 --sockets 2000 --redis-url redis://localhost:6379/0
+#
+# Without --mongo-uri every worker gets its own in-memory Mongo stand-in
+# seeded with the same users and groups. Without a Redis server, --fake-redis
+# starts an in-process fakeredis TCP server (handy for a smoke run only).
+
+
+def worker_process(port, args):
+    import app
+    import bench_websocket
+    from pubsub import RedisBackbone
+
+    bench_websocket.setup_collections(args, group_count(args), seed=not args.mongo_uri)
+    app.group_rooms.backbone = RedisBackbone(args.redis_url)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.run_websocket_server(port, reuse_port=True)
+
+
+def group_count(args):
+    return -(-args.sockets // args.group_size)
+
+
+def client_process(port, first_index, count, args, results):
+    import bench_websocket
+
+    raise_fd_limit(count + 256)
+
+    async def run():
+        latencies, updates = [], []
+        connect_limit = asyncio.Semaphore(100)
+        uri = f"ws://127.0.0.1:{port}"
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            bench_websocket.client(uri, first_index + i, args, connect_limit, latencies, updates)
+            for i in range(count)
+        ))
+        results.put((latencies, sum(updates), time.perf_counter() - start))
+
+    asyncio.run(run())
+
+
+def start_fake_redis():
+    import threading
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(('127.0.0.1', 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return f"redis://{host}:{port}/0"
+
+
+def free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    import socket
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.1)
+    raise SystemExit(f"WebSocket workers did not start on port {port}")
+
+
+def run_level(workers, args):
+    context = multiprocessing.get_context('spawn')
+    port = free_port()
+    processes = [context.Process(target=worker_process, args=(port, args), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    wait_for_port(port)
+    # Give every worker time to bind before the clients connect
+    time.sleep(1)
+
+    results = context.Queue()
+    per_process = args.sockets // args.client_processes
+    clients = []
+    for i in range(args.client_processes):
+        count = per_process if i < args.client_processes - 1 else args.sockets - per_process * i
+        clients.append(context.Process(target=client_process, args=(port, per_process * i, count, args, results)))
+        clients[-1].start()
+
+    latencies, updates, elapsed = [], 0, 0
+    for _ in clients:
+        process_latencies, process_updates, process_elapsed = results.get()
+        latencies.extend(process_latencies)
+        updates += process_updates
+        elapsed = max(elapsed, process_elapsed)
+    for process in clients:
+        process.join()
+    for process in processes:
+        process.terminate()
+        process.join()
+    return latencies, updates, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSocket worker scaling benchmark')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--sockets', type=int, default=2000)
+    parser.add_argument('--contributions', type=int, default=5, help='contribute events per socket')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--group-size', type=int, default=10, help='sockets per group room')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='simulated Mongo round trip')
+    parser.add_argument('--client-processes', type=int, default=4)
+    parser.add_argument('--redis-url', default='redis://localhost:6379/0')
+    parser.add_argument('--fake-redis', action='store_true', help='use an in-process fakeredis server')
+    parser.add_argument('--mongo-uri', help='benchmark against a real Mongo instead of the stand-in')
+    args = parser.parse_args()
+
+    if args.fake_redis:
+        args.redis_url = start_fake_redis()
+    if args.mongo_uri:
+        import bench_websocket
+        bench_websocket.setup_collections(args, group_count(args))
+
+    rows = []
+    for workers in args.workers:
+        latencies, updates, elapsed = run_level(workers, args)
+        rows.append((workers, len(latencies), f"{len(latencies) / elapsed:.0f}",
+                     f"{percentile(latencies, 50) * 1000:.1f}", f"{percentile(latencies, 99) * 1000:.1f}",
+                     updates))
+
+    print(f"{args.sockets} sockets in groups of {args.group_size}, {args.contributions} contributions each, "
+          f"{multiprocessing.cpu_count()} CPUs")
+    print_table(('workers', 'contributions', 'contrib/s', 'p50 ms', 'p99 ms', 'updates seen'), rows)
+
+
+if __name__ == '__main__':
+    main()
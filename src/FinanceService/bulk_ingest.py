@@ -0,0 +1,141 @@
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+
+from rollups import rollup_updates, timestamp
+from summaries import summary_updates, valid_amount, valid_transaction_type
+
+# Bulk transaction import used by POST /transactions/bulk.
+#
+# Rows are validated and written in chunks of CHUNK_SIZE with an unordered
+# insert_many, so a bad row only fails itself and the whole body never has to
+# sit in memory as documents. With an idempotency key every row gets a
+# deterministic import_key ("<key>:<row>") backed by a unique index, so
+# retrying an upload skips the rows that were already stored.
+
+CHUNK_SIZE = 1000
+
+# Per-row errors reported back to the client; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+DUPLICATE_KEY = 11000
+
+
+def parse_ndjson(lines):
+    # Yields parsed rows, or the ValueError for lines that aren't valid JSON
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
+def validate_chunk(rows, first_row, idempotency_key, user_ids):
+    # One pass over a chunk: returns the documents to insert with their row
+    # numbers, and the (row, error) pairs of the rejected rows. user_ids caches
+    # the ObjectId of every user seen in this import. The rows of a
+    # chunk share one timestamp.
+    documents, rows_of_documents, errors = [], [], []
+    ts = timestamp()
+    for row_number, row in enumerate(rows, first_row):
+        if isinstance(row, Exception):
+            errors.append((row_number, f'Invalid JSON: {row}'))
+            continue
+        if not isinstance(row, dict):
+            errors.append((row_number, 'Row must be a JSON object'))
+            continue
+
+        user_id = row.get('user_id')
+        amount = row.get('amount')
+        transaction_type = row.get('transaction_type')
+        if not user_id or not amount or not transaction_type:
+            errors.append((row_number, 'Missing required fields'))
+            continue
+        if not valid_amount(amount):
+            errors.append((row_number, 'amount must be a finite number'))
+            continue
+        if not valid_transaction_type(transaction_type):
+            errors.append((row_number, "transaction_type can't contain '.' or start with '$'"))
+            continue
+
+        object_id = user_ids.get(user_id)
+        if object_id is None:
+            try:
+                object_id = user_ids[user_id] = ObjectId(user_id)
+            except (InvalidId, TypeError) as e:
+                errors.append((row_number, str(e)))
+                continue
+
+        document = {
+            'user_id': object_id,
+            'amount': amount,
+            'transaction_type': transaction_type,
+            'description': row.get('description'),
+            'ts': ts
+        }
+        if idempotency_key:
+            document['import_key'] = f'{idempotency_key}:{row_number}'
+        documents.append(document)
+        rows_of_documents.append(row_number)
+    return documents, rows_of_documents, errors
+
+
+def insert_chunk(transactions, documents, rows_of_documents):
+    # Returns the inserted documents, the number of duplicates skipped and
+    # the (row, error) pairs of the failed writes
+    try:
+        transactions.insert_many(documents, ordered=False)
+        return documents, 0, []
+    except BulkWriteError as e:
+        failed = set()
+        duplicates = 0
+        errors = []
+        for write_error in e.details.get('writeErrors', []):
+            index = write_error['index']
+            failed.add(index)
+            if write_error['code'] == DUPLICATE_KEY and 'import_key' in documents[index]:
+                duplicates += 1
+            else:
+                errors.append((rows_of_documents[index], write_error.get('errmsg', 'Write failed')))
+        inserted = [d for i, d in enumerate(documents) if i not in failed]
+        return inserted, duplicates, errors
+
+
+def ingest(rows, transactions, summaries, idempotency_key=None, chunk_size=CHUNK_SIZE, rollups=None):
+    result = {'inserted': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+    user_ids = {}
+
+    def report(errors):
+        result['error_count'] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(result['errors'])
+        result['errors'].extend({'row': row, 'error': error} for row, error in errors[:max(room, 0)])
+
+    def flush(chunk, first_row):
+        documents, rows_of_documents, errors = validate_chunk(chunk, first_row, idempotency_key, user_ids)
+        report(errors)
+        if not documents:
+            return
+        inserted, duplicates, errors = insert_chunk(transactions, documents, rows_of_documents)
+        report(errors)
+        result['inserted'] += len(inserted)
+        result['duplicates'] += duplicates
+        if inserted:
+            summaries.bulk_write(summary_updates(inserted), ordered=False)
+            if rollups is not None:
+                rollups.bulk_write(rollup_updates(inserted), ordered=False)
+
+    chunk, first_row = [], 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            flush(chunk, first_row)
+            first_row += len(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk, first_row)
+    return result
@@ -0,0 +1,173 @@
+import asyncio
+from collections import defaultdict
+from bson import ObjectId
+from pymongo import ReturnDocument
+from rollups import rollup_updates, timestamp
+from summaries import CONTRIBUTION_TYPE, summary_update, summary_updates
+
+
+# Records a group contribution and bumps the group's running total.
+#
+# The total is only ever changed with a server-side $inc, so concurrent
+# contributors can't overwrite each other's updates, and find_one_and_update
+# hands back the new total in the same round trip. The contribution document
+# gets a client-generated _id and is inserted concurrently with the $inc, so
+# a contribute event costs one round trip of latency instead of three. The
+# contributor's summary (see summaries.py) and the user's and group's time
+# buckets (see rollups.py) are bumped in the same round trip.
+class ContributionEngine:
+    def __init__(self, contributions, groups, summaries=None, rollups=None):
+        # All arguments are AsyncCollection wrappers
+        self.contributions = contributions
+        self.groups = groups
+        self.summaries = summaries
+        self.rollups = rollups
+        # Contributions whose writes haven't been acknowledged yet
+        self.pending = 0
+
+    async def contribute(self, user_id, group_id, amount):
+        self.pending += 1
+        try:
+            return await self._contribute(user_id, group_id, amount)
+        finally:
+            self.pending -= 1
+
+    async def _contribute(self, user_id, group_id, amount):
+        contribution = {
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'group_id': group_id,
+            'amount': amount,
+            'transaction_type': CONTRIBUTION_TYPE,
+            'ts': timestamp()
+        }
+        writes = [
+            self.groups.find_one_and_update(
+                {'_id': group_id},
+                {'$inc': {'current_amount': amount}},
+                projection={'current_amount': True},
+                return_document=ReturnDocument.AFTER
+            ),
+            self.contributions.insert_one(contribution)
+        ]
+        if self.summaries is not None:
+            writes.append(self.summaries.update_one(
+                {'_id': user_id}, summary_update(amount, CONTRIBUTION_TYPE), upsert=True
+            ))
+        if self.rollups is not None:
+            writes.append(self.rollups.bulk_write(rollup_updates([contribution]), ordered=False))
+        group = (await asyncio.gather(*writes))[0]
+        # None when the group no longer exists
+        return group['current_amount'] if group else None
+
+
+# Write-behind variant of ContributionEngine for peak load (opt-in, see
+# CONTRIBUTION_BATCHING in app.py).
+#
+# Contributions are buffered per group and flushed when either max_batch events
+# are pending or max_delay seconds have passed since the first one arrived. A
+# flush is one insert_many for every buffered contribution plus one aggregated
+# $inc per group (and one bulk write each of the contributors' summaries and
+# of the time buckets). Callers are only resumed once both writes have been
+# acknowledged, so the client never sees a confirmation for a contribution
+# that isn't stored.
+class ContributionBatcher:
+    def __init__(self, contributions, groups, summaries=None, max_batch=500, max_delay=0.02, rollups=None):
+        self.contributions = contributions
+        self.groups = groups
+        self.summaries = summaries
+        self.rollups = rollups
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = defaultdict(list)  # group_id -> [(contribution, future)]
+        self._pending_count = 0
+        self._flushing_count = 0
+        self._timer = None
+        self._flushes = set()
+
+    @property
+    def pending(self):
+        # Contributions buffered or being flushed
+        return self._pending_count + self._flushing_count
+
+    async def contribute(self, user_id, group_id, amount):
+        loop = asyncio.get_running_loop()
+        contribution = {
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'group_id': group_id,
+            'amount': amount,
+            'transaction_type': CONTRIBUTION_TYPE,
+            'ts': timestamp()
+        }
+        future = loop.create_future()
+        self._pending[group_id].append((contribution, future))
+        self._pending_count += 1
+
+        if self._pending_count >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        return await future
+
+    async def flush(self):
+        # Writes out everything buffered so far and waits for in-flight flushes
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending_count:
+            return
+        batch = self._pending
+        self._flushing_count += self._pending_count
+        self._pending = defaultdict(list)
+        self._pending_count = 0
+        task = asyncio.ensure_future(self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch):
+        contributions = [contribution for entries in batch.values() for contribution, _ in entries]
+        try:
+            await self._write_batch(batch, contributions)
+        finally:
+            self._flushing_count -= len(contributions)
+
+    async def _write_batch(self, batch, contributions):
+        try:
+            await self.contributions.insert_many(contributions, ordered=False)
+            writes = [
+                self.groups.find_one_and_update(
+                    {'_id': group_id},
+                    {'$inc': {'current_amount': sum(c['amount'] for c, _ in entries)}},
+                    projection={'current_amount': True},
+                    return_document=ReturnDocument.AFTER
+                )
+                for group_id, entries in batch.items()
+            ]
+            if self.summaries is not None:
+                writes.append(self.summaries.bulk_write(summary_updates(contributions), ordered=False))
+            if self.rollups is not None:
+                writes.append(self.rollups.bulk_write(rollup_updates(contributions), ordered=False))
+            groups = await asyncio.gather(*writes)
+        except Exception as e:
+            for entries in batch.values():
+                for _, future in entries:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for entries, group in zip(batch.values(), groups):
+            # Hand every contributor the running total as of its own event
+            running = None
+            if group:
+                running = group['current_amount'] - sum(c['amount'] for c, _ in entries)
+            for contribution, future in entries:
+                if running is not None:
+                    running += contribution['amount']
+                if not future.done():
+                    future.set_result(running)
@@ -0,0 +1,25 @@
+import json
+import logging
+import random
+
+# Structured logging for hot paths such as the WebSocket handler. Every
+# record is one JSON object: {"event": ..., "sample_rate": ..., **fields}.
+# Only a sample_rate fraction of the events is logged, so the handler doesn't
+# spend its time formatting and writing a line per message; the rate is part
+# of the record, so counts taken from the logs can be scaled back up.
+class SampledLog:
+    def __init__(self, logger, sample_rate, random=random.random):
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.random = random
+
+    def log(self, event, level=logging.INFO, **fields):
+        if self.sample_rate <= 0:
+            return
+        if self.sample_rate < 1 and self.random() >= self.sample_rate:
+            return
+        if not self.logger.isEnabledFor(level):
+            return
+        record = {'event': event, 'sample_rate': self.sample_rate}
+        record.update(fields)
+        self.logger.log(level, json.dumps(record, default=str))
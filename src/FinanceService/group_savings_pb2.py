@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: group_savings.proto
+# Protobuf Python Version: 5.27.2
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    5,
+    27,
+    2,
+    '',
+    'group_savings.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x13group_savings.proto\x12\rgroup_savings\"|\n\rClientMessage\x12#\n\x05\x65vent\x18\x01 \x01(\x0e\x32\x14.group_savings.Event\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x12\n\ngroup_name\x18\x03 \x01(\t\x12\x0e\n\x06\x61mount\x18\x04 \x01(\x01\x12\x10\n\x08trace_id\x18\x05 \x01(\t\"\xce\x01\n\rServerMessage\x12#\n\x05\x65vent\x18\x01 \x01(\x0e\x32\x14.group_savings.Event\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x12\n\ngroup_name\x18\x03 \x01(\t\x12\x0e\n\x06\x61mount\x18\x04 \x01(\x01\x12\x16\n\x0e\x63urrent_amount\x18\x05 \x01(\x01\x12\'\n\x05\x65rror\x18\x06 \x01(\x0e\x32\x18.group_savings.ErrorCode\x12\x0f\n\x07message\x18\x07 \x01(\t\x12\x10\n\x08trace_id\x18\x08 \x01(\t*r\n\x05\x45vent\x12\x15\n\x11\x45VENT_UNSPECIFIED\x10\x00\x12\x08\n\x04JOIN\x10\x01\x12\x0e\n\nCONTRIBUTE\x10\x02\x12\n\n\x06JOINED\x10\x03\x12\x0f\n\x0b\x43ONTRIBUTED\x10\x04\x12\x10\n\x0cGROUP_UPDATE\x10\x05\x12\t\n\x05\x45RROR\x10\x06*\x8c\x01\n\tErrorCode\x12\x1a\n\x16\x45RROR_CODE_UNSPECIFIED\x10\x00\x12\x0f\n\x0b\x42\x41\x44_MESSAGE\x10\x01\x12\x12\n\x0eUSER_NOT_FOUND\x10\x02\x12\x13\n\x0fGROUP_NOT_FOUND\x10\x03\x12\x10\n\x0cNOT_IN_GROUP\x10\x04\x12\x17\n\x13SERVICE_UNAVAILABLE\x10\x05\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'group_savings_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_EVENT']._serialized_start=373
+  _globals['_EVENT']._serialized_end=487
+  _globals['_ERRORCODE']._serialized_start=490
+  _globals['_ERRORCODE']._serialized_end=630
+  _globals['_CLIENTMESSAGE']._serialized_start=38
+  _globals['_CLIENTMESSAGE']._serialized_end=162
+  _globals['_SERVERMESSAGE']._serialized_start=165
+  _globals['_SERVERMESSAGE']._serialized_end=371
+# @@protoc_insertion_point(module_scope)
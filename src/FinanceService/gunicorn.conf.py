@@ -0,0 +1,128 @@
+import collections
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# Production server for the FinanceService HTTP API:
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# The REST endpoints are served by GUNICORN_WORKERS pre-forked processes with
+# GUNICORN_THREADS threads each. The WebSocket tier (see serve_websockets in
+# app.py, including WEBSOCKET_WORKERS) runs once, in a separate process the
+# gunicorn master starts before forking the HTTP workers, restarts if it dies
+# and stops when it exits; HTTP workers restarted by gunicorn never start a
+# second one. WEBSOCKET_SERVER=0 leaves it out, e.g. to run it in its own
+# container. The indexes (see ensure_indexes in app.py) are created before
+# anything is served either way.
+#
+# The app isn't preloaded: every worker imports it after the fork and opens
+# its own Mongo connections. On SIGTERM gunicorn stops accepting, lets the
+# requests in flight finish for up to graceful_timeout seconds, then stops
+# the WebSocket tier, which closes its sockets once their handlers are done.
+# The gauges on /status only cover the worker that answers the probe.
+
+http_port = int(os.getenv('PORT', 5003))
+
+wsgi_app = 'app:app'
+bind = os.getenv('GUNICORN_BIND', f'0.0.0.0:{http_port}')
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', 2 * multiprocessing.cpu_count() + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+backlog = int(os.getenv('GUNICORN_BACKLOG', 2048))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Recycle workers now and then so slow leaks can't build up, staggered so
+# they don't all restart at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')  # e.g. "-" for stdout; off by default
+
+# The side server is restarted when it exits on its own, after 1, 2, 4...
+# (at most SIDE_RESTART_MAX_DELAY) seconds. If it exits more than
+# SIDE_MAX_RESTARTS times within SIDE_RESTART_WINDOW seconds, the master shuts
+# down instead, so that whatever runs gunicorn sees the failure.
+SIDE_MAX_RESTARTS = int(os.getenv('SIDE_MAX_RESTARTS', 5))
+SIDE_RESTART_WINDOW = 60
+SIDE_RESTART_MAX_DELAY = 10
+
+side_process = None
+side_lock = threading.Lock()
+stopping = False
+
+
+def on_starting(server):
+    create_indexes(server)
+    if os.getenv('WEBSOCKET_SERVER', '1') != '1':
+        return
+    start_side_process(server)
+    threading.Thread(target=supervise_side_process, args=(server,), name='side-process', daemon=True).start()
+
+
+def create_indexes(server):
+    # In a child process too, so the master stays free of Mongo clients
+    result = subprocess.run([sys.executable, '-c', 'import app; app.ensure_indexes()'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        server.log.error(f'Creating the indexes failed (exit code {result.returncode})')
+
+
+def start_side_process(server):
+    global side_process
+    with side_lock:
+        if stopping:
+            return
+        # A fresh interpreter rather than a fork: the master never imports app,
+        # so it has no Mongo clients or event loops to hand down.
+        # In a session of its own so that a Ctrl-C or a signal to the process
+        # group reaches the master only, which stops it in on_exit.
+        side_process = subprocess.Popen([sys.executable, '-c', 'import app; app.serve_websockets()'],
+                                        cwd=os.path.dirname(os.path.abspath(__file__)), start_new_session=True)
+        server.log.info(f'Started the WebSocket server (pid {side_process.pid})')
+
+
+def supervise_side_process(server):
+    # Runs on a thread of the master for as long as it lives
+    exits = collections.deque()
+    while True:
+        code = side_process.wait()
+        if stopping:
+            return
+        now = time.monotonic()
+        while exits and now - exits[0] > SIDE_RESTART_WINDOW:
+            exits.popleft()
+        exits.append(now)
+        if len(exits) > SIDE_MAX_RESTARTS:
+            server.log.error(f'The WebSocket server exited {len(exits)} times within '
+                             f'{SIDE_RESTART_WINDOW}s (last exit code {code}), shutting down')
+            os.kill(os.getpid(), signal.SIGTERM)
+            return
+        delay = min(2 ** (len(exits) - 1), SIDE_RESTART_MAX_DELAY)
+        server.log.error(f'The WebSocket server exited with code {code}, restarting it in {delay}s')
+        time.sleep(delay)
+        start_side_process(server)
+
+
+def post_worker_init(worker):
+    # Per-process background refresh of the /status transaction count
+    import app
+    app.status_monitor.start()
+
+
+def on_exit(server):
+    global stopping
+    with side_lock:
+        stopping = True
+    if side_process is None or side_process.poll() is not None:
+        return
+    side_process.terminate()
+    try:
+        side_process.wait(graceful_timeout)
+    except subprocess.TimeoutExpired:
+        server.log.warning('The WebSocket server did not stop in time, killing it')
+        side_process.kill()
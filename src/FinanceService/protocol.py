@@ -0,0 +1,144 @@
+import json
+
+from google.protobuf.message import DecodeError
+
+import group_savings_pb2 as pb
+from tracing import current_trace_id
+
+# Wire protocols of the group-savings WebSocket.
+#
+# Clients that don't ask for a subprotocol speak the original JSON one:
+# {"event": "join", "username": ..., "group_name": ...} and
+# {"event": "contribute", "amount": ...} in, plain-text replies and JSON
+# group_update frames out.
+#
+# Clients that offer BINARY_SUBPROTOCOL in Sec-WebSocket-Protocol exchange
+# binary frames holding one group_savings.proto message each: ClientMessage
+# in, ServerMessage out, with typed event and error codes and numeric
+# amounts. Both decode to the same dicts, so the handler doesn't care which
+# one a socket speaks.
+#
+# Either kind of client message may carry a trace_id, under which the server
+# traces its handling. Binary replies and group updates of a traced message
+# carry its trace_id back; the plain-text JSON replies can't, but JSON
+# group_update frames can.
+
+BINARY_SUBPROTOCOL = 'group-savings.v1.protobuf'
+SUBPROTOCOLS = [BINARY_SUBPROTOCOL]
+
+# Error codes of rejected messages
+BAD_MESSAGE = pb.BAD_MESSAGE
+USER_NOT_FOUND = pb.USER_NOT_FOUND
+GROUP_NOT_FOUND = pb.GROUP_NOT_FOUND
+NOT_IN_GROUP = pb.NOT_IN_GROUP
+SERVICE_UNAVAILABLE = pb.SERVICE_UNAVAILABLE
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def check_join(data):
+    # The handler looks users and groups up by these, so they must be strings
+    for field in ('username', 'group_name'):
+        value = data.get(field)
+        if not isinstance(value, str) or not value:
+            raise ProtocolError(f"join needs a non-empty string {field}")
+    return data
+
+
+class JsonCodec:
+    subprotocol = None
+
+    def decode(self, message):
+        try:
+            data = json.loads(message)
+        except ValueError as e:
+            raise ProtocolError(f"Invalid JSON: {e}")
+        if not isinstance(data, dict):
+            raise ProtocolError("Messages must be JSON objects")
+        if data.get('event') == 'join':
+            check_join(data)
+        return data
+
+    def joined(self, username, group_name):
+        return f"User {username} joined group {group_name}"
+
+    def contributed(self, username, amount, current_amount):
+        return f"User {username} contributed {amount} to the group saving goal!"
+
+    def error(self, code, text):
+        return text
+
+    def update(self, message):
+        return json.dumps(message)
+
+
+class BinaryCodec:
+    subprotocol = BINARY_SUBPROTOCOL
+
+    def decode(self, message):
+        if isinstance(message, str):
+            raise ProtocolError("Expected a binary frame")
+        request = pb.ClientMessage()
+        try:
+            request.ParseFromString(message)
+        except DecodeError as e:
+            raise ProtocolError(f"Invalid message: {e}")
+        if request.event == pb.JOIN:
+            data = check_join({'event': 'join', 'username': request.username, 'group_name': request.group_name})
+        elif request.event == pb.CONTRIBUTE:
+            data = {'event': 'contribute', 'amount': request.amount}
+        else:
+            raise ProtocolError(f"Unknown event {request.event}")
+        if request.trace_id:
+            data['trace_id'] = request.trace_id
+        return data
+
+    def joined(self, username, group_name):
+        return pb.ServerMessage(event=pb.JOINED, username=username, group_name=group_name,
+                                trace_id=current_trace_id()).SerializeToString()
+
+    def contributed(self, username, amount, current_amount):
+        return pb.ServerMessage(
+            event=pb.CONTRIBUTED, username=username, amount=amount, current_amount=current_amount or 0,
+            trace_id=current_trace_id()
+        ).SerializeToString()
+
+    def error(self, code, text):
+        return pb.ServerMessage(event=pb.ERROR, error=code, message=text, trace_id=current_trace_id()).SerializeToString()
+
+    def update(self, message):
+        return pb.ServerMessage(
+            event=pb.GROUP_UPDATE,
+            group_name=message.get('group_name', ''),
+            username=message.get('username', ''),
+            amount=message.get('amount', 0),
+            current_amount=message.get('current_amount', 0),
+            trace_id=message.get('trace_id')
+        ).SerializeToString()
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS = {None: JSON_CODEC, BINARY_SUBPROTOCOL: BINARY_CODEC}
+
+
+def codec_for(subprotocol):
+    return CODECS[subprotocol]
+
+
+# Client side of the binary protocol, for tests, benchmarks and Python clients
+def encode_join(username, group_name, trace_id=None):
+    return pb.ClientMessage(event=pb.JOIN, username=username, group_name=group_name,
+                            trace_id=trace_id).SerializeToString()
+
+
+def encode_contribute(amount, trace_id=None):
+    return pb.ClientMessage(event=pb.CONTRIBUTE, amount=amount, trace_id=trace_id).SerializeToString()
+
+
+def decode_server_message(frame):
+    message = pb.ServerMessage()
+    message.ParseFromString(frame)
+    return message
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import uuid
+
+# Pub/sub backbones that carry group updates between WebSocket worker
+# processes. Each worker delivers an update to its own sockets immediately and
+# publishes it on the backbone; the other workers deliver it to theirs.
+#
+# Wire format of a backbone message: "<origin>\n<group key>\n<frame>", where
+# origin identifies the publishing worker so it can skip its own messages.
+
+
+def encode_message(origin, group_key, frame):
+    return f"{origin}\n{group_key}\n{frame}"
+
+
+def decode_message(message):
+    origin, group_key, frame = message.split("\n", 2)
+    return origin, group_key, frame
+
+
+# Seconds between attempts to resubscribe after the Redis connection is lost,
+# doubled after every failed attempt up to the maximum
+RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 30
+
+
+# Backbone over Redis pub/sub (the same Redis instance UserService uses). If
+# the subscription's connection drops, the listener logs it and resubscribes
+# with backoff; updates published by other workers in the meantime are missed.
+class RedisBackbone:
+    def __init__(self, url, channel='finance:group_updates', reconnect_delay=RECONNECT_DELAY,
+                 max_reconnect_delay=MAX_RECONNECT_DELAY):
+        self.url = url
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.reconnects = 0
+        self._redis = None
+        self._listener = None
+
+    async def start(self, on_message):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(self.url)
+        pubsub = await self._subscribe()
+        self._listener = asyncio.ensure_future(self._listen(pubsub, on_message))
+
+    async def _subscribe(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel)
+        return pubsub
+
+    async def _listen(self, pubsub, on_message):
+        # Runs until close()
+        delay = self.reconnect_delay
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = await self._subscribe()
+                    self.reconnects += 1
+                    logging.info(f"Resubscribed to {self.channel}")
+                    delay = self.reconnect_delay
+                async for message in pubsub.listen():
+                    try:
+                        origin, group_key, frame = decode_message(message['data'].decode('utf-8'))
+                    except ValueError as e:
+                        logging.warning(f"Skipped a malformed message on {self.channel}: {e}")
+                        continue
+                    if origin != self.origin:
+                        on_message(group_key, frame)
+                error = 'subscription ended'
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = repr(e)
+            logging.warning(f"Lost the subscription to {self.channel} ({error}), "
+                            f"resubscribing in {delay:.1f}s; group updates from other workers are missed until then")
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+                pubsub = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def publish(self, group_key, frame):
+        await self._redis.publish(self.channel, encode_message(self.origin, group_key, frame))
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+
+# In-process stand-in for tests and single-host experiments: every
+# LocalBackbone created from the same hub sees the others' messages
+class LocalHub:
+    def __init__(self):
+        self.subscribers = []
+
+    def backbone(self):
+        return LocalBackbone(self)
+
+
+class LocalBackbone:
+    def __init__(self, hub):
+        self.hub = hub
+        self.origin = uuid.uuid4().hex
+        self._on_message = None
+
+    async def start(self, on_message):
+        self._on_message = on_message
+        self.hub.subscribers.append(self)
+
+    async def publish(self, group_key, frame):
+        message = encode_message(self.origin, group_key, frame)
+        for backbone in list(self.hub.subscribers):
+            origin, key, payload = decode_message(message)
+            if origin != backbone.origin:
+                backbone._on_message(key, payload)
+
+    async def close(self):
+        if self in self.hub.subscribers:
+            self.hub.subscribers.remove(self)
@@ -0,0 +1,213 @@
+import argparse
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+
+from summaries import CONTRIBUTION_TYPE, summary_update, totals_differ
+
+# Time-bucketed totals of the transactions, kept in the `rollups` collection
+# so that "spend per month" or "group progress over time" reads one document
+# per bucket instead of every transaction in the range:
+#
+#   {period: 'day' | 'month', scope: 'user' | 'group', owner_id, start,
+#    total_amount, transaction_count, by_type: {<transaction_type>: {amount, count}}}
+#
+# start is the UTC midnight that opens the day or month. Every transaction
+# counts towards its user's daily and monthly buckets, and a group
+# contribution towards its group's as well. Both periods share one
+# collection so a write bumps all of its buckets with a single bulk_write.
+# Buckets without transactions are never created.
+#
+# The documents are maintained incrementally on every transaction and
+# contribution write, keyed by the server-assigned `ts` of the transaction.
+# Run `python rollups.py backfill` once to timestamp the transactions written
+# before `ts` existed and add them to the rollups, `python rollups.py check`
+# to compare the rollups against a full recomputation and
+# `python rollups.py rebuild` to regenerate them.
+
+PERIODS = ('day', 'month')
+
+# Transactions read per batch by backfill
+BACKFILL_BATCH_SIZE = 1000
+
+
+def timestamp():
+    # Naive UTC, which is what pymongo hands back for stored dates
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(ts, period):
+    if period == 'day':
+        return datetime(ts.year, ts.month, ts.day)
+    return datetime(ts.year, ts.month, 1)
+
+
+def bucket_keys(transaction):
+    # (period, scope, owner_id, start) of every bucket a transaction counts towards
+    owners = [('user', transaction['user_id'])]
+    if transaction.get('group_id') is not None:
+        owners.append(('group', transaction['group_id']))
+    return [
+        (period, scope, owner_id, bucket_start(transaction['ts'], period))
+        for period in PERIODS for scope, owner_id in owners
+    ]
+
+
+def bucket_filter(key):
+    period, scope, owner_id, start = key
+    return {'period': period, 'scope': scope, 'owner_id': owner_id, 'start': start}
+
+
+def rollup_updates(transactions):
+    # One upsert per (bucket, type) for a batch of transaction documents
+    totals = defaultdict(lambda: [0, 0])
+    for t in transactions:
+        transaction_type = t.get('transaction_type', CONTRIBUTION_TYPE)
+        for key in bucket_keys(t):
+            totals[key, transaction_type][0] += t['amount']
+            totals[key, transaction_type][1] += 1
+    return [
+        UpdateOne(bucket_filter(key), summary_update(amount, transaction_type, count), upsert=True)
+        for (key, transaction_type), (amount, count) in totals.items()
+    ]
+
+
+def serialize_rollup(rollup):
+    return {
+        'start': rollup['start'].date().isoformat(),
+        'total_amount': rollup.get('total_amount', 0),
+        'transaction_count': rollup.get('transaction_count', 0),
+        'by_type': rollup.get('by_type', {})
+    }
+
+
+def parse_bucket(value, period):
+    # "YYYY-MM-DD" or "YYYY-MM", rounded down to the start of its bucket
+    try:
+        if len(value) == 7:
+            value += '-01'
+        return bucket_start(datetime.strptime(value, '%Y-%m-%d'), period)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD or YYYY-MM")
+
+
+def find_range(rollups, scope, owner_id, period, start=None, end=None, limit=None):
+    # The owner's buckets with start <= bucket < end, oldest first. Served by
+    # the (scope, owner_id, period, start) index, so the cost grows with the
+    # number of buckets returned, not with the transactions behind them.
+    query = {'scope': scope, 'owner_id': owner_id, 'period': period}
+    if start is not None or end is not None:
+        query['start'] = {}
+        if start is not None:
+            query['start']['$gte'] = start
+        if end is not None:
+            query['start']['$lt'] = end
+    cursor = rollups.find(query, {'_id': False, 'start': True, 'total_amount': True,
+                                  'transaction_count': True, 'by_type': True}).sort('start', 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+
+def compute(transactions):
+    # Full recomputation, as {bucket key: rollup document}; memory grows with
+    # the number of buckets, not transactions
+    rollups = {}
+    projection = {'user_id': True, 'group_id': True, 'amount': True, 'transaction_type': True, 'ts': True}
+    for t in transactions.find({'ts': {'$exists': True}}, projection):
+        transaction_type = t.get('transaction_type', CONTRIBUTION_TYPE)
+        for key in bucket_keys(t):
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = dict(bucket_filter(key), total_amount=0, transaction_count=0, by_type={})
+            rollup['total_amount'] += t['amount']
+            rollup['transaction_count'] += 1
+            totals = rollup['by_type'].setdefault(transaction_type, {'amount': 0, 'count': 0})
+            totals['amount'] += t['amount']
+            totals['count'] += 1
+    return rollups
+
+
+def backfill(transactions, rollups, batch_size=BACKFILL_BATCH_SIZE):
+    # Timestamps the transactions that have no ts with the creation time of
+    # their ObjectId and adds them to the rollups, a batch at a time. New
+    # writes already carry ts and are counted as they happen, so this can run
+    # while the service is up. A batch interrupted between its two writes is
+    # already in the rollups and gets counted again by the next run, so follow
+    # an interrupted run with check (and rebuild if it finds differences).
+    # Batches are read in _id order from where the previous one ended, so
+    # each one walks the _id index forward instead of scanning the collection
+    # again from the start. Returns the number of transactions backfilled.
+    backfilled = 0
+    query = {'ts': {'$exists': False}}
+    while True:
+        batch = list(transactions.find(
+            query, {'user_id': True, 'group_id': True, 'amount': True, 'transaction_type': True}
+        ).sort('_id', 1).limit(batch_size))
+        if not batch:
+            return backfilled
+        query = {'_id': {'$gt': batch[-1]['_id']}, 'ts': {'$exists': False}}
+        for t in batch:
+            t['ts'] = t['_id'].generation_time.replace(tzinfo=None)
+        rollups.bulk_write(rollup_updates(batch), ordered=False)
+        transactions.bulk_write([
+            UpdateOne({'_id': t['_id'], 'ts': {'$exists': False}}, {'$set': {'ts': t['ts']}}) for t in batch
+        ], ordered=False)
+        backfilled += len(batch)
+
+
+def rebuild(transactions, rollups):
+    # Replaces every bucket with its recomputed totals and drops the rest.
+    # Increments made by writes that land meanwhile can be lost, so rebuild
+    # while writes are paused or follow up with a check.
+    expected = compute(transactions)
+    if expected:
+        rollups.bulk_write([ReplaceOne(bucket_filter(key), doc, upsert=True) for key, doc in expected.items()],
+                           ordered=False)
+    stale = [r['_id'] for r in rollups.find({}, {'period': True, 'scope': True, 'owner_id': True, 'start': True})
+             if (r['period'], r['scope'], r['owner_id'], r['start']) not in expected]
+    if stale:
+        rollups.delete_many({'_id': {'$in': stale}})
+    return len(expected)
+
+
+def check(transactions, rollups):
+    # Returns a list of (bucket key, expected, stored) for every bucket that
+    # doesn't match a full recomputation
+    expected = compute(transactions)
+    mismatches = []
+    for stored in rollups.find({}):
+        key = (stored['period'], stored['scope'], stored['owner_id'], stored['start'])
+        doc = expected.pop(key, None)
+        if doc is None or totals_differ(doc, stored):
+            mismatches.append((key, doc, stored))
+    mismatches.extend((key, doc, None) for key, doc in expected.items())
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the time-bucketed transaction rollups')
+    parser.add_argument('command', choices=['backfill', 'rebuild', 'check'])
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    finance_db = MongoClient(args.mongo_uri)['finances']
+    transactions, rollups = finance_db['transactions'], finance_db['rollups']
+
+    if args.command == 'backfill':
+        print(f"Backfilled {backfill(transactions, rollups, args.batch_size)} transactions")
+    elif args.command == 'rebuild':
+        print(f"Rebuilt {rebuild(transactions, rollups)} rollups")
+    else:
+        mismatches = check(transactions, rollups)
+        for key, expected, stored in mismatches:
+            print(f"Bucket {key}: expected {expected}, stored {stored}")
+        print(f"{len(mismatches)} inconsistent rollups")
+        sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+
+import websockets
+
+from protocol import codec_for
+
+# A socket with more than this many bytes waiting in its write buffer is
+# treated as a slow consumer (same as the websockets default write_limit)
+WRITE_BUFFER_LIMIT = 2 ** 16
+
+# A subscriber whose socket hasn't accepted a frame within this many seconds
+# is considered stuck and disconnected
+SEND_TIMEOUT = 10
+
+
+# One connected socket in a group room.
+#
+# While the socket keeps up, frames are written to it directly by
+# GroupRooms.deliver. Once its write buffer backs up, new frames go to a single
+# pending slot drained by a per-subscriber task, so a slow socket never holds
+# up the publisher or the other members. If several updates arrive before the
+# socket has drained, only the newest is sent.
+class Subscriber:
+    def __init__(self, websocket, send_timeout=SEND_TIMEOUT):
+        self.websocket = websocket
+        # Members get group updates in the protocol their socket negotiated
+        self.subprotocol = getattr(websocket, 'subprotocol', None)
+        self.send_timeout = send_timeout
+        self.coalesced = 0
+        self._frame = None
+        self._task = None
+        self._sending_since = None
+
+    def writable(self):
+        if self._task is not None:
+            return False
+        transport = getattr(self.websocket, 'transport', None)
+        return transport is not None and transport.get_write_buffer_size() <= WRITE_BUFFER_LIMIT
+
+    def offer(self, frame):
+        if self._frame is not None:
+            self.coalesced += 1
+        # Checked here rather than with a timeout around every send, which
+        # would cost a timer per frame per member
+        if self._sending_since is not None and time.monotonic() - self._sending_since > self.send_timeout:
+            self.close()
+            asyncio.ensure_future(self.websocket.close(code=1008, reason='Too slow to keep up with group updates'))
+            return
+        self._frame = frame
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._drain())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._frame = None
+
+    async def _drain(self):
+        try:
+            while self._frame is not None:
+                frame, self._frame = self._frame, None
+                self._sending_since = time.monotonic()
+                await self.websocket.send(frame)
+                self._sending_since = None
+        except websockets.exceptions.ConnectionClosed:
+            self._frame = None
+        finally:
+            self._task = None
+
+
+# Registry of the sockets that joined each group, used to fan out group
+# updates to every member. Rooms are keyed by the group id as a string so the
+# same key can travel over the pub/sub backbone when several worker processes
+# serve the same groups.
+class GroupRooms:
+    def __init__(self, send_timeout=SEND_TIMEOUT, backbone=None):
+        self.send_timeout = send_timeout
+        self.backbone = backbone
+        self._rooms = defaultdict(dict)  # group key -> {websocket: Subscriber}
+        self._publishes = set()
+        self.publish_failures = 0
+        self._publishing_failed = False
+
+    async def start(self):
+        # Start receiving the other workers' updates
+        if self.backbone is not None:
+            await self.backbone.start(self.deliver)
+
+    def join(self, group_id, websocket):
+        room = self._rooms[group_id]
+        if websocket not in room:
+            room[websocket] = Subscriber(websocket, self.send_timeout)
+
+    def leave(self, group_id, websocket):
+        room = self._rooms.get(group_id)
+        if room is None:
+            return
+        subscriber = room.pop(websocket, None)
+        if subscriber is not None:
+            subscriber.close()
+        if not room:
+            del self._rooms[group_id]
+
+    def members(self, group_id):
+        return len(self._rooms.get(group_id, ()))
+
+    @property
+    def connections(self):
+        return sum(len(room) for room in self._rooms.values())
+
+    def publish(self, group_id, message):
+        frame = json.dumps(message)
+        self.deliver(group_id, frame, message)
+        if self.backbone is not None:
+            task = asyncio.ensure_future(self.backbone.publish(group_id, frame))
+            self._publishes.add(task)
+            task.add_done_callback(self._published)
+        return frame
+
+    def _published(self, task):
+        self._publishes.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        # Logged when publishing starts and stops failing rather than once per
+        # update, which would flood the log for the length of an outage
+        if error is not None:
+            self.publish_failures += 1
+            if not self._publishing_failed:
+                self._publishing_failed = True
+                logging.warning(f"Group updates aren't reaching the other workers: {error!r}")
+        elif self._publishing_failed:
+            self._publishing_failed = False
+            logging.info(f"Group updates reach the other workers again ({self.publish_failures} failed so far)")
+
+    # frame is the JSON encoding of the update, which is what travels over the
+    # backbone; members that negotiated another protocol get it re-encoded,
+    # once per protocol rather than once per member
+    def deliver(self, group_id, frame, message=None):
+        frames = {None: frame}
+        ready = {}
+        for subscriber in self._rooms.get(group_id, {}).values():
+            subprotocol = subscriber.subprotocol
+            if subprotocol not in frames:
+                if message is None:
+                    message = json.loads(frame)
+                frames[subprotocol] = codec_for(subprotocol).update(message)
+            if subscriber.writable():
+                ready.setdefault(subprotocol, []).append(subscriber.websocket)
+            else:
+                subscriber.offer(frames[subprotocol])
+        # broadcast() encodes the frame once and writes it to every socket
+        # that keeps up without scheduling a task per member
+        for subprotocol, sockets in ready.items():
+            websockets.broadcast(sockets, frames[subprotocol])
@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+# Live service metrics for /status. Everything reported on the probe path is
+# a value kept in memory: the transaction count is refreshed by a background
+# thread and the other metrics are plain counters, so a health probe never
+# waits on Mongo.
+
+
+# Counts the connections of the MongoClients it is registered with
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self._lock = threading.Lock()
+
+    def _add(self, name, delta):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def connection_created(self, event):
+        self._add('open_connections', 1)
+
+    def connection_closed(self, event):
+        self._add('open_connections', -1)
+
+    def connection_checked_out(self, event):
+        self._add('checked_out', 1)
+
+    def connection_checked_in(self, event):
+        self._add('checked_out', -1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+
+class StatusMonitor:
+    def __init__(self, collection, interval=10):
+        self.collection = collection
+        self.interval = interval
+        self.transactions_estimate = None
+        self.refreshed_at = None
+        self._gauges = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_gauge(self, name, read):
+        # read is called on every probe and must not do any I/O
+        self._gauges[name] = read
+
+    def refresh(self):
+        try:
+            # Read from the collection metadata rather than by scanning it
+            self.transactions_estimate = self.collection.estimated_document_count()
+            self.refreshed_at = time.time()
+        except PyMongoError as e:
+            logging.warning(f"Could not refresh the transaction count: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='status-refresh', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def metrics(self):
+        return {name: read() for name, read in self._gauges.items()}
@@ -0,0 +1,143 @@
+import argparse
+import math
+import sys
+from collections import defaultdict
+
+from pymongo import MongoClient, UpdateOne
+
+# Per-user financial summaries, kept in the `summaries` collection so that a
+# user's totals are a single document lookup instead of a scan over all of
+# their transactions:
+#
+#   {_id: user_id, total_amount, transaction_count,
+#    by_type: {<transaction_type>: {amount, count}}}
+#
+# The documents are maintained incrementally with $inc on every transaction
+# and contribution write. Run `python summaries.py rebuild` to regenerate all
+# of them from the transactions with one aggregation pipeline, and
+# `python summaries.py check` to compare them against a full recomputation.
+
+# Transaction type recorded for group contributions made over the WebSocket
+CONTRIBUTION_TYPE = 'group_contribution'
+
+
+def valid_transaction_type(transaction_type):
+    # Types become field names in by_type
+    return isinstance(transaction_type, str) and '.' not in transaction_type and not transaction_type.startswith('$')
+
+
+def valid_amount(amount):
+    # Amounts are $inc'd into the summaries and rollups, where a NaN or an
+    # infinity would stick for good
+    return isinstance(amount, (int, float)) and not isinstance(amount, bool) and math.isfinite(amount)
+
+
+def summary_update(amount, transaction_type, count=1):
+    return {'$inc': {
+        'total_amount': amount,
+        'transaction_count': count,
+        f'by_type.{transaction_type}.amount': amount,
+        f'by_type.{transaction_type}.count': count
+    }}
+
+
+def summary_updates(transactions):
+    # One upsert per (user, type) for a batch of transaction documents
+    totals = defaultdict(lambda: [0, 0])
+    for t in transactions:
+        key = (t['user_id'], t.get('transaction_type', CONTRIBUTION_TYPE))
+        totals[key][0] += t['amount']
+        totals[key][1] += 1
+    return [
+        UpdateOne({'_id': user_id}, summary_update(amount, transaction_type, count), upsert=True)
+        for (user_id, transaction_type), (amount, count) in totals.items()
+    ]
+
+
+def serialize_summary(summary):
+    return {
+        'user_id': str(summary['_id']),
+        'total_amount': summary.get('total_amount', 0),
+        'transaction_count': summary.get('transaction_count', 0),
+        'by_type': summary.get('by_type', {})
+    }
+
+
+# Full recomputation of every summary from the transactions collection
+SUMMARY_PIPELINE = [
+    {'$group': {
+        '_id': {'user_id': '$user_id', 'type': {'$ifNull': ['$transaction_type', CONTRIBUTION_TYPE]}},
+        'amount': {'$sum': '$amount'},
+        'count': {'$sum': 1}
+    }},
+    {'$group': {
+        '_id': '$_id.user_id',
+        'total_amount': {'$sum': '$amount'},
+        'transaction_count': {'$sum': '$count'},
+        'by_type': {'$push': {'k': '$_id.type', 'v': {'amount': '$amount', 'count': '$count'}}}
+    }},
+    {'$project': {'total_amount': 1, 'transaction_count': 1, 'by_type': {'$arrayToObject': '$by_type'}}}
+]
+
+
+def rebuild(transactions, summaries):
+    # $out swaps the new collection in atomically. Increments made by writes
+    # that land while the pipeline runs are lost, so rebuild while writes are
+    # paused or follow up with a check.
+    list(transactions.aggregate(SUMMARY_PIPELINE + [{'$out': summaries.name}]))
+
+
+def _amounts_differ(a, b):
+    return abs((a or 0) - (b or 0)) > 1e-6
+
+
+def check(transactions, summaries):
+    # Returns a list of (user_id, expected, stored) for every summary that
+    # doesn't match a full recomputation. The recomputed summaries are held in
+    # memory and the stored ones read in a single pass.
+    expected = {summary['_id']: summary for summary in transactions.aggregate(SUMMARY_PIPELINE)}
+    mismatches = []
+    for stored in summaries.find({}):
+        summary = expected.pop(stored['_id'], None)
+        if summary is None or totals_differ(summary, stored):
+            mismatches.append((stored['_id'], summary, stored))
+    mismatches.extend((user_id, summary, None) for user_id, summary in expected.items())
+    return mismatches
+
+
+def totals_differ(expected, stored):
+    if expected['transaction_count'] != stored.get('transaction_count'):
+        return True
+    if _amounts_differ(expected['total_amount'], stored.get('total_amount')):
+        return True
+    stored_types = stored.get('by_type', {})
+    if set(expected['by_type']) != set(stored_types):
+        return True
+    return any(
+        totals['count'] != stored_types[t].get('count') or _amounts_differ(totals['amount'], stored_types[t].get('amount'))
+        for t, totals in expected['by_type'].items()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the per-user transaction summaries')
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    args = parser.parse_args()
+
+    finance_db = MongoClient(args.mongo_uri)['finances']
+    transactions, summaries = finance_db['transactions'], finance_db['summaries']
+
+    if args.command == 'rebuild':
+        rebuild(transactions, summaries)
+        print(f"Rebuilt {summaries.estimated_document_count()} summaries")
+    else:
+        mismatches = check(transactions, summaries)
+        for user_id, expected, stored in mismatches:
+            print(f"User {user_id}: expected {expected}, stored {stored}")
+        print(f"{len(mismatches)} inconsistent summaries")
+        sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+import app  # Import the Flask app and its collections
+import json
+import unittest
+import grpc
+from unittest.mock import AsyncMock, MagicMock, patch
+import mongomock
+import websockets
+import protocol
+import rollups
+import summaries
+import tracing
+from bson import ObjectId
+from datetime import datetime
+from rooms import GroupRooms
+
+
+class TestFinanceService(unittest.TestCase):
+    def setUp(self):
+        self.app = app.app.test_client()
+        self.app.testing = True
+        self.db = mongomock.MongoClient()['finances']
+        self.transactions = self.db['transactions']
+        self.summaries = self.db['summaries']
+        collections = (
+            ('contributions_collection', self.transactions), ('summaries_collection', self.summaries),
+            ('groups_collection', self.db['groups']), ('users_collection', mongomock.MongoClient()['users']['users']),
+            ('rollups_collection', self.db['rollups'])
+        )
+        for name, collection in collections:
+            patcher = patch(f'app.{name}', collection)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user_id = ObjectId()
+        self.transactions.insert_many([
+            {'user_id': self.user_id, 'amount': i, 'transaction_type': 'expense', 'description': f'item {i}'}
+            for i in range(25)
+        ])
+
+    def test_get_transactions_pages_with_cursor(self):
+        seen = []
+        after = None
+        while True:
+            query = {'limit': 10}
+            if after:
+                query['after'] = after
+            response = self.app.get(f'/transactions/{self.user_id}', query_string=query)
+            self.assertEqual(response.status_code, 200)
+            page = response.get_json()
+            seen.extend(t['amount'] for t in page['transactions'])
+            after = page['next_after']
+            if not after:
+                break
+        self.assertEqual(seen, list(range(25)))
+
+    def test_get_transactions_ndjson_stream(self):
+        response = self.app.get(f'/transactions/{self.user_id}?format=ndjson')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(set(rows[0]), {'id', 'amount', 'type', 'description'})
+
+    def test_get_transactions_not_found(self):
+        response = self.app.get(f'/transactions/{ObjectId()}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_transactions_invalid_cursor(self):
+        response = self.app.get(f'/transactions/{self.user_id}?after=not-an-id')
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_transaction_updates_summary(self):
+        for amount, transaction_type in ((10, 'income'), (4, 'expense'), (6, 'income')):
+            response = self.app.post('/transactions', json={
+                'user_id': str(self.user_id),
+                'amount': amount,
+                'transaction_type': transaction_type
+            })
+            self.assertEqual(response.status_code, 201)
+
+        response = self.app.get(f'/transactions/{self.user_id}/summary')
+        self.assertEqual(response.status_code, 200)
+        summary = response.get_json()
+        self.assertEqual(summary['transaction_count'], 3)
+        self.assertEqual(summary['by_type']['income'], {'amount': 16, 'count': 2})
+        # The 25 fixture transactions were inserted without a summary
+        self.assertEqual(len(summaries.check(self.transactions, self.summaries)), 1)
+
+        summaries.rebuild(self.transactions, self.summaries)
+        self.assertEqual(summaries.check(self.transactions, self.summaries), [])
+        summary = self.app.get(f'/transactions/{self.user_id}/summary').get_json()
+        self.assertEqual(summary['by_type']['expense'], {'amount': 304, 'count': 26})
+
+        # A summary without transactions, and transactions without a summary
+        stray = ObjectId()
+        self.summaries.insert_one({'_id': stray, 'total_amount': 1, 'transaction_count': 1, 'by_type': {}})
+        self.summaries.delete_one({'_id': self.user_id})
+        mismatches = summaries.check(self.transactions, self.summaries)
+        self.assertEqual(sorted((m[0], m[1] is None, m[2] is None) for m in mismatches),
+                         sorted([(stray, True, False), (self.user_id, False, True)]))
+
+    def test_rollups_by_period(self):
+        for amount in (10, 4):
+            self.app.post('/transactions', json={'user_id': str(self.user_id), 'amount': amount,
+                                                 'transaction_type': 'expense'})
+        today = rollups.timestamp().date().isoformat()
+        body = self.app.get(f'/transactions/{self.user_id}/rollups?period=day&from={today}').get_json()
+        self.assertEqual(body['buckets'], [{'start': today, 'total_amount': 14, 'transaction_count': 2,
+                                            'by_type': {'expense': {'amount': 14, 'count': 2}}}])
+        self.assertIsNone(body['next_from'])
+        body = self.app.get(f'/transactions/{self.user_id}/rollups?to={today}').get_json()
+        self.assertEqual(body['buckets'], [])
+
+    def test_group_rollups_pages_by_bucket(self):
+        group_id = ObjectId()
+        self.db['rollups'].insert_many([
+            {'period': 'month', 'scope': 'group', 'owner_id': group_id, 'start': datetime(2026, month, 1),
+             'total_amount': month, 'transaction_count': 1, 'by_type': {}}
+            for month in (1, 2, 3, 5)
+        ])
+        body = self.app.get(f'/groups/{group_id}/rollups?from=2026-02&limit=2').get_json()
+        self.assertEqual([b['start'] for b in body['buckets']], ['2026-02-01', '2026-03-01'])
+        self.assertEqual(body['next_from'], '2026-05-01')
+        body = self.app.get(f"/groups/{group_id}/rollups?from={body['next_from']}").get_json()
+        self.assertEqual([b['total_amount'] for b in body['buckets']], [5])
+
+    def test_rollups_reject_bad_arguments(self):
+        for query in ('period=week', 'from=soon', 'limit=0'):
+            response = self.app.get(f'/transactions/{self.user_id}/rollups?{query}')
+            self.assertEqual(response.status_code, 400)
+
+    def test_create_transaction_rejects_unsafe_type(self):
+        response = self.app.post('/transactions', json={
+            'user_id': str(self.user_id),
+            'amount': 1,
+            'transaction_type': 'a.b'
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_transaction_rejects_invalid_amounts_before_writing(self):
+        for amount in ('"6000"', 'NaN', 'Infinity', 'true'):
+            response = self.app.post('/transactions', content_type='application/json', data=(
+                f'{{"user_id": "{self.user_id}", "amount": {amount}, "transaction_type": "expense"}}'
+            ))
+            self.assertEqual(response.status_code, 400)
+        response = self.app.post('/transactions', json={'user_id': 'nope', 'amount': 1, 'transaction_type': 'expense'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.transactions.count_documents({}), 25)
+        self.assertIsNone(self.summaries.find_one({'_id': self.user_id}))
+
+    def test_summary_not_found(self):
+        response = self.app.get(f'/transactions/{ObjectId()}/summary')
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_import_reports_row_errors(self):
+        rows = [
+            {'user_id': str(self.user_id), 'amount': 5, 'transaction_type': 'income'},
+            {'user_id': str(self.user_id), 'amount': 'five', 'transaction_type': 'income'},
+            {'user_id': 'not-an-id', 'amount': 5, 'transaction_type': 'income'},
+            {'user_id': str(self.user_id), 'amount': 7, 'transaction_type': 'income', 'description': 'salary'},
+        ]
+        response = self.app.post('/transactions/bulk', json=rows)
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        self.assertEqual(result['inserted'], 2)
+        self.assertEqual([e['row'] for e in result['errors']], [1, 2])
+        summary = self.app.get(f'/transactions/{self.user_id}/summary').get_json()
+        self.assertEqual(summary['by_type']['income'], {'amount': 12, 'count': 2})
+
+    def test_bulk_import_rejects_non_finite_amounts(self):
+        body = '\n'.join(
+            f'{{"user_id": "{self.user_id}", "amount": {amount}, "transaction_type": "income"}}'
+            for amount in (5, 'NaN', 'Infinity', '-Infinity')
+        )
+        result = self.app.post('/transactions/bulk', data=body, content_type='application/x-ndjson').get_json()
+        self.assertEqual(result['inserted'], 1)
+        self.assertEqual([e['row'] for e in result['errors']], [1, 2, 3])
+        self.assertEqual(result['errors'][0]['error'], 'amount must be a finite number')
+        summary = self.app.get(f'/transactions/{self.user_id}/summary').get_json()
+        self.assertEqual(summary['by_type']['income'], {'amount': 5, 'count': 1})
+
+    def test_bulk_import_retry_with_idempotency_key(self):
+        # mongomock ignores partialFilterExpression, so the fixture rows
+        # without an import_key would collide in the unique index
+        self.transactions.delete_many({})
+        app.ensure_indexes()
+        body = '\n'.join(
+            json.dumps({'user_id': str(self.user_id), 'amount': i + 1, 'transaction_type': 'income'})
+            for i in range(30)
+        )
+        for expected_inserted, expected_duplicates in ((30, 0), (0, 30)):
+            response = self.app.post('/transactions/bulk', data=body, content_type='application/x-ndjson',
+                                     headers={'Idempotency-Key': 'statement-2026-10'})
+            result = response.get_json()
+            self.assertEqual((result['inserted'], result['duplicates']), (expected_inserted, expected_duplicates))
+        self.assertEqual(self.transactions.count_documents({'transaction_type': 'income'}), 30)
+
+    def test_bulk_import_rejects_non_array(self):
+        response = self.app.post('/transactions/bulk', json={'user_id': str(self.user_id)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_status_serves_background_estimate(self):
+        with patch.object(app.status_monitor, 'collection', self.transactions):
+            app.status_monitor.refresh()
+        with patch.object(self.transactions, 'count_documents') as count_documents:
+            response = self.app.get('/status')
+            count_documents.assert_not_called()
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['total_transactions'], 25)
+        self.assertTrue(body['total_transactions_estimated'])
+        self.assertIn('active_websockets', body['metrics'])
+        self.assertIn('mongo_connections_in_use', body['metrics'])
+
+    def test_status_exact_count(self):
+        self.transactions.insert_one({'user_id': self.user_id, 'amount': 1, 'transaction_type': 'expense'})
+        body = self.app.get('/status?exact=1').get_json()
+        self.assertEqual(body['total_transactions'], 26)
+        self.assertFalse(body['total_transactions_estimated'])
+
+
+class TestGroupSavingWebSocket(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.group_id = ObjectId()
+        engine = AsyncMock()
+        engine.contribute.return_value = 12
+        patches = (
+            patch('app.resolve_user_id', AsyncMock(side_effect=lambda name: ObjectId() if name == 'alice' else None)),
+            patch('app.resolve_group_id', AsyncMock(return_value=self.group_id)),
+            patch('app.contribution_engine', engine),
+            patch('app.group_rooms', GroupRooms()),
+        )
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.server = await websockets.serve(app.group_saving_goal_handler, '127.0.0.1', 0,
+                                             **app.websocket_server_options('none'))
+        self.uri = f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_json_protocol(self):
+        async with websockets.connect(self.uri) as ws:
+            self.assertIsNone(ws.subprotocol)
+            await ws.send(json.dumps({'event': 'contribute', 'amount': 5}))
+            self.assertEqual(await ws.recv(), 'You must join a group first.')
+            # Malformed joins are answered, not dropped with 1011
+            await ws.send(json.dumps({'event': 'join'}))
+            self.assertEqual(await ws.recv(), 'join needs a non-empty string username')
+            await ws.send(json.dumps({'event': 'join', 'username': 5, 'group_name': 'trip'}))
+            self.assertEqual(await ws.recv(), 'join needs a non-empty string username')
+            await ws.send(json.dumps({'event': 'join', 'username': 'alice', 'group_name': 'trip'}))
+            self.assertEqual(await ws.recv(), 'User alice joined group trip')
+            await ws.send(json.dumps({'event': 'contribute', 'amount': 5}))
+            self.assertEqual(json.loads(await ws.recv())['current_amount'], 12)
+            self.assertEqual(await ws.recv(), 'User alice contributed 5 to the group saving goal!')
+            # json.dumps writes NaN and Infinity, which json.loads accepts
+            for amount in ('5', float('nan'), float('inf'), 0, -5):
+                await ws.send(json.dumps({'event': 'contribute', 'amount': amount}))
+                self.assertEqual(await ws.recv(), 'The amount must be a positive number.')
+
+    async def test_binary_protocol(self):
+        async with websockets.connect(self.uri, subprotocols=protocol.SUBPROTOCOLS) as ws:
+            self.assertEqual(ws.subprotocol, protocol.BINARY_SUBPROTOCOL)
+            await ws.send(protocol.encode_join('bob', 'trip'))
+            error = protocol.decode_server_message(await ws.recv())
+            self.assertEqual((error.event, error.error), (protocol.pb.ERROR, protocol.USER_NOT_FOUND))
+            await ws.send(b'\xff')
+            error = protocol.decode_server_message(await ws.recv())
+            self.assertEqual(error.error, protocol.BAD_MESSAGE)
+
+            await ws.send(protocol.encode_join('alice', 'trip'))
+            self.assertEqual(protocol.decode_server_message(await ws.recv()).event, protocol.pb.JOINED)
+            await ws.send(protocol.encode_contribute(5))
+            update = protocol.decode_server_message(await ws.recv())
+            reply = protocol.decode_server_message(await ws.recv())
+            self.assertEqual((update.event, update.current_amount), (protocol.pb.GROUP_UPDATE, 12))
+            self.assertEqual((reply.event, reply.amount, reply.current_amount), (protocol.pb.CONTRIBUTED, 5, 12))
+            await ws.send(protocol.encode_contribute(float('nan')))
+            self.assertEqual(protocol.decode_server_message(await ws.recv()).error, protocol.BAD_MESSAGE)
+
+    async def test_user_service_outage_is_an_error_frame(self):
+        class Unavailable(grpc.RpcError):
+            def code(self):
+                return grpc.StatusCode.UNAVAILABLE
+        user_service = MagicMock()
+        user_service.get_user.side_effect = Unavailable()
+        with patch('app.user_service', user_service):
+            with self.assertRaises(app.UserServiceUnavailable):
+                await app.find_user_id('alice')
+        with patch('app.resolve_user_id', AsyncMock(side_effect=app.UserServiceUnavailable())):
+            async with websockets.connect(self.uri, subprotocols=protocol.SUBPROTOCOLS) as ws:
+                await ws.send(protocol.encode_join('alice', 'trip'))
+                error = protocol.decode_server_message(await ws.recv())
+                self.assertEqual(error.error, protocol.SERVICE_UNAVAILABLE)
+                # The socket stays open
+                await ws.send(protocol.encode_contribute(5))
+                self.assertEqual(protocol.decode_server_message(await ws.recv()).error, protocol.NOT_IN_GROUP)
+
+    async def test_messages_are_traced_under_their_trace_id(self):
+        tracer = tracing.Tracer(enabled=True, logger=MagicMock())
+        with patch.object(tracing, 'tracer', tracer):
+            async with websockets.connect(self.uri, subprotocols=protocol.SUBPROTOCOLS) as ws:
+                await ws.send(protocol.encode_join('alice', 'trip', trace_id='join-1'))
+                self.assertEqual(protocol.decode_server_message(await ws.recv()).trace_id, 'join-1')
+                await ws.send(protocol.encode_contribute(5, trace_id='contribute-1'))
+                update = protocol.decode_server_message(await ws.recv())
+                reply = protocol.decode_server_message(await ws.recv())
+                self.assertEqual((update.trace_id, reply.trace_id), ('contribute-1', 'contribute-1'))
+            async with websockets.connect(self.uri) as ws:
+                await ws.send(json.dumps({'event': 'join', 'username': 'alice', 'group_name': 'trip'}))
+                await ws.recv()
+                await ws.send(json.dumps({'event': 'contribute', 'amount': 5, 'trace_id': 'contribute-2'}))
+                self.assertEqual(json.loads(await ws.recv())['trace_id'], 'contribute-2')
+        traces = {record['trace_id']: record['name'] for record in tracer.recent}
+        self.assertEqual(traces['join-1'], 'ws.join')
+        self.assertEqual(traces['contribute-1'], 'ws.contribute')
+        self.assertEqual(traces['contribute-2'], 'ws.contribute')
+
+    def test_compression_setting(self):
+        self.assertIn('extensions', app.websocket_server_options('deflate'))
+        self.assertNotIn('extensions', app.websocket_server_options('none'))
+        with self.assertRaises(ValueError):
+            app.websocket_server_options('gzip')
+
+
+if __name__ == '__main__':
+    unittest.main()
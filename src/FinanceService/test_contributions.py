@@ -0,0 +1,135 @@
+import asyncio
+import unittest
+import unittest.mock
+import mongomock
+from async_mongo import AsyncCollection
+from bench_support import LatencyCollection
+from contributions import ContributionEngine, ContributionBatcher
+import rollups
+import summaries
+
+
+class TestContributionEngine(unittest.TestCase):
+    def setUp(self):
+        db = mongomock.MongoClient()['finances']
+        self.group_id = db['groups'].insert_one({'group_name': 'trip', 'current_amount': 0}).inserted_id
+        # Every call takes a simulated round trip on the executor threads, so
+        # concurrent contributors really do overlap
+        self.groups = LatencyCollection(db['groups'], 0.001)
+        self.contributions = LatencyCollection(db['transactions'], 0.001)
+        self.engine = ContributionEngine(AsyncCollection(self.contributions), AsyncCollection(self.groups))
+
+    def test_no_lost_updates_with_parallel_contributors(self):
+        async def contribute_all():
+            return await asyncio.gather(*(
+                self.engine.contribute(f'user{i}', self.group_id, 1) for i in range(1000)
+            ))
+
+        totals = asyncio.run(contribute_all())
+
+        group = self.groups.collection.find_one({'_id': self.group_id})
+        self.assertEqual(group['current_amount'], 1000)
+        self.assertEqual(self.contributions.collection.count_documents({'group_id': self.group_id}), 1000)
+        # Each contributor saw its own increment applied exactly once
+        self.assertEqual(sorted(totals), list(range(1, 1001)))
+
+    def test_single_round_trip_per_collection(self):
+        asyncio.run(self.engine.contribute('user0', self.group_id, 5))
+        self.assertEqual(self.groups.calls, 1)
+        self.assertEqual(self.contributions.calls, 1)
+
+    def test_summaries_match_full_recomputation(self):
+        summaries_collection = self.groups.collection.database['summaries']
+        engine = ContributionEngine(AsyncCollection(self.contributions), AsyncCollection(self.groups),
+                                    AsyncCollection(LatencyCollection(summaries_collection, 0)))
+
+        async def contribute_all():
+            await asyncio.gather(*(engine.contribute(f'user{i % 7}', self.group_id, i) for i in range(100)))
+
+        asyncio.run(contribute_all())
+        self.assertEqual(summaries.check(self.contributions.collection, summaries_collection), [])
+        self.assertEqual(summaries_collection.find_one({'_id': 'user0'})['by_type']['group_contribution']['count'], 15)
+
+    def test_rollups_match_full_recomputation(self):
+        rollups_collection = self.groups.collection.database['rollups']
+        engine = ContributionEngine(AsyncCollection(self.contributions), AsyncCollection(self.groups),
+                                    rollups=AsyncCollection(LatencyCollection(rollups_collection, 0)))
+
+        async def contribute_all():
+            await asyncio.gather(*(engine.contribute(f'user{i % 7}', self.group_id, i) for i in range(100)))
+
+        asyncio.run(contribute_all())
+        self.assertEqual(rollups.check(self.contributions.collection, rollups_collection), [])
+        group = rollups.find_range(rollups_collection, 'group', self.group_id, 'month')
+        self.assertEqual(sum(b['total_amount'] for b in group), sum(range(100)))
+
+    def test_missing_group(self):
+        total = asyncio.run(self.engine.contribute('user0', 'missing', 5))
+        self.assertIsNone(total)
+
+
+class TestContributionBatcher(unittest.TestCase):
+    def setUp(self):
+        db = mongomock.MongoClient()['finances']
+        self.group_ids = [
+            db['groups'].insert_one({'group_name': name, 'current_amount': 10}).inserted_id
+            for name in ('trip', 'party')
+        ]
+        self.groups = LatencyCollection(db['groups'], 0.001)
+        self.contributions = LatencyCollection(db['transactions'], 0.001)
+
+    def batcher(self, **kwargs):
+        return ContributionBatcher(AsyncCollection(self.contributions), AsyncCollection(self.groups), **kwargs)
+
+    def test_size_threshold_coalesces_writes(self):
+        async def contribute_all():
+            batcher = self.batcher(max_batch=500, max_delay=60)
+            return await asyncio.gather(*(
+                batcher.contribute(f'user{i}', self.group_ids[i % 2], 1) for i in range(1000)
+            ))
+
+        totals = asyncio.run(contribute_all())
+
+        # Two flushes: one insert_many and one $inc per group each
+        self.assertEqual(self.contributions.calls, 2)
+        self.assertEqual(self.groups.calls, 4)
+        self.assertEqual(self.contributions.collection.count_documents({}), 1000)
+        for group_id in self.group_ids:
+            self.assertEqual(self.groups.collection.find_one({'_id': group_id})['current_amount'], 510)
+        self.assertEqual(sorted(totals), sorted(list(range(11, 511)) * 2))
+
+    def test_batched_summaries_match_full_recomputation(self):
+        summaries_collection = self.groups.collection.database['summaries']
+
+        async def contribute_all():
+            batcher = ContributionBatcher(AsyncCollection(self.contributions), AsyncCollection(self.groups),
+                                          AsyncCollection(LatencyCollection(summaries_collection, 0)), max_batch=64)
+            await asyncio.gather(*(
+                batcher.contribute(f'user{i % 7}', self.group_ids[i % 2], i) for i in range(200)
+            ))
+
+        asyncio.run(contribute_all())
+        self.assertEqual(summaries.check(self.contributions.collection, summaries_collection), [])
+
+    def test_time_threshold_flushes_partial_batch(self):
+        async def contribute_one():
+            batcher = self.batcher(max_batch=500, max_delay=0.01)
+            return await batcher.contribute('user0', self.group_ids[0], 5)
+
+        self.assertEqual(asyncio.run(contribute_one()), 15)
+        self.assertEqual(self.contributions.calls, 1)
+
+    def test_failed_flush_is_not_acknowledged(self):
+        self.contributions.collection.insert_many = unittest.mock.Mock(side_effect=RuntimeError('write failed'))
+
+        async def contribute_one():
+            batcher = self.batcher(max_batch=1)
+            return await batcher.contribute('user0', self.group_ids[0], 5)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(contribute_one())
+        self.assertEqual(self.groups.collection.find_one({'_id': self.group_ids[0]})['current_amount'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
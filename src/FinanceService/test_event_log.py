@@ -0,0 +1,24 @@
+import json
+import logging
+import unittest
+from event_log import SampledLog
+
+
+class TestSampledLog(unittest.TestCase):
+    def test_logs_a_sample_of_the_events_as_json(self):
+        draws = iter([0.5, 0.05, 0.2])
+        log = SampledLog(logging.getLogger('test.event_log'), 0.1, random=lambda: next(draws))
+        with self.assertLogs('test.event_log', logging.INFO) as logs:
+            for amount in range(3):
+                log.log('ws.contribute', username='alice', amount=amount)
+        self.assertEqual([json.loads(r.getMessage()) for r in logs.records],
+                         [{'event': 'ws.contribute', 'sample_rate': 0.1, 'username': 'alice', 'amount': 1}])
+
+    def test_rate_zero_logs_nothing(self):
+        log = SampledLog(logging.getLogger('test.event_log'), 0, random=lambda: self.fail('sampled'))
+        with self.assertNoLogs('test.event_log'):
+            log.log('ws.join')
+
+
+if __name__ == '__main__':
+    unittest.main()
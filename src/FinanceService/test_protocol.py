@@ -0,0 +1,63 @@
+import json
+import unittest
+import protocol
+from protocol import ProtocolError
+
+
+class TestJsonCodec(unittest.TestCase):
+    def test_replies_are_the_original_text_messages(self):
+        codec = protocol.codec_for(None)
+        self.assertEqual(codec.decode('{"event": "contribute", "amount": 5}'), {'event': 'contribute', 'amount': 5})
+        self.assertEqual(codec.joined('alice', 'trip'), 'User alice joined group trip')
+        self.assertEqual(codec.contributed('alice', 5, 12), 'User alice contributed 5 to the group saving goal!')
+        self.assertEqual(codec.error(protocol.NOT_IN_GROUP, 'You must join a group first.'),
+                         'You must join a group first.')
+        self.assertEqual(json.loads(codec.update({'event': 'group_update', 'current_amount': 12})),
+                         {'event': 'group_update', 'current_amount': 12})
+
+    def test_rejects_invalid_messages(self):
+        codec = protocol.codec_for(None)
+        for message in ('{"event": ', '[1, 2]', '{"event": "join"}',
+                        '{"event": "join", "username": 5, "group_name": "trip"}'):
+            with self.assertRaises(ProtocolError):
+                codec.decode(message)
+
+
+class TestBinaryCodec(unittest.TestCase):
+    def setUp(self):
+        self.codec = protocol.codec_for(protocol.BINARY_SUBPROTOCOL)
+
+    def test_decodes_client_messages(self):
+        self.assertEqual(self.codec.decode(protocol.encode_join('alice', 'trip')),
+                         {'event': 'join', 'username': 'alice', 'group_name': 'trip'})
+        self.assertEqual(self.codec.decode(protocol.encode_contribute(2.5)), {'event': 'contribute', 'amount': 2.5})
+
+    def test_rejects_invalid_messages(self):
+        for message in ('{"event": "join"}', b'\xff\xff', protocol.pb.ClientMessage().SerializeToString(),
+                        protocol.encode_join('', 'trip')):
+            with self.assertRaises(ProtocolError):
+                self.codec.decode(message)
+
+    def test_encodes_typed_replies(self):
+        reply = protocol.decode_server_message(self.codec.contributed('alice', 5, 12))
+        self.assertEqual((reply.event, reply.username, reply.amount, reply.current_amount),
+                         (protocol.pb.CONTRIBUTED, 'alice', 5, 12))
+        error = protocol.decode_server_message(self.codec.error(protocol.USER_NOT_FOUND, 'User bob not found!'))
+        self.assertEqual((error.event, error.error, error.message),
+                         (protocol.pb.ERROR, protocol.USER_NOT_FOUND, 'User bob not found!'))
+
+    def test_trace_ids(self):
+        self.assertEqual(self.codec.decode(protocol.encode_contribute(2.5, trace_id='abc123')),
+                         {'event': 'contribute', 'amount': 2.5, 'trace_id': 'abc123'})
+        update = protocol.decode_server_message(self.codec.update({'event': 'group_update', 'trace_id': 'abc123'}))
+        self.assertEqual(update.trace_id, 'abc123')
+        self.assertEqual(protocol.decode_server_message(self.codec.joined('alice', 'trip')).trace_id, '')
+
+    def test_frames_are_smaller_than_json(self):
+        update = {'event': 'group_update', 'group_name': 'trip', 'username': 'alice', 'amount': 5,
+                  'current_amount': 1250}
+        self.assertLess(len(self.codec.update(update)), len(protocol.codec_for(None).update(update)) / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import mongomock
+from bson import ObjectId
+import rollups
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        db = mongomock.MongoClient()['finances']
+        self.transactions = db['transactions']
+        self.rollups = db['rollups']
+        self.user_id, self.group_id = ObjectId(), ObjectId()
+
+    def transaction(self, ts, amount, group_id=None, transaction_type='expense'):
+        t = {'_id': ObjectId(), 'user_id': self.user_id, 'amount': amount, 'transaction_type': transaction_type, 'ts': ts}
+        if group_id is not None:
+            t['group_id'] = group_id
+        return t
+
+    def test_updates_are_bucketed_per_day_and_month(self):
+        batch = [
+            self.transaction(datetime(2026, 1, 31, 23, 59), 5),
+            self.transaction(datetime(2026, 1, 31, 8), 3, self.group_id, 'group_contribution'),
+            self.transaction(datetime(2026, 2, 1, 0, 1), 2),
+        ]
+        self.transactions.insert_many(batch)
+        self.rollups.bulk_write(rollups.rollup_updates(batch), ordered=False)
+
+        months = rollups.find_range(self.rollups, 'user', self.user_id, 'month')
+        self.assertEqual([(m['start'], m['total_amount'], m['transaction_count']) for m in months],
+                         [(datetime(2026, 1, 1), 8, 2), (datetime(2026, 2, 1), 2, 1)])
+        self.assertEqual(months[0]['by_type'], {'expense': {'amount': 5, 'count': 1},
+                                                'group_contribution': {'amount': 3, 'count': 1}})
+        days = rollups.find_range(self.rollups, 'user', self.user_id, 'day', datetime(2026, 1, 31), datetime(2026, 2, 1))
+        self.assertEqual([d['total_amount'] for d in days], [8])
+        group = rollups.find_range(self.rollups, 'group', self.group_id, 'day')
+        self.assertEqual([(g['start'], g['total_amount']) for g in group], [(datetime(2026, 1, 31), 3)])
+        self.assertEqual(rollups.check(self.transactions, self.rollups), [])
+
+    def test_parse_bucket(self):
+        self.assertEqual(rollups.parse_bucket('2026-03-17', 'day'), datetime(2026, 3, 17))
+        self.assertEqual(rollups.parse_bucket('2026-03-17', 'month'), datetime(2026, 3, 1))
+        self.assertEqual(rollups.parse_bucket('2026-03', 'day'), datetime(2026, 3, 1))
+        with self.assertRaises(ValueError):
+            rollups.parse_bucket('March', 'month')
+
+    def test_backfill_timestamps_old_transactions(self):
+        self.transactions.insert_many([
+            {'_id': ObjectId.from_datetime(datetime(2025, 12, day, hour)), 'user_id': self.user_id, 'amount': day,
+             'transaction_type': 'income'}
+            for day, hour in ((1, 9), (2, 9), (2, 18))
+        ])
+        self.transactions.insert_one(self.transaction(datetime(2026, 1, 5), 7))
+        self.rollups.bulk_write(rollups.rollup_updates([self.transactions.find_one({'ts': {'$exists': True}})]))
+
+        with patch.object(self.transactions, 'find', wraps=self.transactions.find) as find:
+            self.assertEqual(rollups.backfill(self.transactions, self.rollups, batch_size=2), 3)
+        # Every batch after the first starts past the last _id of the previous one
+        queries = [call.args[0] for call in find.call_args_list]
+        self.assertNotIn('_id', queries[0])
+        self.assertTrue(all('$gt' in query['_id'] for query in queries[1:]))
+        self.assertEqual(self.transactions.count_documents({'ts': {'$exists': False}}), 0)
+        self.assertEqual(rollups.check(self.transactions, self.rollups), [])
+        months = rollups.find_range(self.rollups, 'user', self.user_id, 'month')
+        self.assertEqual([(m['start'], m['total_amount']) for m in months],
+                         [(datetime(2025, 12, 1), 5), (datetime(2026, 1, 1), 7)])
+        self.assertEqual(rollups.backfill(self.transactions, self.rollups), 0)
+
+    def test_rebuild_repairs_drift(self):
+        batch = [self.transaction(datetime(2026, 1, 1), 5), self.transaction(datetime(2026, 1, 2), 6)]
+        self.transactions.insert_many(batch)
+        self.rollups.bulk_write(rollups.rollup_updates(batch + batch[:1]))
+        self.rollups.insert_one({'period': 'day', 'scope': 'user', 'owner_id': ObjectId(), 'start': datetime(2026, 1, 1),
+                                 'total_amount': 1, 'transaction_count': 1, 'by_type': {}})
+        self.assertEqual(len(rollups.check(self.transactions, self.rollups)), 3)
+
+        self.assertEqual(rollups.rebuild(self.transactions, self.rollups), 3)
+        self.assertEqual(rollups.check(self.transactions, self.rollups), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import unittest
+import protocol
+from pubsub import LocalHub, RedisBackbone, encode_message
+from rooms import GroupRooms, WRITE_BUFFER_LIMIT
+
+
+class BackedUpTransport:
+    def get_write_buffer_size(self):
+        return WRITE_BUFFER_LIMIT + 1
+
+
+class SlowSocket:
+    # A socket whose write buffer is full, so updates go through the slot
+    def __init__(self):
+        self.transport = BackedUpTransport()
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def send(self, frame):
+        await self.release.wait()
+        self.sent.append(json.loads(frame))
+
+
+class BinarySocket(SlowSocket):
+    # A member that negotiated the binary protocol
+    subprotocol = protocol.BINARY_SUBPROTOCOL
+
+    async def send(self, frame):
+        await self.release.wait()
+        self.sent.append(protocol.decode_server_message(frame))
+
+
+class TestGroupRooms(unittest.TestCase):
+    def test_slow_member_gets_latest_update_only(self):
+        async def scenario():
+            rooms = GroupRooms()
+            socket = SlowSocket()
+            rooms.join('group', socket)
+            for amount in range(1, 6):
+                rooms.publish('group', {'event': 'group_update', 'current_amount': amount})
+                await asyncio.sleep(0)
+            socket.release.set()
+            await asyncio.sleep(0.01)
+            return socket.sent
+
+        sent = asyncio.run(scenario())
+        # The first update was already in flight; the rest were coalesced
+        self.assertEqual([m['current_amount'] for m in sent], [1, 5])
+
+    def test_leave_removes_empty_room(self):
+        async def scenario():
+            rooms = GroupRooms()
+            socket = SlowSocket()
+            rooms.join('group', socket)
+            self.assertEqual(rooms.members('group'), 1)
+            rooms.leave('group', socket)
+            return rooms
+
+        rooms = asyncio.run(scenario())
+        self.assertEqual(rooms.members('group'), 0)
+        self.assertEqual(rooms.connections, 0)
+
+    def test_updates_reach_members_on_other_workers(self):
+        async def scenario():
+            hub = LocalHub()
+            workers = [GroupRooms(backbone=hub.backbone()) for _ in range(3)]
+            sockets = []
+            for rooms in workers:
+                await rooms.start()
+                sockets.append(SlowSocket())
+                sockets[-1].release.set()
+                rooms.join('group', sockets[-1])
+            workers[0].publish('group', {'event': 'group_update', 'current_amount': 7})
+            await asyncio.sleep(0.01)
+            return sockets
+
+        sockets = asyncio.run(scenario())
+        # Each member gets the update exactly once, including the publisher's own
+        self.assertEqual([s.sent for s in sockets], [[{'event': 'group_update', 'current_amount': 7}]] * 3)
+
+    def test_members_get_updates_in_their_protocol(self):
+        async def scenario():
+            hub = LocalHub()
+            workers = [GroupRooms(backbone=hub.backbone()) for _ in range(2)]
+            sockets = []
+            for rooms in workers:
+                await rooms.start()
+                for socket in (SlowSocket(), BinarySocket()):
+                    socket.release.set()
+                    rooms.join('group', socket)
+                    sockets.append(socket)
+            workers[0].publish('group', {'event': 'group_update', 'group_name': 'trip', 'username': 'alice',
+                                         'amount': 5, 'current_amount': 12})
+            await asyncio.sleep(0.01)
+            return sockets
+
+        sockets = asyncio.run(scenario())
+        for socket in sockets[0::2]:
+            self.assertEqual([m['current_amount'] for m in socket.sent], [12])
+        for socket in sockets[1::2]:
+            self.assertEqual([(m.event, m.group_name, m.username, m.amount, m.current_amount) for m in socket.sent],
+                             [(protocol.pb.GROUP_UPDATE, 'trip', 'alice', 5, 12)])
+
+    def test_failed_publishes_are_logged_once_per_outage(self):
+        class FailingBackbone:
+            fail = True
+
+            async def publish(self, group_key, frame):
+                if self.fail:
+                    raise ConnectionError('Redis is down')
+
+        async def scenario():
+            rooms = GroupRooms(backbone=FailingBackbone())
+            with self.assertLogs(level='INFO') as logs:
+                for fail in (True, True, False):
+                    rooms.backbone.fail = fail
+                    rooms.publish('group', {'event': 'group_update'})
+                    await asyncio.sleep(0.01)
+            return rooms, logs.output
+
+        rooms, output = asyncio.run(scenario())
+        self.assertEqual(rooms.publish_failures, 2)
+        self.assertEqual(len(output), 2)
+        self.assertIn('Redis is down', output[0])
+        self.assertIn('reach the other workers again', output[1])
+
+
+class FakePubSub:
+    # Yields its messages, then fails like a dropped connection if told to
+    def __init__(self, messages, then_fail):
+        self.messages = messages
+        self.then_fail = then_fail
+        self.closed = False
+
+    async def listen(self):
+        for message in self.messages:
+            yield {'data': message.encode('utf-8')}
+        if self.then_fail:
+            raise ConnectionError('Connection closed by server.')
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestRedisBackbone(unittest.TestCase):
+    def test_resubscribes_after_losing_the_connection(self):
+        async def scenario():
+            backbone = RedisBackbone('redis://unused', reconnect_delay=0.001)
+            first = FakePubSub([encode_message('other', 'group', 'before')], then_fail=True)
+            subscriptions = iter([FakePubSub([encode_message('other', 'group', 'after')], then_fail=False)])
+
+            async def subscribe():
+                return next(subscriptions)
+            backbone._subscribe = subscribe
+
+            received = []
+            with self.assertLogs(level='WARNING') as logs:
+                listener = asyncio.ensure_future(backbone._listen(first, lambda key, frame: received.append(frame)))
+                await asyncio.sleep(0.05)
+                listener.cancel()
+            return backbone, first, received, logs.output
+
+        backbone, first, received, output = asyncio.run(scenario())
+        self.assertEqual(received, ['before', 'after'])
+        self.assertEqual(backbone.reconnects, 1)
+        self.assertTrue(first.closed)
+        self.assertIn('Connection closed by server', output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import os
+import unittest
+
+# Modules FinanceService ships copies of, so that its image doesn't need
+# src/UserService. The copies must stay identical to the originals; after
+# changing one, copy it over.
+USER_SERVICE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'UserService')
+SHARED_MODULES = ('tracing.py', 'test_tracing.py', 'user_client.py', 'user_service_pb2.py',
+                  'user_service_pb2_grpc.py')
+
+
+@unittest.skipUnless(os.path.isdir(USER_SERVICE), 'needs the UserService sources next to FinanceService')
+class TestSharedModules(unittest.TestCase):
+    def test_copies_match_user_service(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in SHARED_MODULES:
+            with self.subTest(module=name):
+                with open(os.path.join(here, name), 'rb') as copy, open(os.path.join(USER_SERVICE, name), 'rb') as original:
+                    self.assertEqual(copy.read(), original.read(), f'{name} differs from UserService/{name}')
+
+
+if __name__ == '__main__':
+    unittest.main()
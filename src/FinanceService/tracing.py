@@ -0,0 +1,418 @@
+import collections
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import signal
+import sys
+import threading
+import time
+from functools import partial
+
+from flask import Blueprint, Response, g, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from pymongo import monitoring
+
+# Opt-in request tracing and a sampling profiler, shared by UserService and
+# FinanceService: the file and its test_tracing.py are the same in both, which
+# FinanceService/test_shared_modules.py checks. Edit them here and copy them
+# over.
+#
+# With TRACING_ENABLED=1 every REST request, gRPC call and WebSocket message
+# gets a trace: an id plus the timed spans of the Mongo and Redis commands,
+# password hashing and JSON serialization done for it. A finished trace is
+# logged as one JSON record on the "tracing" logger, with the time per kind
+# of span (mongo, redis, hash, serialize, ...) and the rest as "other", and
+# the last TRACE_BUFFER traces are kept for GET /debug/traces.
+#
+# Trace ids travel in the X-Trace-Id header, the x-trace-id gRPC metadata key
+# and the trace_id field of WebSocket messages. A request that arrives with
+# an id is always traced under it; others are traced at TRACE_SAMPLE_RATE.
+#
+# With tracing disabled nothing is installed (no Mongo listener, Redis
+# wrapper or Flask hooks) and span() costs one context variable lookup.
+#
+# The profiler samples the stacks of every thread of the process, waiting
+# threads included, and renders them in the folded format of flamegraph.pl
+# and speedscope. With DEBUG_ENDPOINTS=1 it is started and stopped through
+# /debug/profiler; processes without HTTP (the gRPC and WebSocket side
+# processes) toggle it on SIGUSR2 and write the stacks to PROFILE_DIR.
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', '0') == '1'
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 1.0))
+TRACE_BUFFER = int(os.getenv('TRACE_BUFFER', 100))
+DEBUG_ENDPOINTS = os.getenv('DEBUG_ENDPOINTS', '0') == '1'
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 10))
+PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp')
+
+TRACE_HEADER = 'X-Trace-Id'
+TRACE_METADATA_KEY = 'x-trace-id'
+
+# Ids from clients end up in logs, so anything else is replaced
+_TRACE_ID = re.compile(r'^[0-9A-Za-z_-]{1,64}$')
+
+_current = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    def __init__(self, trace_id, name):
+        self.trace_id = trace_id
+        self.name = name
+        self.started = time.perf_counter()
+        # (name, start, duration, attributes); appended from any thread
+        self.spans = []
+
+    def add(self, name, started, duration, attributes=None):
+        self.spans.append((name, started, duration, attributes))
+
+    def record(self, duration):
+        breakdown = collections.defaultdict(float)
+        spans = []
+        for name, started, span_duration, attributes in sorted(self.spans, key=lambda s: s[1]):
+            breakdown[name.split('.', 1)[0]] += span_duration * 1000
+            span = {'name': name, 'start_ms': round((started - self.started) * 1000, 3),
+                    'duration_ms': round(span_duration * 1000, 3)}
+            if attributes:
+                span.update(attributes)
+            spans.append(span)
+        # Concurrent spans can add up to more than the whole request
+        breakdown['other'] = max(0.0, duration * 1000 - sum(breakdown.values()))
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'duration_ms': round(duration * 1000, 3),
+            'breakdown_ms': {kind: round(ms, 3) for kind, ms in breakdown.items()},
+            'spans': spans
+        }
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'attributes', 'started')
+
+    def __init__(self, trace, name, attributes):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.started, time.perf_counter() - self.started, self.attributes)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+def span(name, **attributes):
+    # Times the block as part of the current trace, if there is one
+    trace = _current.get()
+    if trace is None:
+        return NO_SPAN
+    return _Span(trace, name, attributes)
+
+
+def current_trace_id():
+    trace = _current.get()
+    return trace.trace_id if trace is not None else None
+
+
+def bind(fn):
+    # run_in_executor doesn't carry context variables over to the pool
+    # thread; this does, so the call's spans land in the current trace
+    if _current.get() is None:
+        return fn
+    return partial(contextvars.copy_context().run, fn)
+
+
+def outgoing_metadata():
+    # gRPC metadata that passes the current trace on to the called service
+    trace = _current.get()
+    return ((TRACE_METADATA_KEY, trace.trace_id),) if trace is not None else None
+
+
+class Tracer:
+    def __init__(self, enabled=TRACING_ENABLED, sample_rate=TRACE_SAMPLE_RATE, buffer=TRACE_BUFFER,
+                 logger=None, random=random.random):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.recent = collections.deque(maxlen=buffer)
+        self.logger = logger or logging.getLogger('tracing')
+        self.random = random
+
+    def start(self, name, trace_id=None):
+        # Makes a new trace current and returns the handle for finish(), or
+        # None when this request isn't traced
+        if not self.enabled:
+            return None
+        if not isinstance(trace_id, str) or not _TRACE_ID.match(trace_id):
+            if self.sample_rate < 1 and self.random() >= self.sample_rate:
+                return None
+            trace_id = secrets.token_hex(8)
+        trace = Trace(trace_id, name)
+        return trace, _current.set(trace)
+
+    def finish(self, started, **attributes):
+        if started is None:
+            return None
+        trace, token = started
+        _current.reset(token)
+        record = trace.record(time.perf_counter() - trace.started)
+        record.update(attributes)
+        self.recent.append(record)
+        self.logger.info(json.dumps(record, default=str))
+        return record
+
+    def trace(self, name, trace_id=None):
+        return _Traced(self, name, trace_id)
+
+
+class _Traced:
+    # with tracer.trace(name, trace_id) as trace: ... (trace is None when
+    # the block isn't traced)
+    def __init__(self, tracer, name, trace_id):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.started = None
+
+    def __enter__(self):
+        self.started = self.tracer.start(self.name, self.trace_id)
+        return self.started[0] if self.started is not None else None
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.tracer.finish(self.started, error=exc_type.__name__)
+        else:
+            self.tracer.finish(self.started)
+        return False
+
+
+tracer = Tracer()
+
+
+# Mongo: every command becomes a span named after it ("mongo.find"), with the
+# collection it ran on
+class MongoCommandTracer(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        if _current.get() is not None:
+            collection = event.command.get(event.command_name)
+            if isinstance(collection, str):
+                self._collections[event.connection_id, event.request_id] = collection
+
+    def succeeded(self, event):
+        self._finished(event, None)
+
+    def failed(self, event):
+        self._finished(event, {'error': event.failure.get('errmsg', 'failed')})
+
+    def _finished(self, event, attributes):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        trace = _current.get()
+        if trace is None:
+            return
+        duration = event.duration_micros / 1e6
+        attributes = dict(attributes or {}, collection=collection) if collection else attributes
+        trace.add(f'mongo.{event.command_name}', time.perf_counter() - duration, duration, attributes)
+
+
+def mongo_listeners():
+    # event_listeners for a MongoClient; none unless tracing is enabled
+    return [MongoCommandTracer()] if tracer.enabled else []
+
+
+# Redis: every command ("redis.get") and pipeline ("redis.pipeline") of a
+# redis-py client becomes a span. The client is returned as is unless
+# tracing is enabled.
+def trace_redis(client):
+    if not tracer.enabled:
+        return client
+    execute_command = client.execute_command
+    new_pipeline = client.pipeline
+
+    def traced_command(*args, **options):
+        with span(f'redis.{str(args[0]).lower()}'):
+            return execute_command(*args, **options)
+
+    def traced_pipeline(*args, **kwargs):
+        pipeline = new_pipeline(*args, **kwargs)
+        execute = pipeline.execute
+
+        def traced_execute(*args, **kwargs):
+            with span('redis.pipeline', commands=len(pipeline.command_stack)):
+                return execute(*args, **kwargs)
+        pipeline.execute = traced_execute
+        return pipeline
+
+    client.execute_command = traced_command
+    client.pipeline = traced_pipeline
+    return client
+
+
+class Profiler:
+    # Samples the stack of every thread every interval seconds from a
+    # background thread and counts identical stacks. start() clears the
+    # previous profile.
+    def __init__(self, interval=PROFILE_INTERVAL_MS / 1000.0):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, interval=None):
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.interval = interval or self.interval
+            self.samples = 0
+            self.stacks = collections.Counter()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self.stacks[self._fold(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+                                          .replace(';', ':'))
+        return label
+
+    def _fold(self, thread_name, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.append(thread_name.replace(';', ':'))
+        return ';'.join(reversed(labels))
+
+    def folded(self):
+        # One "root;...;leaf count" line per distinct stack
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+profiler = Profiler()
+
+
+class _TracedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with span('serialize.dumps'):
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        with span('serialize.loads'):
+            return super().loads(s, **kwargs)
+
+
+# Flask: a trace per request, named after the endpoint, whose id is returned
+# in X-Trace-Id; plus the /debug endpoints when enabled. Call before any other
+# before_request hook is registered so the trace covers them.
+def init_flask(app, tracer=tracer, debug_endpoints=DEBUG_ENDPOINTS):
+    if tracer.enabled:
+        app.json = _TracedJSONProvider(app)
+
+        @app.before_request
+        def start_trace():
+            g.trace = tracer.start(request.endpoint or 'unmatched', request.headers.get(TRACE_HEADER))
+
+        @app.after_request
+        def return_trace_id(response):
+            started = g.get('trace')
+            if started is not None:
+                response.headers[TRACE_HEADER] = started[0].trace_id
+            return response
+
+        @app.teardown_request
+        def finish_trace(error=None):
+            started = g.pop('trace', None)
+            if started is not None:
+                tracer.finish(started, method=request.method, path=request.path,
+                              **({'error': type(error).__name__} if error is not None else {}))
+
+    if debug_endpoints:
+        app.register_blueprint(debug_blueprint(tracer))
+
+
+def debug_blueprint(tracer=tracer, profiler=profiler):
+    debug = Blueprint('debug', __name__, url_prefix='/debug')
+
+    @debug.route('/traces', methods=['GET'])
+    def traces():
+        return jsonify({'enabled': tracer.enabled, 'traces': list(tracer.recent)}), 200
+
+    @debug.route('/profiler', methods=['GET'])
+    def profile():
+        # Folded stacks collected so far: flamegraph.pl profile.folded > profile.svg
+        return Response(profiler.folded(), mimetype='text/plain')
+
+    @debug.route('/profiler/start', methods=['POST'])
+    def start_profiler():
+        interval_ms = request.args.get('interval_ms', type=float) or PROFILE_INTERVAL_MS
+        if interval_ms <= 0:
+            return jsonify({'error': 'interval_ms must be positive'}), 400
+        started = profiler.start(interval_ms / 1000.0)
+        return jsonify({'running': True, 'started': started, 'interval_ms': profiler.interval * 1000}), 200
+
+    @debug.route('/profiler/stop', methods=['POST'])
+    def stop_profiler():
+        profiler.stop()
+        return jsonify({'running': False, 'samples': profiler.samples}), 200
+
+    return debug
+
+
+# For processes without the /debug endpoints: the first signal starts the
+# profiler, the next stops it and writes the stacks to
+# PROFILE_DIR/profile-<pid>-<time>.folded. Must be called on the main thread.
+def install_profiler_signal(signum=signal.SIGUSR2, directory=PROFILE_DIR, profiler=profiler):
+    def toggle(signum, frame):
+        if not profiler.running:
+            profiler.start()
+            logging.info(f'Profiler started (pid {os.getpid()})')
+            return
+        profiler.stop()
+        path = os.path.join(directory, f'profile-{os.getpid()}-{int(time.time())}.folded')
+        with open(path, 'w') as f:
+            f.write(profiler.folded())
+        logging.info(f'Profile of {profiler.samples} samples written to {path}')
+
+    signal.signal(signum, toggle)
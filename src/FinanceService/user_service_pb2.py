@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: user_service.proto
+# Protobuf Python Version: 5.27.2
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    5,
+    27,
+    2,
+    '',
+    'user_service.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12user_service.proto\x12\x0cuser_service\"\"\n\x0eGetUserRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"c\n\x0fGetUserResponse\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x0f\n\x07user_id\x18\x04 \x01(\t\x12\r\n\x05\x66ound\x18\x05 \x01(\x08\")\n\x14\x42\x61tchGetUsersRequest\x12\x11\n\tusernames\x18\x01 \x03(\t\"E\n\x15\x42\x61tchGetUsersResponse\x12,\n\x05users\x18\x01 \x03(\x0b\x32\x1d.user_service.GetUserResponse\"\'\n\x16ValidateSessionRequest\x12\r\n\x05token\x18\x01 \x01(\t\"K\n\x17ValidateSessionResponse\x12\r\n\x05valid\x18\x01 \x01(\x08\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x10\n\x08username\x18\x03 \x01(\t\"\x14\n\x12HealthCheckRequest\"\x92\x01\n\x13HealthCheckResponse\x12?\n\x06status\x18\x01 \x01(\x0e\x32/.user_service.HealthCheckResponse.ServingStatus\":\n\rServingStatus\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0b\n\x07SERVING\x10\x01\x12\x0f\n\x0bNOT_SERVING\x10\x02\x32\xe2\x02\n\x0bUserService\x12\x46\n\x07GetUser\x12\x1c.user_service.GetUserRequest\x1a\x1d.user_service.GetUserResponse\x12X\n\rBatchGetUsers\x12\".user_service.BatchGetUsersRequest\x1a#.user_service.BatchGetUsersResponse\x12Q\n\x0eStreamGetUsers\x12\x1c.user_service.GetUserRequest\x1a\x1d.user_service.GetUserResponse(\x01\x30\x01\x12^\n\x0fValidateSession\x12$.user_service.ValidateSessionRequest\x1a%.user_service.ValidateSessionResponse2V\n\x06Health\x12L\n\x05\x43heck\x12 .user_service.HealthCheckRequest\x1a!.user_service.HealthCheckResponseb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'user_service_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_GETUSERREQUEST']._serialized_start=36
+  _globals['_GETUSERREQUEST']._serialized_end=70
+  _globals['_GETUSERRESPONSE']._serialized_start=72
+  _globals['_GETUSERRESPONSE']._serialized_end=171
+  _globals['_BATCHGETUSERSREQUEST']._serialized_start=173
+  _globals['_BATCHGETUSERSREQUEST']._serialized_end=214
+  _globals['_BATCHGETUSERSRESPONSE']._serialized_start=216
+  _globals['_BATCHGETUSERSRESPONSE']._serialized_end=285
+  _globals['_VALIDATESESSIONREQUEST']._serialized_start=287
+  _globals['_VALIDATESESSIONREQUEST']._serialized_end=326
+  _globals['_VALIDATESESSIONRESPONSE']._serialized_start=328
+  _globals['_VALIDATESESSIONRESPONSE']._serialized_end=403
+  _globals['_HEALTHCHECKREQUEST']._serialized_start=405
+  _globals['_HEALTHCHECKREQUEST']._serialized_end=425
+  _globals['_HEALTHCHECKRESPONSE']._serialized_start=428
+  _globals['_HEALTHCHECKRESPONSE']._serialized_end=574
+  _globals['_HEALTHCHECKRESPONSE_SERVINGSTATUS']._serialized_start=516
+  _globals['_HEALTHCHECKRESPONSE_SERVINGSTATUS']._serialized_end=574
+  _globals['_USERSERVICE']._serialized_start=577
+  _globals['_USERSERVICE']._serialized_end=931
+  _globals['_HEALTH']._serialized_start=933
+  _globals['_HEALTH']._serialized_end=1019
+# @@protoc_insertion_point(module_scope)
@@ -1,27 +1,137 @@
 import sys
 import time
+import asyncio
+import signal
+import threading
 import grpc
 from concurrent import futures
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, g, Response
 from flask_pymongo import PyMongo
-from werkzeug.security import generate_password_hash, check_password_hash
 import redis
+from redis.exceptions import RedisError
 from bson import ObjectId
 import os
 import logging
 import user_service_pb2_grpc  # Import the generated gRPC code
 import user_service_pb2  # Import the generated gRPC messages
 from threading import Thread
+from profile_cache import ProfileCache, PROFILE_TTL, NEGATIVE_TTL
+from hashing import PasswordHasher, HashingBusy, DEFAULT_METHOD
+from metrics import RequestMetrics
+from sessions import SessionStore, SESSION_TTL, LOCAL_TTL
+from limiter import (ConcurrencyLimiter, AIMDLimit, LimiterInterceptor, AioLimiterInterceptor,
+                     CRITICAL, HIGH, NORMAL)
+import tracing
+from grpc_tracing import server_interceptors
 
 # Initialize Flask app
 app = Flask(__name__)
 
+# Per-request traces and the /debug endpoints, when enabled (see tracing.py).
+# Registered first so the traces cover the other request hooks.
+tracing.init_flask(app)
+
 # MongoDB configuration
 app.config['MONGO_URI'] = 'mongodb://localhost:27017/users'
-mongo = PyMongo(app)
+mongo = PyMongo(app, event_listeners=tracing.mongo_listeners())
 
 # Redis configuration
-cache = redis.Redis(host='localhost', port=6379)
+cache = tracing.trace_redis(redis.Redis(host='localhost', port=6379))
+
+# Password hashing in a process pool (see hashing.py). PASSWORD_HASH_METHOD is
+# a werkzeug method string such as "scrypt:32768:8:1"; stored hashes made with
+# other parameters are upgraded on the next successful login.
+password_hasher = PasswordHasher(
+    method=os.getenv('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+    workers=int(os.environ['PASSWORD_HASH_WORKERS']) if 'PASSWORD_HASH_WORKERS' in os.environ else None,
+    max_pending=int(os.getenv('PASSWORD_HASH_QUEUE', 0)) or None
+)
+
+@app.errorhandler(HashingBusy)
+def hashing_busy(e):
+    return jsonify({'error': 'Too many logins in progress, try again shortly'}), 503, {'Retry-After': '1'}
+
+def rehash_password(user, password):
+    # Runs in the background; skipped if hashing is saturated, the next login
+    # tries again
+    try:
+        future = password_hasher.hash_async(password)
+    except HashingBusy:
+        return
+
+    def store(future):
+        if future.exception() is None:
+            # Only replace the hash the password was checked against
+            mongo.db.users.update_one({'_id': user['_id'], 'password': user['password']},
+                                      {'$set': {'password': future.result()}})
+    future.add_done_callback(store)
+
+# Profile lookups shared by the REST and gRPC paths, cached in Redis
+PROFILE_FIELDS = {'username': True, 'email': True}
+
+def profile_of(user):
+    return {'id': str(user['_id']), 'username': user['username'], 'email': user['email']}
+
+def load_profile(username):
+    user = mongo.db.users.find_one({'username': username}, PROFILE_FIELDS)
+    return profile_of(user) if user else None
+
+def load_profiles(usernames):
+    # One $in query for a whole batch
+    users = mongo.db.users.find({'username': {'$in': usernames}}, PROFILE_FIELDS)
+    return {user['username']: profile_of(user) for user in users}
+
+profile_cache = ProfileCache(
+    cache, load_profile, load_profiles,
+    ttl=int(os.getenv('PROFILE_CACHE_TTL', PROFILE_TTL)),
+    negative_ttl=int(os.getenv('PROFILE_CACHE_NEGATIVE_TTL', NEGATIVE_TTL))
+)
+
+# Login sessions in Redis (see sessions.py); validations are kept in process
+# for SESSION_LOCAL_TTL seconds, so a logout reaches other instances within that
+sessions = SessionStore(
+    cache,
+    ttl=int(os.getenv('SESSION_TTL', SESSION_TTL)),
+    local_ttl=float(os.getenv('SESSION_LOCAL_TTL', LOCAL_TTL))
+)
+
+def bearer_token():
+    header = request.headers.get('Authorization', '')
+    return header[len('Bearer '):].strip() if header.startswith('Bearer ') else None
+
+@app.errorhandler(RedisError)
+def sessions_unavailable(e):
+    logging.warning(f"Redis unavailable: {e}")
+    return jsonify({'error': 'Sessions are unavailable, try again shortly'}), 503, {'Retry-After': '1'}
+
+# gRPC server settings. GRPC_MODE=threads (the default) serves RPCs from a
+# pool of GRPC_THREAD_WORKERS threads, each blocked for the whole lookup.
+# GRPC_MODE=aio serves them from an asyncio event loop and only hands the
+# blocking Redis/Mongo calls to a pool of GRPC_IO_WORKERS threads, so a burst
+# of RPCs isn't queued behind a handful of busy workers. In both modes RPCs
+# beyond GRPC_MAX_CONCURRENT_RPCS are rejected with RESOURCE_EXHAUSTED.
+GRPC_MODE = os.getenv('GRPC_MODE', 'threads')
+GRPC_PORT = int(os.getenv('GRPC_PORT', 50051))
+GRPC_THREAD_WORKERS = int(os.getenv('GRPC_THREAD_WORKERS', 10))
+GRPC_IO_WORKERS = int(os.getenv('GRPC_IO_WORKERS', 64))
+GRPC_MAX_CONCURRENT_RPCS = int(os.getenv('GRPC_MAX_CONCURRENT_RPCS', 1000))
+# Streams per HTTP/2 connection, and keepalive pings that let both ends
+# notice dead connections behind load balancers
+GRPC_MAX_CONCURRENT_STREAMS = int(os.getenv('GRPC_MAX_CONCURRENT_STREAMS', 256))
+GRPC_KEEPALIVE_TIME_MS = int(os.getenv('GRPC_KEEPALIVE_TIME_MS', 30000))
+GRPC_KEEPALIVE_TIMEOUT_MS = int(os.getenv('GRPC_KEEPALIVE_TIMEOUT_MS', 10000))
+# Seconds RPCs in flight get to finish once the server is asked to stop
+GRPC_SHUTDOWN_GRACE = float(os.getenv('GRPC_SHUTDOWN_GRACE', 10))
+
+def grpc_server_options():
+    return [
+        ('grpc.max_concurrent_streams', GRPC_MAX_CONCURRENT_STREAMS),
+        ('grpc.keepalive_time_ms', GRPC_KEEPALIVE_TIME_MS),
+        ('grpc.keepalive_timeout_ms', GRPC_KEEPALIVE_TIMEOUT_MS),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.min_ping_interval_without_data_ms', GRPC_KEEPALIVE_TIME_MS // 2),
+        ('grpc.http2.max_pings_without_data', 0)
+    ]
 
 # Use environment variable for the port, or default to 5000
 port = int(os.getenv("PORT", 5000))
@@ -29,30 +139,72 @@ port = int(os.getenv("PORT", 5000))
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
-# Request counting variables for health monitoring
-request_counter = 0
-start_time = time.time()
+# Request metrics for health monitoring, served on /metrics
 CRITICAL_LOAD_THRESHOLD = 60  # Define critical load, e.g., 60 requests per second
+LOAD_WINDOW = int(os.getenv('LOAD_WINDOW', 10))  # seconds the request rate is averaged over
+request_metrics = RequestMetrics('user_service_', window=LOAD_WINDOW)
+request_metrics.add_metric('password_hash_rejected_total', 'Logins and registrations rejected while hashing was saturated.',
+                           lambda: password_hasher.rejected, 'counter')
+request_metrics.add_metric('session_cache_hits_total', 'Session validations answered from the in-process cache.',
+                           lambda: sessions.hits, 'counter')
+request_metrics.add_metric('session_cache_misses_total', 'Session validations that read Redis.',
+                           lambda: sessions.misses, 'counter')
 
-# Helper function to check if load is critical
-def check_critical_load():
-    global request_counter, start_time
-    current_time = time.time()
-    elapsed_time = current_time - start_time
+# Called by the metrics thread every second to check if load is critical
+def check_critical_load(metrics):
+    rate = metrics.rate.rate()
+    if rate > CRITICAL_LOAD_THRESHOLD:
+        logging.warning(f"Critical Load Alert: {rate:.0f} requests per second over the last {metrics.rate.window} seconds")
+        # You can add more actions here, e.g., sending an email or Slack alert
 
-    # If a second has passed, check the load
-    if elapsed_time >= 1:
-        if request_counter > CRITICAL_LOAD_THRESHOLD:
-            logging.warning(f"Critical Load Alert: {request_counter} requests in the last second")
-            # You can add more actions here, e.g., sending an email or Slack alert
-        request_counter = 0
-        start_time = current_time
+# Adaptive concurrency limit shared by the REST and gRPC servers (see
+# limiter.py). Requests over the limit get a 503 / RESOURCE_EXHAUSTED, health
+# checks and logins before profile reads. LIMITER_ENABLED=0 turns it off.
+LIMITER_ENABLED = os.getenv('LIMITER_ENABLED', '1') == '1'
+limiter = ConcurrencyLimiter(
+    AIMDLimit(
+        initial=int(os.getenv('LIMITER_INITIAL', 50)),
+        minimum=int(os.getenv('LIMITER_MIN', 5)),
+        maximum=int(os.getenv('LIMITER_MAX', 500)),
+        latency_target=float(os.getenv('LIMITER_LATENCY_TARGET_MS', 1000)) / 1000.0
+    ),
+    max_queue=int(os.getenv('LIMITER_QUEUE', 50)),
+    max_wait=float(os.getenv('LIMITER_MAX_WAIT_MS', 50)) / 1000.0
+) if LIMITER_ENABLED else None
+
+# Priority of each Flask endpoint and gRPC method; the rest are NORMAL
+ENDPOINT_PRIORITIES = {'status': CRITICAL, 'metrics': CRITICAL, 'login_user': HIGH, 'register_user': HIGH,
+                       'validate_session': HIGH, 'logout_user': HIGH}
+GRPC_METHOD_PRIORITIES = {'/user_service.Health/Check': CRITICAL, '/user_service.UserService/ValidateSession': HIGH}
+
+if limiter is not None:
+    request_metrics.add_metric('concurrency_limit', 'Requests currently allowed in flight.', lambda: round(limiter.limit.limit, 1))
+    request_metrics.add_metric('limiter_in_flight', 'Requests holding a concurrency slot.', lambda: limiter.in_flight)
+    request_metrics.add_metric('shed_total', 'Requests rejected by the concurrency limit.', limiter.shed_counts,
+                               'counter', label='priority')
 
 @app.before_request
 def before_request():
-    global request_counter
-    request_counter += 1
-    check_critical_load()
+    g.request_started = request_metrics.started()
+    if limiter is not None:
+        with tracing.span('limiter.acquire'):
+            acquired = limiter.acquire(ENDPOINT_PRIORITIES.get(request.endpoint, NORMAL))
+        if not acquired:
+            return jsonify({'error': 'Server overloaded, try again shortly'}), 503, {'Retry-After': '1'}
+        g.limited = True
+
+@app.teardown_request
+def record_request(error=None):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_metrics.finished(request.method, endpoint, started)
+        if g.pop('limited', False):
+            limiter.release((time.perf_counter_ns() - started) / 1e9, dropped=error is not None)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # Flask API Endpoints
 @app.route('/status', methods=['GET'])
@@ -61,9 +213,9 @@ def status():
 
 @app.route('/users/<string:username>', methods=['GET'])
 def get_user(username):
-    user = mongo.db.users.find_one({'username': username})
-    if user:
-        return jsonify({'source': 'database', 'username': user['username'], 'email': user['email']}), 200
+    profile, source = profile_cache.get(username)
+    if profile:
+        return jsonify({'source': source, 'username': profile['username'], 'email': profile['email']}), 200
     return jsonify({'error': 'User not found'}), 404
 
 @app.route('/register', methods=['POST'])
@@ -71,12 +223,16 @@ def register_user():
     data = request.get_json()
     username = data.get('username')
     email = data.get('email')
-    password = generate_password_hash(data.get('password'))
 
     if mongo.db.users.find_one({'username': username}):
         return jsonify({'error': 'User already exists'}), 400
 
+    with tracing.span('hash.hash'):
+        password = password_hasher.hash(data.get('password'))
+
     mongo.db.users.insert_one({'username': username, 'email': email, 'password': password})
+    # Drop the cached "no such user" entry
+    profile_cache.invalidate(username)
     return jsonify({'message': 'User registered successfully'}), 201
 
 @app.route('/login', methods=['POST'])
@@ -90,48 +246,199 @@ def login_user():
 
     user = mongo.db.users.find_one({'username': username})
 
-    if user and check_password_hash(user['password'], password):
+    with tracing.span('hash.verify'):
+        verified = user is not None and password_hasher.verify(user['password'], password)
+
+    if verified:
+        if password_hasher.needs_rehash(user['password']):
+            rehash_password(user, password)
         user_id_str = str(user['_id'])  # Convert ObjectId to string
-        cache.set('logged_in_user', user_id_str)  # Store the user_id in Redis as a string
+        token = sessions.create(user_id_str, user['username'])
         return jsonify({
             'message': f'User {user["username"]} logged in successfully',
-            'id': user_id_str  # Return user_id as a string
+            'id': user_id_str,  # Return user_id as a string
+            'token': token  # Send as "Authorization: Bearer <token>"
         }), 200
     else:
         return jsonify({'error': 'Invalid username or password'}), 401
 
+@app.route('/sessions/validate', methods=['GET'])
+def validate_session():
+    session = sessions.validate(bearer_token())
+    if session is None:
+        return jsonify({'error': 'Invalid or expired session'}), 401
+    return jsonify({'id': session['user_id'], 'username': session['username']}), 200
+
+@app.route('/logout', methods=['POST'])
+def logout_user():
+    token = bearer_token()
+    if not token:
+        return jsonify({'error': 'Authorization header required'}), 401
+    sessions.revoke(token)
+    return jsonify({'message': 'Logged out'}), 200
+
+# Most usernames accepted by one BatchGetUsers call
+MAX_BATCH_USERNAMES = 1000
+
+def user_response(username, profile):
+    if profile:
+        return user_service_pb2.GetUserResponse(
+            username=profile['username'],
+            email=profile['email'],
+            user_id=profile['id'],
+            found=True,
+            message='User found'
+        )
+    return user_service_pb2.GetUserResponse(username=username, message='User not found')
+
+def session_response(session):
+    if session is None:
+        return user_service_pb2.ValidateSessionResponse(valid=False)
+    return user_service_pb2.ValidateSessionResponse(valid=True, user_id=session['user_id'], username=session['username'])
+
 # Implement the gRPC Service class
 class UserServicer(user_service_pb2_grpc.UserServiceServicer):
     def GetUser(self, request, context):
         # Logic for fetching a user through gRPC
-        user = mongo.db.users.find_one({'username': request.username})
+        user, _ = profile_cache.get(request.username)
         if user:
-            return user_service_pb2.GetUserResponse(
-                username=user['username'],
-                email=user['email'],
-                message='User found'
-            )
+            return user_response(request.username, user)
         else:
             context.set_details('User not found')
             context.set_code(grpc.StatusCode.NOT_FOUND)
             return user_service_pb2.GetUserResponse(message="User not found")
 
+    def BatchGetUsers(self, request, context):
+        if len(request.usernames) > MAX_BATCH_USERNAMES:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f'At most {MAX_BATCH_USERNAMES} usernames per batch')
+        profiles = profile_cache.get_many(request.usernames)
+        return user_service_pb2.BatchGetUsersResponse(
+            users=[user_response(username, profiles[username]) for username in request.usernames]
+        )
+
+    def StreamGetUsers(self, request_iterator, context):
+        # The client can keep sending while earlier lookups are answered;
+        # unknown users get a response with found unset rather than an error
+        for lookup in request_iterator:
+            profile, _ = profile_cache.get(lookup.username)
+            yield user_response(lookup.username, profile)
+
+    def ValidateSession(self, request, context):
+        try:
+            return session_response(sessions.validate(request.token))
+        except RedisError as e:
+            context.abort(grpc.StatusCode.UNAVAILABLE, f'Sessions are unavailable: {e}')
+
 # gRPC Health Check Service (Optional, in case you want to monitor gRPC service health)
 class HealthServicer(user_service_pb2_grpc.HealthServicer):
     def Check(self, request, context):
         return user_service_pb2.HealthCheckResponse(status=user_service_pb2.HealthCheckResponse.SERVING)
 
-# Run gRPC Server in a separate thread
-def serve_grpc():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+# The same service for the grpc.aio server. The profile cache and Mongo are
+# blocking clients, so their calls run on a separate I/O pool while the event
+# loop keeps accepting and answering RPCs.
+class AioUserServicer(user_service_pb2_grpc.UserServiceServicer):
+    def __init__(self, executor):
+        self.executor = executor
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, tracing.bind(function), *args)
+
+    async def GetUser(self, request, context):
+        user, _ = await self._run(profile_cache.get, request.username)
+        if user:
+            return user_response(request.username, user)
+        context.set_details('User not found')
+        context.set_code(grpc.StatusCode.NOT_FOUND)
+        return user_service_pb2.GetUserResponse(message="User not found")
+
+    async def BatchGetUsers(self, request, context):
+        if len(request.usernames) > MAX_BATCH_USERNAMES:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f'At most {MAX_BATCH_USERNAMES} usernames per batch')
+        profiles = await self._run(profile_cache.get_many, list(request.usernames))
+        return user_service_pb2.BatchGetUsersResponse(
+            users=[user_response(username, profiles[username]) for username in request.usernames]
+        )
+
+    async def StreamGetUsers(self, request_iterator, context):
+        async for lookup in request_iterator:
+            profile, _ = await self._run(profile_cache.get, lookup.username)
+            yield user_response(lookup.username, profile)
+
+    async def ValidateSession(self, request, context):
+        # Recently validated tokens are answered on the event loop
+        session = sessions.cached(request.token) if request.token else None
+        if session is None:
+            try:
+                session = await self._run(sessions.validate, request.token)
+            except RedisError as e:
+                await context.abort(grpc.StatusCode.UNAVAILABLE, f'Sessions are unavailable: {e}')
+        return session_response(session)
+
+class AioHealthServicer(user_service_pb2_grpc.HealthServicer):
+    async def Check(self, request, context):
+        return user_service_pb2.HealthCheckResponse(status=user_service_pb2.HealthCheckResponse.SERVING)
+
+def create_grpc_server(port=GRPC_PORT):
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=GRPC_THREAD_WORKERS),
+        options=grpc_server_options(),
+        maximum_concurrent_rpcs=GRPC_MAX_CONCURRENT_RPCS,
+        interceptors=server_interceptors() + ([LimiterInterceptor(limiter, GRPC_METHOD_PRIORITIES)] if limiter is not None else [])
+    )
     user_service_pb2_grpc.add_UserServiceServicer_to_server(UserServicer(), server)
-    server.add_insecure_port('[::]:50051')  # gRPC server listens on port 50051
-    print("Starting gRPC server on port 50051...")
-    server.start()
-    server.wait_for_termination()
+    user_service_pb2_grpc.add_HealthServicer_to_server(HealthServicer(), server)
+    server.add_insecure_port(f'[::]:{port}')
+    return server
+
+def create_grpc_aio_server(port=GRPC_PORT):
+    # Must be called with the event loop that will run the server
+    server = grpc.aio.server(
+        options=grpc_server_options(),
+        maximum_concurrent_rpcs=GRPC_MAX_CONCURRENT_RPCS,
+        interceptors=server_interceptors(aio=True) + ([AioLimiterInterceptor(limiter, GRPC_METHOD_PRIORITIES)] if limiter is not None else [])
+    )
+    executor = futures.ThreadPoolExecutor(max_workers=GRPC_IO_WORKERS, thread_name_prefix='grpc-io')
+    user_service_pb2_grpc.add_UserServiceServicer_to_server(AioUserServicer(executor), server)
+    user_service_pb2_grpc.add_HealthServicer_to_server(AioHealthServicer(), server)
+    server.add_insecure_port(f'[::]:{port}')
+    return server
+
+# Signals can only be handled on the main thread, i.e. when the gRPC server
+# runs in its own process (see gunicorn.conf.py); next to app.run it stops
+# with the process
+def on_main_thread():
+    return threading.current_thread() is threading.main_thread()
+
+async def serve_grpc_aio(port=GRPC_PORT):
+    server = create_grpc_aio_server(port)
+    await server.start()
+    if on_main_thread():
+        # Stop accepting RPCs, give those in flight GRPC_SHUTDOWN_GRACE seconds
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, lambda: asyncio.ensure_future(server.stop(GRPC_SHUTDOWN_GRACE))
+        )
+    await server.wait_for_termination()
+
+# Run gRPC Server in a separate thread
+def serve_grpc(port=GRPC_PORT, mode=GRPC_MODE):
+    print(f"Starting gRPC server ({mode}) on port {port}...")
+    if on_main_thread():
+        # No /debug endpoints in this process; SIGUSR2 toggles the profiler
+        tracing.install_profiler_signal()
+    if mode == 'aio':
+        asyncio.run(serve_grpc_aio(port))
+    else:
+        server = create_grpc_server(port)
+        server.start()
+        if on_main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: server.stop(GRPC_SHUTDOWN_GRACE))
+        server.wait_for_termination()
+    print(f"gRPC server on port {port} stopped")
 
 # Run Flask and gRPC in parallel
 if __name__ == '__main__':
+    request_metrics.start(check_critical_load)
     grpc_thread = Thread(target=serve_grpc)
     grpc_thread.start()
     print(f"Starting UserService on port {port}")
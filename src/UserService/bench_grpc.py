@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+import grpc
+import user_service_pb2
+import user_service_pb2_grpc
+
+# gRPC server benchmark: the thread-pool server against the grpc.aio server,
+# each in its own process, driven by --concurrency in-flight GetUser calls
+# from a separate client process.
+#
+#   python bench_grpc.py --concurrency 10 100 500 --latency-ms 20
+#
+# The server's users live in a dict behind --latency-ms of simulated Mongo
+# round trip, and the profile cache is bypassed, so every RPC waits on the
+# "database" the way a cache miss does. Pass --mongo-uri to query a real
+# Mongo instead (seed it with users user0..user<N-1>).
+#
+# The callers are spread over one channel per 100 of them: a server refuses
+# streams beyond GRPC_MAX_CONCURRENT_STREAMS on a single connection.
+
+
+class StandInUsers:
+    # find_one by username with a fixed round trip
+    def __init__(self, count, latency):
+        self.users = {f'user{i}': {'_id': f'id{i}', 'username': f'user{i}', 'email': f'user{i}@example.com'}
+                      for i in range(count)}
+        self.latency = latency
+
+    def find_one(self, query, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.users.get(query['username'])
+
+
+class NoCache:
+    # Redis stand-in that never has the key, so every lookup goes to the users
+    def get(self, key):
+        return None
+
+    def set(self, *args, **kwargs):
+        pass
+
+
+def run_server(mode, port, args):
+    import app
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        users = MongoClient(args.mongo_uri)['users']['users']
+    else:
+        users = StandInUsers(args.users, args.latency_ms / 1000.0)
+    app.mongo = type('Mongo', (), {'db': type('Db', (), {'users': users})()})()
+    app.profile_cache.redis = NoCache()
+    app.serve_grpc(port, mode)
+
+
+async def wait_ready(port):
+    async with grpc.aio.insecure_channel(f'localhost:{port}') as channel:
+        await asyncio.wait_for(channel.channel_ready(), 30)
+
+
+async def drive(port, concurrency, duration, users):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def caller(stub, index):
+        nonlocal errors
+        i = index
+        while time.perf_counter() < deadline:
+            request = user_service_pb2.GetUserRequest(username=f'user{i % users}')
+            start = time.perf_counter()
+            try:
+                await stub.GetUser(request, timeout=10)
+                latencies.append(time.perf_counter() - start)
+            except grpc.aio.AioRpcError:
+                errors += 1
+            i += concurrency
+
+    # A local subchannel pool gives every channel its own connection
+    channels = [grpc.aio.insecure_channel(f'localhost:{port}', options=[('grpc.use_local_subchannel_pool', 1)])
+                for _ in range((concurrency + 99) // 100)]
+    stubs = [user_service_pb2_grpc.UserServiceStub(channel) for channel in channels]
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(caller(stubs[i % len(stubs)], i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        for channel in channels:
+            await channel.close()
+    return latencies, errors, elapsed
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gRPC thread-pool vs aio server benchmark')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per run')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='simulated Mongo round trip')
+    parser.add_argument('--mongo-uri', help='query a real Mongo instead of the stand-in')
+    parser.add_argument('--port', type=int, default=50151)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for mode in ('threads', 'aio'):
+        server = context.Process(target=run_server, args=(mode, args.port, args), daemon=True)
+        server.start()
+        try:
+            asyncio.run(wait_ready(args.port))
+            for concurrency in args.concurrency:
+                latencies, errors, elapsed = asyncio.run(drive(args.port, concurrency, args.duration, args.users))
+                rows.append((mode, concurrency, f"{len(latencies) / elapsed:.0f}",
+                             f"{percentile(latencies, 50) * 1000:.1f}", f"{percentile(latencies, 99) * 1000:.1f}",
+                             errors))
+        finally:
+            server.terminate()
+            server.join()
+
+    print(f"simulated Mongo latency: {args.latency_ms if not args.mongo_uri else 'real'} ms")
+    headers = ('server', 'in flight', 'RPS', 'p50 ms', 'p99 ms', 'errors')
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import fakeredis
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+import app
+from hashing import PasswordHasher
+from sessions import SessionStore
+
+# Mixed-traffic benchmark: --logins threads post /login back to back (waiting
+# out Retry-After when rejected) while one client measures GET /status and
+# GET /users/<username>, with hashing on the request threads (as before) and
+# in the process pool.
+#
+#   python bench_hashing.py --logins 16 --duration 10
+#
+# Mongo and Redis are in-memory stand-ins; only the hashing costs CPU.
+
+
+class StandInUsers:
+    def __init__(self, user):
+        self.user = user
+
+    def find_one(self, query, *args, **kwargs):
+        return self.user if query.get('username') == self.user['username'] else None
+
+    def update_one(self, *args, **kwargs):
+        pass
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection('localhost', port, timeout=60)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run(hasher, args):
+    user = {'_id': 'id0', 'username': 'user0', 'email': 'user0@example.com',
+            'password': generate_password_hash('password', hasher.method)}
+    mongo = type('Mongo', (), {'db': type('Db', (), {'users': StandInUsers(user)})()})()
+    redis_client = fakeredis.FakeRedis()
+
+    with patch('app.mongo', mongo), patch('app.cache', redis_client), \
+            patch.object(app.profile_cache, 'redis', redis_client), patch('app.password_hasher', hasher), \
+            patch('app.sessions', SessionStore(redis_client)):
+        server = make_server('localhost', 0, app.app, threaded=True)
+        port = server.server_port
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        hasher.verify(user['password'], 'password')  # start the pool before measuring
+
+        stop = threading.Event()
+        statuses = {}
+        lock = threading.Lock()
+
+        def login_loop():
+            while not stop.is_set():
+                status = request(port, 'POST', '/login', {'username': 'user0', 'password': 'password'})
+                with lock:
+                    statuses[status] = statuses.get(status, 0) + 1
+                if status == 503:
+                    stop.wait(1)  # Retry-After
+
+        loaders = [threading.Thread(target=login_loop) for _ in range(args.logins)]
+        for loader in loaders:
+            loader.start()
+
+        probes = {'/status': [], '/users/user0': []}
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            for path, latencies in probes.items():
+                start = time.perf_counter()
+                request(port, 'GET', path)
+                latencies.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+        stop.set()
+        for loader in loaders:
+            loader.join()
+        server.shutdown()
+        hasher.close()
+    return probes, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency of cheap requests during a login storm')
+    parser.add_argument('--logins', type=int, default=16, help='concurrent login clients')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--method', default='scrypt')
+    parser.add_argument('--workers', type=int, default=None, help='hashing processes (default: CPUs)')
+    args = parser.parse_args()
+
+    rows = []
+    for label, hasher in (('request thread', PasswordHasher(args.method, workers=0, max_pending=10 ** 6)),
+                          ('process pool', PasswordHasher(args.method, workers=args.workers))):
+        probes, statuses = run(hasher, args)
+        for path, latencies in probes.items():
+            rows.append((label, path, f"{percentile(latencies, 50) * 1000:.1f}",
+                         f"{percentile(latencies, 99) * 1000:.1f}",
+                         statuses.get(200, 0), statuses.get(503, 0)))
+
+    headers = ('hashing', 'probe', 'p50 ms', 'p99 ms', 'logins ok', 'logins 503')
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print(f"{args.logins} login clients for {args.duration:.0f} s, method {args.method}")
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
+
+
+if __name__ == '__main__':
+    main()
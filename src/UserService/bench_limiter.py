@@ -0,0 +1,134 @@
+import argparse
+import http.client
+import multiprocessing
+import os
+import threading
+import time
+
+from bench_grpc import NoCache
+
+# Overload scenario for the concurrency limiter: closed-loop clients read
+# profiles with a --timeout deadline while their number grows past what the
+# server can handle. Goodput is the number of answers per second that reached
+# the client before its deadline; without the limiter every request is
+# admitted and, past saturation, answers arrive too late to be of use.
+#
+#   python bench_limiter.py --clients 8 32 128 256 --duration 10
+#
+# The server runs in its own process with a threaded Werkzeug server, and
+# the profile cache is bypassed. Profile reads go to a stand-in for Mongo that
+# serves --db-slots queries at a time, --work-ms each, so past saturation
+# requests queue inside the service where the limiter can see them.
+
+
+class SlowUsers:
+    def __init__(self, slots, work):
+        self.slots = threading.Semaphore(slots)
+        self.work = work
+
+    def find_one(self, query, *args, **kwargs):
+        with self.slots:
+            time.sleep(self.work)
+        return {'_id': 'id', 'username': query['username'], 'email': 'user@example.com'}
+
+
+def run_server(port, limited, args):
+    os.environ['LIMITER_ENABLED'] = '1' if limited else '0'
+    os.environ['LIMITER_LATENCY_TARGET_MS'] = str(args.latency_target_ms)
+    import logging
+    import app
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.mongo = type('Mongo', (), {'db': type('Db', (), {'users': SlowUsers(args.db_slots, args.work_ms / 1000.0)})()})()
+    app.profile_cache.redis = NoCache()
+    make_server('localhost', port, app.app, threaded=True, request_handler=None).serve_forever()
+
+
+def get(port, path, timeout):
+    connection = http.client.HTTPConnection('localhost', port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def load(port, clients, args):
+    stop = threading.Event()
+    results = {'good': 0, 'late': 0, 'shed': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def client(index):
+        i = index
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                status = get(port, f'/users/user{i}', args.timeout)
+                outcome = 'shed' if status == 503 else 'failed' if status != 200 else \
+                    'good' if time.perf_counter() - start <= args.timeout else 'late'
+            except OSError:
+                outcome = 'late'
+            with lock:
+                results[outcome] += 1
+            if outcome == 'shed':
+                stop.wait(0.05)
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def wait_ready(port):
+    for _ in range(100):
+        try:
+            get(port, '/status', 1)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit('The server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Goodput past saturation with and without the concurrency limiter')
+    parser.add_argument('--clients', type=int, nargs='+', default=[8, 32, 128, 256])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--timeout', type=float, default=1.0, help='client deadline in seconds')
+    parser.add_argument('--work-ms', type=float, default=10.0, help='database time per profile read')
+    parser.add_argument('--db-slots', type=int, default=2, help='queries the database serves at once')
+    parser.add_argument('--latency-target-ms', type=float, default=250.0)
+    parser.add_argument('--port', type=int, default=5150)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for limited in (False, True):
+        server = context.Process(target=run_server, args=(args.port, limited, args), daemon=True)
+        server.start()
+        try:
+            wait_ready(args.port)
+            for clients in args.clients:
+                results = load(args.port, clients, args)
+                rows.append(('on' if limited else 'off', clients, f"{results['good'] / args.duration:.0f}",
+                             results['late'], results['shed'], results['failed']))
+        finally:
+            server.terminate()
+            server.join()
+
+    headers = ('limiter', 'clients', 'goodput/s', 'late', 'shed', 'failed')
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print(f"{args.db_slots} x {args.work_ms} ms database, {args.timeout} s client deadline")
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
+
+
+if __name__ == '__main__':
+    main()
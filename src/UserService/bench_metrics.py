@@ -0,0 +1,100 @@
+import argparse
+import sys
+import threading
+import time
+
+from metrics import RequestMetrics, ShardedCounter, Histogram
+
+# Per-request cost of the metrics: a started()/finished() pair (request
+# count, in-flight gauge and latency histogram) and its parts, measured in a
+# tight loop on --threads threads at once and reported in CPU nanoseconds
+# per operation. The loop's own cost is measured separately and subtracted, and
+# the fastest of --repeat runs is kept to filter out scheduling noise; many
+# short runs find a quiet moment more reliably than a few long ones.
+#
+# A request must cost less than --budget-ns (1 us) of metrics; the script
+# exits with status 1 if a started()/finished() pair doesn't.
+#
+#   python bench_metrics.py --iterations 200000 --repeat 20 --threads 1 4
+
+
+def run_threads(threads, work, iterations):
+    # CPU seconds per operation, counted on each thread so that time spent
+    # waiting for the GIL isn't charged to the operation
+    per_thread = iterations // threads
+    cpu = []
+
+    def timed():
+        start = time.thread_time()
+        work(per_thread)
+        cpu.append(time.thread_time() - start)
+
+    workers = [threading.Thread(target=timed) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(cpu) / (per_thread * threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Metrics overhead benchmark')
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement, the fastest is kept')
+    parser.add_argument('--budget-ns', type=float, default=1000, help='allowed cost of a request')
+    args = parser.parse_args()
+
+    metrics = RequestMetrics('bench_')
+    counter = ShardedCounter()
+    histogram = Histogram()
+
+    def empty(n):
+        for _ in range(n):
+            pass
+
+    def counter_add(n):
+        add = counter.add
+        for _ in range(n):
+            add()
+
+    def histogram_record(n):
+        record = histogram.record
+        for _ in range(n):
+            record(0.00042)
+
+    def request(n):
+        started, finished = metrics.started, metrics.finished
+        for _ in range(n):
+            finished('GET', '/users/<string:username>', started())
+
+    def slow_request(n):
+        # As above, with a latency beyond the linear buckets
+        started, finished = metrics.started, metrics.finished
+        for _ in range(n):
+            finished('GET', '/status', started() - 420000)
+
+    rows = []
+    over = False
+    for threads in args.threads:
+        loop = min(run_threads(threads, empty, args.iterations) for _ in range(args.repeat))
+        # Only whole requests are held to the budget, the parts are for reference
+        for label, work, budgeted in (('counter add', counter_add, False),
+                                      ('histogram record', histogram_record, False),
+                                      ('request started + finished', request, True),
+                                      ('request, 420 us latency', slow_request, True)):
+            ns = (min(run_threads(threads, work, args.iterations) for _ in range(args.repeat)) - loop) * 1e9
+            budget = ''
+            if budgeted:
+                budget = f"{ns / args.budget_ns:.0%}" + (' OVER' if ns >= args.budget_ns else '')
+                over = over or ns >= args.budget_ns
+            rows.append((threads, label, f"{ns:.0f}", budget))
+
+    print(f"{'threads':>7}  {'operation':>26}  {'ns/op':>6}  {f'of {args.budget_ns:.0f} ns':>11}")
+    for threads, label, ns, budget in rows:
+        print(f"{threads:>7}  {label:>26}  {ns:>6}  {budget:>11}")
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import argparse
+import threading
+import time
+from unittest.mock import patch
+
+import app
+from profile_cache import ProfileCache
+
+# Profile lookup benchmark: GET /users/<username> on the miss path (Mongo,
+# then fill the cache) versus the hit path (Redis only), and the number of
+# Mongo loads when many requests miss the same hot username at once.
+#
+#   python bench_profile_cache.py --lookups 2000 --redis-url redis://localhost:6379/0
+#
+# Without --mongo-uri / --redis-url, mongomock and fakeredis stand in, with
+# --latency-ms of simulated round trip on every Mongo query. mongomock has no
+# indexes, so its miss path also includes a scan of the users.
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class SlowUsers:
+    # Adds a fixed round trip to every query of the stand-in collection.
+    # mongomock isn't thread-safe, so the queries themselves are serialized.
+    def __init__(self, collection, latency):
+        self.collection = collection
+        self.latency = latency
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def find_one(self, *args, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.queries += 1
+            return self.collection.find_one(*args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.queries += 1
+            return list(self.collection.find(*args, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile cache benchmark')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--stampede', type=int, default=50, help='concurrent requests for one expired username')
+    parser.add_argument('--latency-ms', type=float, default=1.0, help='simulated Mongo round trip')
+    parser.add_argument('--mongo-uri', help='use a real Mongo instead of mongomock')
+    parser.add_argument('--redis-url', help='use a real Redis instead of fakeredis')
+    args = parser.parse_args()
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        users = MongoClient(args.mongo_uri)['bench_profile_cache']['users']
+    else:
+        import mongomock
+        users = mongomock.MongoClient()['bench_profile_cache']['users']
+    users.drop()
+    users.insert_many([{'username': f'user{i}', 'email': f'user{i}@example.com', 'password': 'x'}
+                       for i in range(args.users)])
+    users.create_index('username')
+    if not args.mongo_uri:
+        users = SlowUsers(users, args.latency_ms / 1000.0)
+
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis()
+
+    mongo = type('Mongo', (), {})()
+    mongo.db = type('Db', (), {'users': users})()
+    profile_cache = ProfileCache(redis_client, app.load_profile)
+    client = app.app.test_client()
+    names = [f'user{i % args.users}' for i in range(args.lookups)]
+
+    def lookups(clear):
+        latencies = []
+        for name in names:
+            if clear:
+                profile_cache.invalidate(name)
+            start = time.perf_counter()
+            response = client.get(f'/users/{name}')
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+        return latencies
+
+    with patch('app.mongo', mongo), patch('app.profile_cache', profile_cache):
+        misses = lookups(clear=True)
+        hits = lookups(clear=False)
+
+        # Many requests for a username whose entry just expired
+        profile_cache.invalidate('user0')
+        loads = []
+        load = profile_cache.load
+        profile_cache.load = lambda username: loads.append(username) or load(username)
+        threads = [threading.Thread(target=client.get, args=('/users/user0',)) for _ in range(args.stampede)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    print(f"simulated Mongo latency: {args.latency_ms if not args.mongo_uri else 'real'} ms")
+    print(f"{'path':>6}  {'lookups':>7}  {'p50 ms':>7}  {'p99 ms':>7}")
+    for label, latencies in (('miss', misses), ('hit', hits)):
+        print(f"{label:>6}  {len(latencies):>7}  {percentile(latencies, 50) * 1000:>7.2f}  {percentile(latencies, 99) * 1000:>7.2f}")
+    print(f"{args.stampede} concurrent misses on one username -> {len(loads)} Mongo load(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+# Requests per second of the REST API under the Flask development server
+# (app.run, as `python app.py` serves it) and under gunicorn with
+# gunicorn.conf.py, at --workers x --threads. Closed-loop clients in --clients
+# processes call --path over a new connection per request. The gRPC server
+# isn't started; /status touches neither Mongo nor Redis.
+#
+#   python bench_serving.py --clients 16 --workers 1 4 --threads 4 --duration 10
+#
+# Run it with as many CPUs as production: with one CPU, extra workers only
+# add context switches.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def client(port, path, duration, results):
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        connection = http.client.HTTPConnection('localhost', port, timeout=10)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                done += 1
+            else:
+                errors += 1
+        except OSError:
+            errors += 1
+        finally:
+            connection.close()
+    results.put((done, errors))
+
+
+def wait_ready(port, path):
+    for _ in range(100):
+        try:
+            connection = http.client.HTTPConnection('localhost', port, timeout=1)
+            connection.request('GET', path)
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit('The server did not start')
+
+
+def measure(command, env, args):
+    server = subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(args.port, args.path)
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client, args=(args.port, args.path, args.duration, results))
+                   for _ in range(args.clients)]
+        for process in clients:
+            process.start()
+        totals = [results.get() for _ in clients]
+        for process in clients:
+            process.join()
+        return sum(done for done, _ in totals) / args.duration, sum(errors for _, errors in totals)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='REST throughput, development server vs gunicorn')
+    parser.add_argument('--clients', type=int, default=16, help='client processes')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4], help='gunicorn worker counts to try')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--path', default='/status')
+    parser.add_argument('--port', type=int, default=5160)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PORT=str(args.port), GRPC_SERVER='0', LIMITER_ENABLED='0')
+    runs = [('app.run (threaded)', [sys.executable, '-c', f'import app; app.app.run(port={args.port}, threaded=True)'], env)]
+    for workers in args.workers:
+        runs.append((f'gunicorn {workers}x{args.threads}', [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                     dict(env, GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(args.threads))))
+
+    print(f"{args.clients} clients on {args.path}, {os.cpu_count()} CPUs")
+    print(f"{'server':>20}  {'req/s':>7}  {'errors':>6}")
+    for label, command, run_env in runs:
+        rps, errors = measure(command, run_env, args)
+        print(f"{label:>20}  {rps:>7.0f}  {errors:>6}")
+
+
+if __name__ == '__main__':
+    main()
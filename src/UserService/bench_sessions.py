@@ -0,0 +1,62 @@
+import argparse
+import time
+from unittest.mock import patch
+
+import fakeredis
+import redis
+
+import app
+from sessions import SessionStore
+
+# Session validation throughput: validations per second answered from the
+# in-process cache versus read from Redis (local cache disabled), both straight
+# from the SessionStore and through GET /sessions/validate.
+#
+#   python bench_sessions.py --validations 20000 --redis-url redis://localhost:6379/0
+#
+# Without --redis-url fakeredis stands in, which has no network round trip, so
+# the Redis numbers are an upper bound.
+
+
+def rate(validate, tokens, validations):
+    start = time.perf_counter()
+    for i in range(validations):
+        validate(tokens[i % len(tokens)])
+    return validations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session validation benchmark')
+    parser.add_argument('--validations', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, default=1000, help='distinct tokens validated in turn')
+    parser.add_argument('--redis-url', help='use a real Redis instead of fakeredis')
+    args = parser.parse_args()
+
+    redis_client = redis.Redis.from_url(args.redis_url) if args.redis_url else fakeredis.FakeRedis()
+    stores = {
+        'cache hit': SessionStore(redis_client, local_ttl=3600),
+        'redis hit': SessionStore(redis_client, local_ttl=0)
+    }
+    tokens = [stores['cache hit'].create(f'user_id_{i}', f'user{i}') for i in range(args.sessions)]
+    client = app.app.test_client()
+
+    print(f"{'path':>10}  {'store/s':>9}  {'REST/s':>7}")
+    for label, store in stores.items():
+        for token in tokens:
+            store.validate(token)  # warm the local cache where it is enabled
+
+        def rest(token):
+            response = client.get('/sessions/validate', headers={'Authorization': f'Bearer {token}'})
+            assert response.status_code == 200
+
+        direct = rate(store.validate, tokens, args.validations)
+        with patch('app.sessions', store):
+            over_rest = rate(rest, tokens, args.validations // 10)
+        print(f"{label:>10}  {direct:>9.0f}  {over_rest:>7.0f}")
+
+    if args.redis_url:
+        redis_client.delete(*[stores['cache hit'].key(token) for token in tokens])
+
+
+if __name__ == '__main__':
+    main()
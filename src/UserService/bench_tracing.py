@@ -0,0 +1,103 @@
+import argparse
+import logging
+import time
+from unittest.mock import patch
+
+import fakeredis
+from flask import Flask, jsonify
+
+import tracing
+
+# Cost of the tracing layer: a span() on its own, and a Flask request that
+# makes three Redis calls and serializes a JSON reply, served with tracing
+# disabled (nothing installed), enabled but sampled out, enabled for every
+# request, and with the sampling profiler running (tracing disabled). The
+# trace records are formatted as usual but not written anywhere. Best of
+# --repeat runs.
+#
+#   python bench_tracing.py --requests 5000 --spans 1000000
+
+
+def span_cost(tracer, iterations, per_trace=1000):
+    # Seconds per span, timed in traces of per_trace spans so that a traced
+    # run doesn't keep millions of them
+    span = tracing.span
+    elapsed = 0.0
+    for _ in range(iterations // per_trace):
+        with tracer.trace('bench'):
+            start = time.perf_counter()
+            for _ in range(per_trace):
+                with span('redis.get'):
+                    pass
+            elapsed += time.perf_counter() - start
+    return elapsed / (iterations // per_trace * per_trace)
+
+
+def create_app(tracer, redis_client):
+    app = Flask(__name__)
+    tracing.init_flask(app, tracer, debug_endpoints=False)
+
+    @app.route('/users/<username>')
+    def get_user(username):
+        redis_client.get(f'profile:{username}')
+        redis_client.set(f'profile:{username}', username, ex=60)
+        redis_client.get(f'session:{username}')
+        return jsonify({'username': username, 'email': f'{username}@example.com'})
+    return app
+
+
+def request_cost(mode, requests, repeat, profiler):
+    tracer = tracing.Tracer(enabled=mode in ('sampled out', 'enabled'),
+                            sample_rate=0.0 if mode == 'sampled out' else 1.0,
+                            logger=logging.getLogger('bench_tracing'))
+    with patch.object(tracing.tracer, 'enabled', tracer.enabled):
+        redis_client = tracing.trace_redis(fakeredis.FakeRedis())
+    client = create_app(tracer, redis_client).test_client()
+    if mode == 'profiler running':
+        profiler.start()
+    try:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for i in range(requests):
+                client.get(f'/users/user{i % 100}')
+            best = min(best, (time.perf_counter() - start) / requests)
+    finally:
+        profiler.stop()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tracing and profiler overhead')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--spans', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--profile-interval-ms', type=float, default=tracing.PROFILE_INTERVAL_MS)
+    args = parser.parse_args()
+
+    logger = logging.getLogger('bench_tracing')
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    logger.setLevel(logging.INFO)
+
+    disabled = tracing.Tracer(enabled=False)
+    enabled = tracing.Tracer(enabled=True, logger=logger)
+    outside = min(span_cost(disabled, args.spans) for _ in range(args.repeat))
+    inside = min(span_cost(enabled, args.spans) for _ in range(args.repeat))
+    print(f"span() outside a trace: {outside * 1e9:.0f} ns, inside a trace: {inside * 1e9:.0f} ns")
+
+    profiler = tracing.Profiler(args.profile_interval_ms / 1000.0)
+    rows = []
+    baseline = None
+    for mode in ('disabled', 'sampled out', 'enabled', 'profiler running'):
+        cost = request_cost(mode, args.requests, args.repeat, profiler)
+        baseline = baseline or cost
+        rows.append((mode, f"{cost * 1e6:.1f}", f"{(cost / baseline - 1) * 100:+.1f}%"))
+
+    print(f"{'mode':>16}  {'us/request':>10}  {'overhead':>8}")
+    for row in rows:
+        print(f"{row[0]:>16}  {row[1]:>10}  {row[2]:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent import futures
+from types import SimpleNamespace
+
+import grpc
+import user_service_pb2
+import user_service_pb2_grpc
+from bench_grpc import run_server, wait_ready
+from user_client import UserClient
+
+# Client microbenchmark: GetUser lookups per second when every lookup opens
+# and closes its own channel (as grpc_client.py does) versus the shared,
+# pooled UserClient.
+#
+#   python bench_user_client.py --lookups 2000 --threads 1 8
+#
+# The server runs in its own process with the dict stand-in of bench_grpc.py
+# and no simulated latency, so the numbers are dominated by the client.
+
+
+def channel_per_call(target, username):
+    with grpc.insecure_channel(target) as channel:
+        stub = user_service_pb2_grpc.UserServiceStub(channel)
+        return stub.GetUser(user_service_pb2.GetUserRequest(username=username), timeout=5)
+
+
+def measure(lookup, lookups, threads):
+    names = [f'user{i}' for i in range(lookups)]
+    start = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        for user in executor.map(lookup, names):
+            assert user.found
+    return lookups / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UserService client microbenchmark')
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--port', type=int, default=50152)
+    args = parser.parse_args()
+
+    target = f'localhost:{args.port}'
+    server_args = SimpleNamespace(mongo_uri=None, users=args.lookups, latency_ms=0)
+    server = multiprocessing.get_context('spawn').Process(
+        target=run_server, args=('threads', args.port, server_args), daemon=True
+    )
+    server.start()
+    rows = []
+    try:
+        asyncio.run(wait_ready(args.port))
+        client = UserClient([target], timeout=5)
+        client.get_user('user0')  # connect before measuring
+        for threads in args.threads:
+            per_call = measure(lambda name: channel_per_call(target, name), args.lookups, threads)
+            pooled = measure(client.get_user, args.lookups, threads)
+            rows.append((threads, f"{per_call:.0f}", f"{pooled:.0f}", f"{pooled / per_call:.1f}x"))
+        client.close()
+    finally:
+        server.terminate()
+        server.join()
+
+    print(f"{'threads':>7}  {'channel per call/s':>18}  {'pooled client/s':>15}  {'speedup':>7}")
+    for row in rows:
+        print(f"{row[0]:>7}  {row[1]:>18}  {row[2]:>15}  {row[3]:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,20 @@ import grpc
 import user_service_pb2
 import user_service_pb2_grpc
 
+# Helpers for resolving many users over one channel. Both return
+# {username: GetUserResponse}; check .found for unknown usernames.
+
+def batch_get_users(stub, usernames, timeout=None):
+    # One RPC, one Mongo query on the server
+    response = stub.BatchGetUsers(user_service_pb2.BatchGetUsersRequest(usernames=usernames), timeout=timeout)
+    return {user.username: user for user in response.users}
+
+def stream_get_users(stub, usernames, timeout=None):
+    # Pipelined lookups: every request is sent without waiting for the
+    # previous answer, responses come back in request order
+    requests = (user_service_pb2.GetUserRequest(username=username) for username in usernames)
+    return {username: user for username, user in zip(usernames, stub.StreamGetUsers(requests, timeout=timeout))}
+
 def run():
     # Establish a channel and stub to communicate with the gRPC server
     with grpc.insecure_channel('localhost:50051') as channel:
@@ -13,5 +27,9 @@ def run():
         # Print the response from the server
         print("User found:", response.username, response.email, response.message)
 
+        # Resolve several users at once
+        for username, user in batch_get_users(stub, ['john_doe', 'jane_doe']).items():
+            print(f"{username}: {user.email if user.found else user.message}")
+
 if __name__ == '__main__':
     run()
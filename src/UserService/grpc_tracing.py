@@ -0,0 +1,88 @@
+import grpc
+
+import tracing
+from limiter import wrap_handler
+
+# gRPC server side of tracing.py: every RPC runs in a trace named after its
+# method, under the id the caller sent in the x-trace-id metadata (see
+# user_client.py) or a new one. The id is returned in the trailing metadata.
+# Only installed when tracing is enabled.
+
+
+def _incoming_trace_id(handler_call_details):
+    for key, value in handler_call_details.invocation_metadata or ():
+        if key == tracing.TRACE_METADATA_KEY:
+            return value
+    return None
+
+
+def _return_trace_id(context, trace):
+    if trace is not None:
+        context.set_trailing_metadata(((tracing.TRACE_METADATA_KEY, trace.trace_id),))
+
+
+class TracingInterceptor(grpc.ServerInterceptor):
+    def __init__(self, tracer=tracing.tracer):
+        self.tracer = tracer
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        tracer = self.tracer
+        method = handler_call_details.method
+        trace_id = _incoming_trace_id(handler_call_details)
+
+        def unary(behavior):
+            def traced(request, context):
+                with tracer.trace(method, trace_id) as trace:
+                    _return_trace_id(context, trace)
+                    return behavior(request, context)
+            return traced
+
+        def streaming(behavior):
+            def traced(request, context):
+                with tracer.trace(method, trace_id) as trace:
+                    _return_trace_id(context, trace)
+                    yield from behavior(request, context)
+            return traced
+
+        return wrap_handler(handler, unary, streaming)
+
+
+class AioTracingInterceptor(grpc.aio.ServerInterceptor):
+    def __init__(self, tracer=tracing.tracer):
+        self.tracer = tracer
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        tracer = self.tracer
+        method = handler_call_details.method
+        trace_id = _incoming_trace_id(handler_call_details)
+
+        def unary(behavior):
+            async def traced(request, context):
+                with tracer.trace(method, trace_id) as trace:
+                    _return_trace_id(context, trace)
+                    return await behavior(request, context)
+            return traced
+
+        def streaming(behavior):
+            async def traced(request, context):
+                with tracer.trace(method, trace_id) as trace:
+                    _return_trace_id(context, trace)
+                    async for response in behavior(request, context):
+                        yield response
+            return traced
+
+        return wrap_handler(handler, unary, streaming)
+
+
+def server_interceptors(tracer=tracing.tracer, aio=False):
+    # Outermost interceptors of the gRPC servers, so the trace also covers
+    # the time spent waiting for the concurrency limit
+    if not tracer.enabled:
+        return []
+    return [AioTracingInterceptor(tracer) if aio else TracingInterceptor(tracer)]
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing off the request threads.
+#
+# Hashing and checking passwords is deliberately slow and holds the GIL, so
+# it runs in a pool of worker processes and request threads only wait on the
+# result. At most max_pending hashes may be queued or running; beyond that
+# submit() raises HashingBusy at once (a 503 for the client) instead of
+# letting a login storm pile up behind the pool. workers=0 hashes on the
+# calling thread, which is how the service behaved before the pool.
+#
+# The method is any werkzeug method string, e.g. "scrypt:32768:8:1" or
+# "pbkdf2:sha256:600000". Hashes stored with other parameters are reported by
+# needs_rehash so logins can upgrade them.
+
+DEFAULT_METHOD = 'scrypt'
+
+# Seconds a request waits for its hash before giving up
+HASH_TIMEOUT = 30
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, workers=None, max_pending=None):
+        self.method = method
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or 4 * max(self.workers, 1)
+        self.rejected = 0
+        # The method as werkzeug writes it in front of the hash, with the
+        # default parameters filled in
+        self.current_method = generate_password_hash('', method).split('$', 1)[0]
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Not forked: the parent runs gRPC and Mongo client threads
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def submit(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy(f'More than {self.max_pending} password hashes pending')
+        try:
+            if self.workers == 0:
+                future = Future()
+                try:
+                    future.set_result(function(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = self._executor().submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash_async(self, password):
+        return self.submit(generate_password_hash, password, self.method)
+
+    def hash(self, password):
+        return self.hash_async(password).result(HASH_TIMEOUT)
+
+    def verify(self, stored_hash, password):
+        return self.submit(check_password_hash, stored_hash, password).result(HASH_TIMEOUT)
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split('$', 1)[0] != self.current_method
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
@@ -0,0 +1,232 @@
+import heapq
+import itertools
+import threading
+import time
+
+import grpc
+
+from metrics import ShardedCounter
+
+# Adaptive concurrency limit for the REST and gRPC servers.
+#
+# The number of requests allowed in flight follows AIMD, in the style of
+# Netflix's concurrency-limits: every request that completes within
+# latency_target while the limit was at least half used raises the limit by
+# one, and every request that is slower or fails cuts it by `backoff`. Past
+# saturation the limit settles where latency stays under the target, and the
+# excess is rejected at once instead of queueing until every request is slow.
+#
+# Requests have priority classes. A class may only fill its share of the
+# limit, so profile reads leave room for logins and health checks, and when
+# the limit is reached requests wait (at most max_wait seconds, max_queue of
+# them) in priority order for a free slot.
+
+CRITICAL = 0  # health checks and metrics
+HIGH = 1      # logins, registrations, session checks
+NORMAL = 2    # profile reads
+
+PRIORITY_NAMES = {CRITICAL: 'critical', HIGH: 'high', NORMAL: 'normal'}
+
+# Fraction of the limit each class may fill
+PRIORITY_SHARE = {CRITICAL: 1.0, HIGH: 0.9, NORMAL: 0.75}
+
+
+class AIMDLimit:
+    def __init__(self, initial=50, minimum=5, maximum=500, backoff=0.9, latency_target=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_target = latency_target
+
+    def sample(self, latency, in_flight, dropped):
+        # Called with the limiter's lock held
+        if dropped or latency > self.latency_target:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.maximum, self.limit + 1)
+
+
+class _Waiter:
+    __slots__ = ('event', 'admitted', 'cancelled')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+        self.cancelled = False
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit=None, max_queue=50, max_wait=0.05):
+        self.limit = limit or AIMDLimit()
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.shed = {priority: ShardedCounter() for priority in PRIORITY_NAMES}
+        self._waiters = []  # heap of (priority, sequence, waiter)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _admissible(self, priority):
+        return self.in_flight < max(1, int(self.limit.limit * PRIORITY_SHARE[priority]))
+
+    def _first_waiter(self):
+        while self._waiters and self._waiters[0][2].cancelled:
+            heapq.heappop(self._waiters)
+        return self._waiters[0] if self._waiters else None
+
+    def acquire(self, priority=NORMAL, wait=True):
+        # Returns True once the request may proceed, False if it is shed.
+        # Every admitted request must be followed by release().
+        with self._lock:
+            first = self._first_waiter()
+            # Don't overtake waiting requests of the same or a higher priority
+            if self._admissible(priority) and (first is None or first[0] > priority):
+                self.in_flight += 1
+                return True
+            if not wait or self.max_wait <= 0 or len(self._waiters) >= self.max_queue:
+                self.shed[priority].add()
+                return False
+            waiter = _Waiter()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            if waiter.admitted:
+                return True
+            waiter.cancelled = True
+        self.shed[priority].add()
+        return False
+
+    def release(self, latency, dropped=False):
+        with self._lock:
+            self.limit.sample(latency, self.in_flight, dropped)
+            self.in_flight -= 1
+            # Hand the free slots to the waiters, most important first
+            while (first := self._first_waiter()) is not None:
+                priority, _, waiter = first
+                if not self._admissible(priority):
+                    break
+                heapq.heappop(self._waiters)
+                waiter.admitted = True
+                self.in_flight += 1
+                waiter.event.set()
+
+    def shed_counts(self):
+        return {PRIORITY_NAMES[priority]: counter.value() for priority, counter in self.shed.items()}
+
+
+# gRPC servers: the limit is applied per RPC, with the priority of the method
+# taken from method_priorities ({'/package.Service/Method': priority}); other
+# methods are NORMAL.
+
+def _method_priority(method_priorities, handler_call_details):
+    return method_priorities.get(handler_call_details.method, NORMAL)
+
+
+OVERLOADED = 'Server overloaded, try again shortly'
+
+
+class LimiterInterceptor(grpc.ServerInterceptor):
+    def __init__(self, limiter, method_priorities=None):
+        self.limiter = limiter
+        self.method_priorities = method_priorities or {}
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        limiter = self.limiter
+        priority = _method_priority(self.method_priorities, handler_call_details)
+
+        def admit(context):
+            if not limiter.acquire(priority):
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, OVERLOADED)
+            return time.perf_counter()
+
+        def unary(behavior):
+            def limited(request, context):
+                started = admit(context)
+                failed = True
+                try:
+                    response = behavior(request, context)
+                    failed = False
+                    return response
+                finally:
+                    limiter.release(time.perf_counter() - started, failed)
+            return limited
+
+        def streaming(behavior):
+            def limited(request, context):
+                started = admit(context)
+                failed = True
+                try:
+                    yield from behavior(request, context)
+                    failed = False
+                finally:
+                    limiter.release(time.perf_counter() - started, failed)
+            return limited
+
+        return wrap_handler(handler, unary, streaming)
+
+
+class AioLimiterInterceptor(grpc.aio.ServerInterceptor):
+    # The event loop must not block, so RPCs over the limit are rejected
+    # without waiting for a slot
+    def __init__(self, limiter, method_priorities=None):
+        self.limiter = limiter
+        self.method_priorities = method_priorities or {}
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        limiter = self.limiter
+        priority = _method_priority(self.method_priorities, handler_call_details)
+
+        async def admit(context):
+            if not limiter.acquire(priority, wait=False):
+                await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, OVERLOADED)
+            return time.perf_counter()
+
+        def unary(behavior):
+            async def limited(request, context):
+                started = await admit(context)
+                failed = True
+                try:
+                    response = await behavior(request, context)
+                    failed = False
+                    return response
+                finally:
+                    limiter.release(time.perf_counter() - started, failed)
+            return limited
+
+        def streaming(behavior):
+            async def limited(request, context):
+                started = await admit(context)
+                failed = True
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                    failed = False
+                finally:
+                    limiter.release(time.perf_counter() - started, failed)
+            return limited
+
+        return wrap_handler(handler, unary, streaming)
+
+
+# The same method handler with its behavior wrapped by unary() or
+# streaming(), depending on whether the responses are streamed
+def wrap_handler(handler, unary, streaming):
+    serializers = {
+        'request_deserializer': handler.request_deserializer,
+        'response_serializer': handler.response_serializer
+    }
+    if handler.unary_unary:
+        return grpc.unary_unary_rpc_method_handler(unary(handler.unary_unary), **serializers)
+    if handler.stream_unary:
+        return grpc.stream_unary_rpc_method_handler(unary(handler.stream_unary), **serializers)
+    if handler.unary_stream:
+        return grpc.unary_stream_rpc_method_handler(streaming(handler.unary_stream), **serializers)
+    return grpc.stream_stream_rpc_method_handler(streaming(handler.stream_stream), **serializers)
@@ -0,0 +1,344 @@
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+# Request metrics for the service, exposed on /metrics in the Prometheus text
+# format.
+#
+# The request path only touches per-thread cells: every counter and histogram
+# keeps one shard per thread that writes to it, and readers add the shards
+# up. Nothing is locked while recording, no update is lost between threads,
+# and a scrape never slows requests down (see ThreadShards). The request rate is estimated over
+# a sliding window from samples of the request counter taken by a background
+# thread, not on the request path.
+
+
+class _ThreadExit:
+    # Kept in a thread's threading.local; freed, and its finalizer run, when
+    # the thread ends
+    __slots__ = ('__weakref__',)
+
+
+class ThreadShards:
+    # The per-thread shards of one metric. When a thread ends its shard is
+    # folded into a single retired shard, so servers that start a thread per
+    # connection (app.run) don't pile up one shard per request. Readers hold
+    # `lock` while adding the shards up.
+    def __init__(self, new, fold):
+        # new() makes an empty shard, fold(into, shard) adds shard to into
+        self.new = new
+        self.fold = fold
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.retired = new()
+        self._live = []
+
+    def create(self):
+        # The calling thread's shard, on its first write
+        shard = self.new()
+        exit_marker = _ThreadExit()
+        with self.lock:
+            self._live.append(shard)
+        self.local.shard = shard
+        self.local.exit_marker = exit_marker
+        weakref.finalize(exit_marker, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self.lock:
+            self._live.remove(shard)
+            self.fold(self.retired, shard)
+
+    def all(self):
+        # Every shard including the retired one; call with lock held
+        return self._live + [self.retired]
+
+
+def _fold_cell(into, cell):
+    into[0] += cell[0]
+
+
+class ShardedCounter:
+    def __init__(self):
+        self._shards = ThreadShards(lambda: [0], _fold_cell)
+        self._local = self._shards.local
+
+    def add(self, amount=1):
+        try:
+            self._local.shard[0] += amount
+        except AttributeError:
+            self._shards.create()[0] += amount
+
+    def value(self):
+        with self._shards.lock:
+            return sum(cell[0] for cell in self._shards.all())
+
+
+# Latency histograms record microseconds in log-linear buckets, HDR style:
+# exact below 16 us, then 8 buckets per power of two, so every bucket is
+# within 12.5% of the values it holds. 256 buckets reach past four hours.
+SUB_BUCKET_BITS = 3
+LINEAR_LIMIT = 1 << (SUB_BUCKET_BITS + 1)
+BUCKETS = 256
+SUM = BUCKETS  # slot holding the sum of the recorded microseconds
+
+# Bucket boundaries in seconds reported to Prometheus
+EXPORTED_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def bucket_index(micros):
+    if micros < LINEAR_LIMIT:
+        return micros
+    shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+    index = (shift << SUB_BUCKET_BITS) + (micros >> shift)
+    return index if index < BUCKETS else BUCKETS - 1
+
+
+# Buckets of every latency below 65 ms, looked up instead of computed on the
+# request path (BUCKETS fits in a byte)
+FAST_LIMIT = 1 << 16
+_BUCKET_OF = bytes(bucket_index(micros) for micros in range(FAST_LIMIT))
+
+
+def bucket_bounds(index):
+    # [lower, upper) of a bucket in microseconds
+    if index < LINEAR_LIMIT:
+        return index, index + 1
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+def new_counts():
+    return [0] * (BUCKETS + 1)
+
+
+def merge_counts(merged, counts):
+    for i, count in enumerate(counts):
+        merged[i] += count
+    return merged
+
+
+def total_count(counts):
+    return sum(counts[:BUCKETS])
+
+
+def percentile(counts, pct):
+    # Upper bound, in seconds, of the bucket holding the percentile
+    total = total_count(counts)
+    if not total:
+        return 0.0
+    rank = pct / 100.0 * total
+    seen = 0
+    for index in range(BUCKETS):
+        seen += counts[index]
+        if seen >= rank and counts[index]:
+            return bucket_bounds(index)[1] / 1000000.0
+    return bucket_bounds(BUCKETS - 1)[1] / 1000000.0
+
+
+def cumulative(counts, bounds=EXPORTED_BOUNDS):
+    # (bound in seconds, number of values below it) for each bound; a bucket
+    # counts towards the first bound its upper end doesn't exceed
+    result = []
+    index = 0
+    seen = 0
+    for bound in bounds:
+        limit = bound * 1000000
+        while index < BUCKETS and bucket_bounds(index)[1] <= limit:
+            seen += counts[index]
+            index += 1
+        result.append((bound, seen))
+    return result
+
+
+class Histogram:
+    def __init__(self):
+        self._shards = ThreadShards(new_counts, merge_counts)
+        self._local = self._shards.local
+
+    def record(self, seconds):
+        try:
+            counts = self._local.shard
+        except AttributeError:
+            counts = self._shards.create()
+        micros = int(seconds * 1000000)
+        counts[_BUCKET_OF[micros] if micros < FAST_LIMIT else bucket_index(micros)] += 1
+        counts[SUM] += micros
+
+    def snapshot(self):
+        merged = new_counts()
+        with self._shards.lock:
+            for counts in self._shards.all():
+                merge_counts(merged, counts)
+        return merged
+
+
+class SlidingRate:
+    # Events per second over the last `window` seconds of a counter; read()
+    # returns its current total
+    def __init__(self, read, window=10):
+        self.read = read
+        self.window = window
+        self._samples = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._samples.append((now, self.read()))
+            # Keep one sample at or before the start of the window
+            while len(self._samples) > 2 and self._samples[1][0] <= now - self.window:
+                self._samples.popleft()
+
+    def rate(self):
+        with self._lock:
+            if len(self._samples) < 2:
+                return 0.0
+            (start, first), (end, last) = self._samples[0], self._samples[-1]
+        return (last - first) / (end - start) if end > start else 0.0
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _ThreadShard:
+    __slots__ = ('requests', 'latency')
+
+    def __init__(self):
+        self.requests = 0
+        # endpoint -> method -> bucket counts, nested rather than keyed by
+        # (method, endpoint) so that finished() builds no tuple
+        self.latency = {}
+
+    def histograms(self):
+        # ((method, endpoint), bucket counts) pairs; safe to call while the
+        # owning thread adds endpoints
+        for endpoint, methods in list(self.latency.items()):
+            for method, counts in list(methods.items()):
+                yield (method, endpoint), counts
+
+
+def _fold_thread_shard(into, shard):
+    into.requests += shard.requests
+    for (method, endpoint), counts in shard.histograms():
+        merge_counts(into.latency.setdefault(endpoint, {}).setdefault(method, new_counts()), counts)
+
+
+_now_ns = time.perf_counter_ns
+
+
+class RequestMetrics:
+    # Request count, in-flight gauge and per-endpoint latency histograms,
+    # all kept in one shard per request thread so that recording a request
+    # is a handful of attribute and list updates. Finished requests are only
+    # counted by the histograms; the in-flight gauge is derived from them.
+    def __init__(self, prefix, window=10):
+        self.prefix = prefix
+        self.rate = SlidingRate(self.request_count, window)
+        self._shards = ThreadShards(_ThreadShard, _fold_thread_shard)
+        self._local = self._shards.local
+        self._gauges = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def started(self):
+        # Returns the start time to hand to finished()
+        try:
+            self._local.shard.requests += 1
+        except AttributeError:
+            self._shards.create().requests += 1
+        return _now_ns()
+
+    def finished(self, method, endpoint, started):
+        micros = (_now_ns() - started) // 1000
+        try:
+            latency = self._local.shard.latency
+        except AttributeError:
+            latency = self._shards.create().latency
+        try:
+            counts = latency[endpoint][method]
+        except KeyError:
+            counts = latency.setdefault(endpoint, {}).setdefault(method, new_counts())
+        counts[_BUCKET_OF[micros] if micros < FAST_LIMIT else bucket_index(micros)] += 1
+        counts[SUM] += micros
+
+    def request_count(self):
+        with self._shards.lock:
+            return sum(shard.requests for shard in self._shards.all())
+
+    def in_flight(self):
+        # A request may finish on another thread than the one it started on
+        with self._shards.lock:
+            shards = self._shards.all()
+            finished = sum(total_count(counts) for shard in shards for _, counts in shard.histograms())
+            return sum(shard.requests for shard in shards) - finished
+
+    def latency(self):
+        # {(method, endpoint): merged bucket counts}
+        merged = {}
+        with self._shards.lock:
+            for shard in self._shards.all():
+                for key, counts in shard.histograms():
+                    merge_counts(merged.setdefault(key, new_counts()), counts)
+        return merged
+
+    def add_metric(self, name, help_text, read, metric_type='gauge', label=None):
+        # read is called on every scrape and must be cheap. With a label,
+        # read returns {label value: value}.
+        self._gauges.append((self.prefix + name, help_text, read, metric_type, label))
+
+    def start(self, on_tick=None, interval=1.0):
+        # Samples the request rate every interval seconds and calls on_tick
+        # after each sample
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(on_tick, interval),
+                                            name='metrics-ticker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, on_tick, interval):
+        while not self._stop.wait(interval):
+            self.rate.tick()
+            if on_tick is not None:
+                try:
+                    on_tick(self)
+                except Exception:
+                    logging.exception('Metrics tick failed')
+
+    def render(self):
+        p = self.prefix
+        lines = [
+            f'# HELP {p}requests_total Requests received.',
+            f'# TYPE {p}requests_total counter',
+            f'{p}requests_total {self.request_count()}',
+            f'# HELP {p}requests_in_flight Requests being handled.',
+            f'# TYPE {p}requests_in_flight gauge',
+            f'{p}requests_in_flight {self.in_flight()}',
+            f'# HELP {p}request_rate Requests per second over the last {self.rate.window} seconds.',
+            f'# TYPE {p}request_rate gauge',
+            f'{p}request_rate {self.rate.rate():.3f}',
+            f'# HELP {p}request_duration_seconds Request latency by endpoint.',
+            f'# TYPE {p}request_duration_seconds histogram',
+        ]
+        for (method, endpoint), counts in sorted(self.latency().items()):
+            labels = f'method="{_label(method)}",endpoint="{_label(endpoint)}"'
+            for bound, count in cumulative(counts):
+                lines.append(f'{p}request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{p}request_duration_seconds_bucket{{{labels},le="+Inf"}} {total_count(counts)}')
+            lines.append(f'{p}request_duration_seconds_sum{{{labels}}} {counts[SUM] / 1000000.0}')
+            lines.append(f'{p}request_duration_seconds_count{{{labels}}} {total_count(counts)}')
+        for name, help_text, read, metric_type, label in self._gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if label is None:
+                lines.append(f'{name} {read()}')
+                continue
+            for label_value, value in sorted(read().items()):
+                lines.append(f'{name}{{{label}="{_label(label_value)}"}} {value}')
+        return '\n'.join(lines) + '\n'
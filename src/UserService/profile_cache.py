@@ -0,0 +1,138 @@
+import json
+import logging
+import threading
+
+from redis.exceptions import RedisError
+
+# Read-through cache of user profiles in Redis, shared by the REST and gRPC
+# lookups. A profile is stored as JSON under "user_profile:<username>" for
+# PROFILE_TTL seconds; an unknown username is stored as "null" for the
+# shorter NEGATIVE_TTL so repeated lookups of it don't reach Mongo either.
+#
+# Concurrent misses for the same username within this process share a single
+# load (single-flight), so a hot key expiring sends one query to Mongo rather
+# than one per waiting request. If Redis is unavailable lookups fall through
+# to Mongo.
+
+PROFILE_TTL = 300
+NEGATIVE_TTL = 30
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.profile = None
+        self.error = None
+
+
+class ProfileCache:
+    def __init__(self, redis_client, load, load_many=None, ttl=PROFILE_TTL, negative_ttl=NEGATIVE_TTL,
+                 prefix='user_profile:'):
+        # load(username) returns the profile dict, or None if there is no such
+        # user; load_many(usernames) returns {username: profile} for the users
+        # that exist
+        self.redis = redis_client
+        self.load = load
+        self.load_many = load_many or self._load_each
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefix = prefix
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def key(self, username):
+        return self.prefix + username
+
+    def get(self, username):
+        # Returns (profile or None, 'cache' | 'database')
+        try:
+            cached = self.redis.get(self.key(username))
+        except RedisError as e:
+            logging.warning(f"Profile cache unavailable, reading {username} from the database: {e}")
+            cached = None
+        if cached is not None:
+            return json.loads(cached), 'cache'
+        return self._load_once(username), 'database'
+
+    def get_many(self, usernames):
+        # Returns {username: profile or None}: one MGET, then one load_many for
+        # all the misses. Batches don't take part in the single-flight.
+        usernames = list(dict.fromkeys(usernames))
+        if not usernames:
+            return {}
+        try:
+            cached = self.redis.mget([self.key(u) for u in usernames])
+        except RedisError as e:
+            logging.warning(f"Profile cache unavailable, reading {len(usernames)} users from the database: {e}")
+            cached = [None] * len(usernames)
+
+        profiles = {}
+        misses = []
+        for username, value in zip(usernames, cached):
+            if value is None:
+                misses.append(username)
+            else:
+                profiles[username] = json.loads(value)
+        if misses:
+            loaded = self.load_many(misses)
+            for username in misses:
+                profiles[username] = loaded.get(username)
+            self._store_many({username: profiles[username] for username in misses})
+        return profiles
+
+    def invalidate(self, username):
+        try:
+            self.redis.delete(self.key(username))
+        except RedisError as e:
+            # A stale entry lives on until its TTL runs out
+            logging.warning(f"Could not invalidate the cached profile of {username}: {e}")
+
+    def _load_each(self, usernames):
+        profiles = {}
+        for username in usernames:
+            profile = self.load(username)
+            if profile is not None:
+                profiles[username] = profile
+        return profiles
+
+    def _load_once(self, username):
+        with self._lock:
+            flight = self._flights.get(username)
+            leader = flight is None
+            if leader:
+                flight = self._flights[username] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.profile
+
+        try:
+            flight.profile = self.load(username)
+            self._store(username, flight.profile)
+            return flight.profile
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[username]
+            flight.done.set()
+
+    def _store(self, username, profile):
+        ttl = self.ttl if profile is not None else self.negative_ttl
+        try:
+            self.redis.set(self.key(username), json.dumps(profile), ex=ttl)
+        except RedisError as e:
+            logging.warning(f"Could not cache the profile of {username}: {e}")
+
+    def _store_many(self, profiles):
+        pipe = self.redis.pipeline(transaction=False)
+        for username, profile in profiles.items():
+            ttl = self.ttl if profile is not None else self.negative_ttl
+            pipe.set(self.key(username), json.dumps(profile), ex=ttl)
+        try:
+            pipe.execute()
+        except RedisError as e:
+            logging.warning(f"Could not cache {len(profiles)} profiles: {e}")
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# Login sessions, stored in Redis so that every UserService instance (and,
+# through ValidateSession, every other service) can check them.
+#
+# A login creates a random token; Redis keeps "session:<sha256 of the token>"
+# -> {"user_id", "username"} for SESSION_TTL seconds, so a dump of Redis holds
+# no usable tokens. Validating a token reads the session and its remaining
+# lifetime in one pipelined round trip, and the answer is kept in process for
+# at most LOCAL_TTL seconds (never past the session's own expiry), so repeat
+# validations of a busy token don't reach Redis at all. A logout is therefore
+# seen by other instances within LOCAL_TTL seconds.
+#
+# Redis errors are raised to the caller: a session that can't be checked is
+# not treated as valid.
+
+SESSION_TTL = 3600
+LOCAL_TTL = 5.0
+LOCAL_SIZE = 10000
+
+
+class SessionStore:
+    def __init__(self, redis_client, ttl=SESSION_TTL, local_ttl=LOCAL_TTL, local_size=LOCAL_SIZE,
+                 prefix='session:'):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._local = OrderedDict()  # token -> (session, expires_at)
+        self._lock = threading.Lock()
+
+    def key(self, token):
+        return self.prefix + hashlib.sha256(token.encode()).hexdigest()
+
+    def create(self, user_id, username):
+        # Returns the new session's token
+        token = secrets.token_urlsafe(32)
+        session = {'user_id': user_id, 'username': username}
+        self.redis.set(self.key(token), json.dumps(session), ex=self.ttl)
+        return token
+
+    def cached(self, token):
+        # The session if it was validated in the last LOCAL_TTL seconds,
+        # without going to Redis
+        with self._lock:
+            entry = self._local.get(token)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._local[token]
+                return None
+            self._local.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def validate(self, token):
+        # Returns {'user_id', 'username'}, or None for an unknown or expired
+        # token
+        if not token:
+            return None
+        session = self.cached(token)
+        if session is not None:
+            return session
+        self.misses += 1
+        pipe = self.redis.pipeline(transaction=False)
+        key = self.key(token)
+        pipe.get(key)
+        pipe.pttl(key)
+        value, remaining_ms = pipe.execute()
+        if value is None:
+            return None
+        session = json.loads(value)
+        # A key without an expiry reports -1
+        lifetime = self.local_ttl if remaining_ms < 0 else min(self.local_ttl, remaining_ms / 1000.0)
+        self._remember(token, session, lifetime)
+        return session
+
+    def revoke(self, token):
+        with self._lock:
+            self._local.pop(token, None)
+        self.redis.delete(self.key(token))
+
+    def _remember(self, token, session, lifetime):
+        with self._lock:
+            self._local[token] = (session, time.monotonic() + lifetime)
+            self._local.move_to_end(token)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
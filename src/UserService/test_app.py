@@ -1,7 +1,22 @@
-from app import app, mongo, cache  # Import the components from the app
+from app import app, mongo, cache, profile_cache  # Import the components from the app
 from flask import json
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
+from concurrent import futures
+import fakeredis
+import grpc
+from app import UserServicer
+from grpc_client import batch_get_users, stream_get_users
+from profile_cache import ProfileCache
+from hashing import PasswordHasher
+from sessions import SessionStore
+import app as user_app
+import asyncio
+import socket
+import user_service_pb2
+import user_service_pb2_grpc
 from werkzeug.security import generate_password_hash  # Import the password hashing function
 
 
@@ -9,6 +24,12 @@ class TestUserService(unittest.TestCase):
     def setUp(self):
         self.app = app.test_client()
         self.app.testing = True
+        # Every test starts with an empty profile cache
+        redis_client = fakeredis.FakeRedis()
+        for patcher in (patch.object(profile_cache, 'redis', redis_client), patch('app.cache', redis_client),
+                        patch('app.sessions', SessionStore(redis_client))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
 
     @patch('app.mongo')
     def test_register_user(self, mock_mongo):
@@ -35,9 +56,32 @@ class TestUserService(unittest.TestCase):
     @patch('app.mongo')
     def test_get_user(self, mock_mongo):
         # Mock a user found in the database
-        mock_mongo.db.users.find_one.return_value = {'username': 'john_doe', 'email': 'john@example.com'}
+        mock_mongo.db.users.find_one.return_value = {'_id': 'user_id_123', 'username': 'john_doe', 'email': 'john@example.com'}
         response = self.app.get('/users/john_doe')
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['source'], 'database')
+
+    @patch('app.mongo')
+    def test_get_user_from_cache(self, mock_mongo):
+        mock_mongo.db.users.find_one.return_value = {'_id': 'user_id_123', 'username': 'john_doe', 'email': 'john@example.com'}
+        self.app.get('/users/john_doe')
+        response = self.app.get('/users/john_doe')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {'source': 'cache', 'username': 'john_doe', 'email': 'john@example.com'})
+        self.assertEqual(mock_mongo.db.users.find_one.call_count, 1)
+
+    @patch('app.mongo')
+    def test_unknown_user_is_cached_until_registered(self, mock_mongo):
+        mock_mongo.db.users.find_one.return_value = None
+        self.assertEqual(self.app.get('/users/john_doe').status_code, 404)
+        self.assertEqual(self.app.get('/users/john_doe').status_code, 404)
+        self.assertEqual(mock_mongo.db.users.find_one.call_count, 1)
+
+        self.app.post('/register', json={'username': 'john_doe', 'email': 'john@example.com', 'password': 'password'})
+        mock_mongo.db.users.find_one.return_value = {'_id': 'user_id_123', 'username': 'john_doe', 'email': 'john@example.com'}
+        response = self.app.get('/users/john_doe')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['source'], 'database')
     
     @patch('app.mongo')
     def test_get_user_not_found(self, mock_mongo):
@@ -60,6 +104,197 @@ class TestUserService(unittest.TestCase):
             'password': 'wrongpassword'  # Incorrect password
         })
         self.assertEqual(response.status_code, 401)
+    @patch('app.mongo')
+    def test_login_user(self, mock_mongo):
+        mock_mongo.db.users.find_one.return_value = {
+            '_id': 'user_id_123',
+            'username': 'john_doe',
+            'password': generate_password_hash('password')
+        }
+        response = self.app.post('/login', json={'username': 'john_doe', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        mock_mongo.db.users.update_one.assert_not_called()
+
+    @patch('app.mongo')
+    def test_sessions(self, mock_mongo):
+        def login(username):
+            mock_mongo.db.users.find_one.return_value = {
+                '_id': f'id_{username}', 'username': username, 'password': generate_password_hash('password')
+            }
+            response = self.app.post('/login', json={'username': username, 'password': 'password'})
+            return {'Authorization': f"Bearer {json.loads(response.data)['token']}"}
+
+        # Concurrent users each keep their own session
+        john, jane = login('john_doe'), login('jane_doe')
+        self.assertEqual(json.loads(self.app.get('/sessions/validate', headers=john).data),
+                         {'id': 'id_john_doe', 'username': 'john_doe'})
+        self.assertEqual(json.loads(self.app.get('/sessions/validate', headers=jane).data)['username'], 'jane_doe')
+
+        self.assertEqual(self.app.post('/logout', headers=john).status_code, 200)
+        self.assertEqual(self.app.get('/sessions/validate', headers=john).status_code, 401)
+        self.assertEqual(self.app.get('/sessions/validate', headers=jane).status_code, 200)
+        self.assertEqual(self.app.get('/sessions/validate').status_code, 401)
+
+    @patch('app.mongo')
+    def test_login_without_redis(self, mock_mongo):
+        mock_mongo.db.users.find_one.return_value = {
+            '_id': 'user_id_123', 'username': 'john_doe', 'password': generate_password_hash('password')
+        }
+        server = fakeredis.FakeServer()
+        server.connected = False
+        with patch('app.sessions', SessionStore(fakeredis.FakeRedis(server=server))):
+            response = self.app.post('/login', json={'username': 'john_doe', 'password': 'password'})
+        self.assertEqual(response.status_code, 503)
+
+    @patch('app.mongo')
+    def test_login_upgrades_outdated_hash(self, mock_mongo):
+        old_hash = generate_password_hash('password', 'pbkdf2:sha256:1000')
+        mock_mongo.db.users.find_one.return_value = {'_id': 'user_id_123', 'username': 'john_doe', 'password': old_hash}
+        with patch('app.password_hasher', PasswordHasher(workers=0)):
+            response = self.app.post('/login', json={'username': 'john_doe', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        query, update = mock_mongo.db.users.update_one.call_args[0]
+        self.assertEqual(query, {'_id': 'user_id_123', 'password': old_hash})
+        self.assertTrue(update['$set']['password'].startswith('scrypt:'))
+
+    @patch('app.mongo')
+    def test_register_rejected_when_hashing_is_saturated(self, mock_mongo):
+        mock_mongo.db.users.find_one.return_value = None
+        hasher = PasswordHasher(workers=0, max_pending=1)
+        hasher._slots.acquire()  # the only slot is taken
+        with patch('app.password_hasher', hasher):
+            response = self.app.post('/register', json={
+                'username': 'john_doe',
+                'email': 'john@example.com',
+                'password': 'password'
+            })
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(hasher.rejected, 1)
+        mock_mongo.db.users.insert_one.assert_not_called()
+
+    def test_metrics(self):
+        self.app.get('/status')
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('user_service_request_duration_seconds_count{method="GET",endpoint="/status"}',
+                      response.get_data(as_text=True))
+
+
+class UserLookupTestCase(unittest.TestCase):
+    # Two known users in a mocked database, with an empty profile cache
+    def setUp(self):
+        patcher = patch.object(profile_cache, 'redis', fakeredis.FakeRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = {
+            'john_doe': {'_id': 'user_id_1', 'username': 'john_doe', 'email': 'john@example.com'},
+            'jane_doe': {'_id': 'user_id_2', 'username': 'jane_doe', 'email': 'jane@example.com'}
+        }
+        mongo_patcher = patch('app.mongo')
+        self.mongo = mongo_patcher.start()
+        self.addCleanup(mongo_patcher.stop)
+        self.mongo.db.users.find_one.side_effect = lambda query, *args: self.users.get(query['username'])
+        self.mongo.db.users.find.side_effect = lambda query, *args: [
+            self.users[u] for u in query['username']['$in'] if u in self.users
+        ]
+
+
+class TestUserServicer(UserLookupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+        user_service_pb2_grpc.add_UserServiceServicer_to_server(UserServicer(), self.server)
+        port = self.server.add_insecure_port('localhost:0')
+        self.server.start()
+        self.addCleanup(self.server.stop, None)
+        self.channel = grpc.insecure_channel(f'localhost:{port}')
+        self.addCleanup(self.channel.close)
+        self.stub = user_service_pb2_grpc.UserServiceStub(self.channel)
+
+    def test_batch_get_users_uses_one_query(self):
+        users = batch_get_users(self.stub, ['jane_doe', 'nobody', 'john_doe'], timeout=5)
+        self.assertEqual(users['jane_doe'].user_id, 'user_id_2')
+        self.assertEqual(users['john_doe'].email, 'john@example.com')
+        self.assertFalse(users['nobody'].found)
+        self.assertEqual(self.mongo.db.users.find.call_count, 1)
+
+        # The second batch is served from the cache, unknown users included
+        batch_get_users(self.stub, ['jane_doe', 'nobody', 'john_doe'], timeout=5)
+        self.assertEqual(self.mongo.db.users.find.call_count, 1)
+
+    def test_stream_get_users(self):
+        users = stream_get_users(self.stub, ['john_doe', 'nobody', 'jane_doe'], timeout=5)
+        self.assertEqual([u.found for u in users.values()], [True, False, True])
+        self.assertEqual(users['jane_doe'].email, 'jane@example.com')
+
+
+    def test_validate_session(self):
+        store = SessionStore(fakeredis.FakeRedis())
+        token = store.create('user_id_1', 'john_doe')
+        with patch('app.sessions', store):
+            valid = self.stub.ValidateSession(user_service_pb2.ValidateSessionRequest(token=token), timeout=5)
+            invalid = self.stub.ValidateSession(user_service_pb2.ValidateSessionRequest(token='forged'), timeout=5)
+        self.assertEqual((valid.valid, valid.user_id, valid.username), (True, 'user_id_1', 'john_doe'))
+        self.assertFalse(invalid.valid)
+
+
+class TestAioUserServicer(UserLookupTestCase):
+    def test_lookups_on_the_aio_server(self):
+        with socket.socket() as s:
+            s.bind(('localhost', 0))
+            port = s.getsockname()[1]
+
+        async def scenario():
+            server = user_app.create_grpc_aio_server(port)
+            await server.start()
+            try:
+                async with grpc.aio.insecure_channel(f'localhost:{port}') as channel:
+                    stub = user_service_pb2_grpc.UserServiceStub(channel)
+                    user = await stub.GetUser(user_service_pb2.GetUserRequest(username='john_doe'), timeout=5)
+                    self.assertEqual((user.email, user.user_id), ('john@example.com', 'user_id_1'))
+
+                    with self.assertRaises(grpc.aio.AioRpcError) as error:
+                        await stub.GetUser(user_service_pb2.GetUserRequest(username='nobody'), timeout=5)
+                    self.assertEqual(error.exception.code(), grpc.StatusCode.NOT_FOUND)
+
+                    batch = await stub.BatchGetUsers(
+                        user_service_pb2.BatchGetUsersRequest(usernames=['jane_doe', 'nobody']), timeout=5
+                    )
+                    self.assertEqual([u.found for u in batch.users], [True, False])
+            finally:
+                await server.stop(None)
+
+        asyncio.run(scenario())
+
+
+class TestProfileCache(unittest.TestCase):
+    def test_concurrent_misses_share_one_load(self):
+        loads = []
+
+        def load(username):
+            loads.append(username)
+            time.sleep(0.05)
+            return {'username': username, 'email': 'john@example.com'}
+
+        profile_cache = ProfileCache(fakeredis.FakeRedis(), load)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(profile_cache.get('john_doe'))) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(loads, ['john_doe'])
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(profile['username'] == 'john_doe' for profile, _ in results))
+
+    def test_falls_back_to_the_database_without_redis(self):
+        server = fakeredis.FakeServer()
+        server.connected = False
+        broken = fakeredis.FakeRedis(server=server)
+        profile_cache = ProfileCache(broken, lambda username: {'username': username, 'email': 'john@example.com'})
+        profile, source = profile_cache.get('john_doe')
+        self.assertEqual((profile['username'], source), ('john_doe', 'database'))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from concurrent import futures
+from unittest.mock import patch
+
+import grpc
+
+import app
+import tracing
+import user_service_pb2
+import user_service_pb2_grpc
+from grpc_tracing import TracingInterceptor
+from test_app import UserLookupTestCase
+from user_client import UserClient
+
+
+class TestGrpcPropagation(UserLookupTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = patch.object(tracing.tracer, 'enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tracer = tracing.tracer
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=2),
+                                  interceptors=[TracingInterceptor(self.tracer)])
+        user_service_pb2_grpc.add_UserServiceServicer_to_server(app.UserServicer(), self.server)
+        self.target = f'localhost:{self.server.add_insecure_port("localhost:0")}'
+        self.server.start()
+        self.addCleanup(self.server.stop, None)
+
+    def test_client_passes_the_trace_on(self):
+        client = UserClient([self.target], timeout=5)
+        self.addCleanup(client.close)
+        with self.tracer.trace('ws.join') as trace:
+            self.assertEqual(client.get_user('john_doe').user_id, 'user_id_1')
+        client_record = self.tracer.recent[-1]
+        server_record = self.tracer.recent[-2]
+        self.assertEqual(server_record['trace_id'], trace.trace_id)
+        self.assertEqual(server_record['name'], '/user_service.UserService/GetUser')
+        self.assertEqual([s['name'] for s in client_record['spans']], ['grpc.GetUser'])
+
+    def test_trace_id_is_returned_in_trailing_metadata(self):
+        with grpc.insecure_channel(self.target) as channel:
+            stub = user_service_pb2_grpc.UserServiceStub(channel)
+            _, call = stub.GetUser.with_call(user_service_pb2.GetUserRequest(username='jane_doe'),
+                                             metadata=(('x-trace-id', 'abc123'),), timeout=5)
+            self.assertIn(('x-trace-id', 'abc123'), call.trailing_metadata())
+            streamed = list(stub.StreamGetUsers(iter([user_service_pb2.GetUserRequest(username='john_doe')]),
+                                                timeout=5))
+            self.assertTrue(streamed[0].found)
+        self.assertEqual(self.tracer.recent[-1]['name'], '/user_service.UserService/StreamGetUsers')
+
+
+if __name__ == '__main__':
+    unittest.main()
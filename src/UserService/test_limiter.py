@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import fakeredis
+import grpc
+import app
+import user_service_pb2
+import user_service_pb2_grpc
+from limiter import ConcurrencyLimiter, AIMDLimit, CRITICAL, HIGH, NORMAL
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def test_aimd(self):
+        limit = AIMDLimit(initial=10, minimum=5, latency_target=0.1)
+        limit.sample(0.01, in_flight=5, dropped=False)
+        self.assertEqual(limit.limit, 11)
+        # Not raised while the limit isn't being used
+        limit.sample(0.01, in_flight=1, dropped=False)
+        self.assertEqual(limit.limit, 11)
+        limit.sample(0.5, in_flight=5, dropped=False)
+        self.assertAlmostEqual(limit.limit, 9.9)
+        for _ in range(20):
+            limit.sample(0.01, in_flight=5, dropped=True)
+        self.assertEqual(limit.limit, 5)
+
+    def test_classes_fill_their_share_of_the_limit(self):
+        limiter = ConcurrencyLimiter(AIMDLimit(initial=4), max_wait=0)
+        self.assertTrue(limiter.acquire(NORMAL))
+        self.assertTrue(limiter.acquire(NORMAL))
+        self.assertTrue(limiter.acquire(NORMAL))
+        self.assertFalse(limiter.acquire(NORMAL))
+        self.assertTrue(limiter.acquire(CRITICAL))
+        self.assertFalse(limiter.acquire(CRITICAL))
+        self.assertEqual(limiter.shed_counts(), {'critical': 1, 'high': 0, 'normal': 1})
+
+    def test_waiters_are_admitted_by_priority(self):
+        limiter = ConcurrencyLimiter(AIMDLimit(initial=1, minimum=1), max_wait=5)
+        self.assertTrue(limiter.acquire(CRITICAL))
+        admitted = []
+
+        def wait(priority):
+            if limiter.acquire(priority):
+                admitted.append(priority)
+
+        threads = [threading.Thread(target=wait, args=(priority,)) for priority in (NORMAL, HIGH)]
+        for thread in threads:
+            thread.start()
+        while len(limiter._waiters) < 2:
+            time.sleep(0.001)
+        limiter.release(0.01)
+        time.sleep(0.05)
+        self.assertEqual(admitted, [HIGH])
+        limiter.release(0.01)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(admitted, [HIGH, NORMAL])
+
+
+class TestLimitedServers(unittest.TestCase):
+    def setUp(self):
+        # A limiter with no free slot for profile reads
+        self.limiter = ConcurrencyLimiter(AIMDLimit(initial=2, minimum=2), max_wait=0)
+        self.limiter.acquire(NORMAL)
+        for patcher in (patch('app.limiter', self.limiter), patch('app.mongo'),
+                        patch.object(app.profile_cache, 'redis', fakeredis.FakeRedis())):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rest_sheds_profile_reads_before_health_checks(self):
+        client = app.app.test_client()
+        response = client.get('/users/john_doe')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(client.get('/status').status_code, 200)
+        self.assertEqual(self.limiter.in_flight, 1)
+        self.assertEqual(self.limiter.shed_counts()['normal'], 1)
+
+    def test_grpc_sheds_with_resource_exhausted(self):
+        server = app.create_grpc_server(0)
+        port = server.add_insecure_port('localhost:0')
+        server.start()
+        self.addCleanup(server.stop, None)
+        with grpc.insecure_channel(f'localhost:{port}') as channel:
+            stub = user_service_pb2_grpc.UserServiceStub(channel)
+            with self.assertRaises(grpc.RpcError) as error:
+                stub.GetUser(user_service_pb2.GetUserRequest(username='john_doe'), timeout=5)
+            self.assertEqual(error.exception.code(), grpc.StatusCode.RESOURCE_EXHAUSTED)
+            health = user_service_pb2_grpc.HealthStub(channel).Check(user_service_pb2.HealthCheckRequest(), timeout=5)
+            self.assertEqual(health.status, user_service_pb2.HealthCheckResponse.SERVING)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import threading
+import unittest
+from metrics import (ShardedCounter, Histogram, SlidingRate, RequestMetrics, bucket_bounds, bucket_index,
+                     percentile, cumulative, total_count, BUCKETS)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_adds_up_across_threads(self):
+        counter = ShardedCounter()
+
+        def work():
+            for _ in range(10000):
+                counter.add()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.value(), 80000)
+
+    def test_shards_of_finished_threads_are_folded(self):
+        metrics = RequestMetrics('test_')
+        counter = ShardedCounter()
+
+        def request():
+            counter.add()
+            metrics.finished('GET', '/status', metrics.started())
+
+        # One thread per request, as app.run serves them
+        for _ in range(50):
+            thread = threading.Thread(target=request)
+            thread.start()
+            thread.join()
+        self.assertEqual(metrics._shards._live, [])
+        self.assertEqual((metrics.request_count(), metrics.in_flight(), counter.value()), (50, 0, 50))
+        self.assertEqual(total_count(metrics.latency()[('GET', '/status')]), 50)
+
+    def test_buckets_are_contiguous(self):
+        for index in range(1, BUCKETS):
+            self.assertEqual(bucket_bounds(index - 1)[1], bucket_bounds(index)[0])
+            lower, upper = bucket_bounds(index)
+            self.assertEqual(bucket_index(lower), index)
+            self.assertEqual(bucket_index(upper - 1), index)
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram()
+        for micros in range(1, 1001):
+            histogram.record(micros / 1000000.0)
+        snapshot = histogram.snapshot()
+        self.assertEqual(total_count(snapshot), 1000)
+        # Within the 12.5% precision of the buckets
+        self.assertAlmostEqual(percentile(snapshot, 50), 0.0005, delta=0.0005 * 0.125)
+        self.assertAlmostEqual(percentile(snapshot, 99), 0.00099, delta=0.00099 * 0.125)
+        # Buckets straddling a Prometheus bound are counted under the next one
+        below = dict(cumulative(snapshot))
+        self.assertGreaterEqual(below[0.001], 875)
+        self.assertEqual(below[0.0025], 1000)
+
+    def test_sliding_rate(self):
+        counter = ShardedCounter()
+        rate = SlidingRate(counter.value, window=10)
+        for second in range(30):
+            counter.add(5 if second < 20 else 50)
+            rate.tick(now=second)
+        # The last 10 seconds only
+        self.assertAlmostEqual(rate.rate(), 50.0)
+
+    def test_render(self):
+        metrics = RequestMetrics('test_')
+        metrics.finished('GET', '/users/<string:username>', metrics.started())
+        metrics.started()
+        metrics.add_metric('rejected_total', 'Rejected.', lambda: 3, 'counter')
+        text = metrics.render()
+        self.assertIn('test_requests_total 2\n', text)
+        self.assertIn('test_requests_in_flight 1\n', text)
+        self.assertIn('test_request_duration_seconds_count{method="GET",endpoint="/users/<string:username>"} 1\n', text)
+        self.assertIn('test_rejected_total 3\n', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
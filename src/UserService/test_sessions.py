@@ -0,0 +1,64 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import fakeredis
+from redis.exceptions import RedisError
+
+from sessions import SessionStore
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.sessions = SessionStore(self.redis, ttl=60, local_ttl=5)
+
+    def test_create_and_validate(self):
+        token = self.sessions.create('user_id_1', 'john_doe')
+        self.assertEqual(self.sessions.validate(token), {'user_id': 'user_id_1', 'username': 'john_doe'})
+        self.assertIsNone(self.sessions.validate('forged'))
+        self.assertIsNone(self.sessions.validate(''))
+        # The token itself isn't stored in Redis
+        self.assertFalse(any(token.encode() in key for key in self.redis.keys()))
+        self.assertLessEqual(self.redis.ttl(self.sessions.key(token)), 60)
+
+    def test_repeat_validations_skip_redis(self):
+        token = self.sessions.create('user_id_1', 'john_doe')
+        self.sessions.validate(token)
+        with patch.object(self.sessions, 'redis') as redis_client:
+            for _ in range(3):
+                self.assertEqual(self.sessions.validate(token)['username'], 'john_doe')
+        redis_client.pipeline.assert_not_called()
+        self.assertEqual((self.sessions.hits, self.sessions.misses), (3, 1))
+
+    def test_local_entry_never_outlives_the_session(self):
+        token = self.sessions.create('user_id_1', 'john_doe')
+        self.redis.pexpire(self.sessions.key(token), 50)
+        self.sessions.validate(token)
+        time.sleep(0.1)
+        self.assertIsNone(self.sessions.validate(token))
+
+    def test_revoke(self):
+        token = self.sessions.create('user_id_1', 'john_doe')
+        self.sessions.validate(token)
+        self.sessions.revoke(token)
+        self.assertIsNone(self.sessions.validate(token))
+
+    def test_local_cache_is_bounded(self):
+        sessions = SessionStore(self.redis, local_size=2)
+        tokens = [sessions.create(f'user_id_{i}', f'user{i}') for i in range(3)]
+        for token in tokens:
+            sessions.validate(token)
+        self.assertIsNone(sessions.cached(tokens[0]))
+        self.assertIsNotNone(sessions.cached(tokens[2]))
+
+    def test_redis_errors_are_raised(self):
+        server = fakeredis.FakeServer()
+        server.connected = False
+        sessions = SessionStore(fakeredis.FakeRedis(server=server))
+        with self.assertRaises(RedisError):
+            sessions.validate('token')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import threading
+import time
+import unittest
+from concurrent import futures
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import fakeredis
+from flask import Flask, jsonify
+
+import tracing
+
+# Shared by UserService and FinanceService like tracing.py itself, so both
+# copies of the module are tested; the gRPC side is in
+# UserService/test_grpc_tracing.py
+
+
+def enabled_tracer(**kwargs):
+    return tracing.Tracer(enabled=True, logger=SimpleNamespace(info=lambda record: None), **kwargs)
+
+
+def empty_span(name):
+    with tracing.span(name):
+        pass
+
+
+class TestTracer(unittest.TestCase):
+    def test_disabled(self):
+        tracer = tracing.Tracer(enabled=False)
+        with tracer.trace('request') as trace:
+            self.assertIsNone(trace)
+            self.assertIs(tracing.span('mongo.find'), tracing.NO_SPAN)
+            self.assertIsNone(tracing.outgoing_metadata())
+        self.assertEqual(list(tracer.recent), [])
+
+    def test_spans_and_breakdown(self):
+        tracer = enabled_tracer()
+        with tracer.trace('request') as trace:
+            with tracing.span('mongo.find', collection='users'):
+                time.sleep(0.01)
+            with tracing.span('hash.verify'):
+                pass
+            self.assertEqual(tracing.current_trace_id(), trace.trace_id)
+            self.assertEqual(tracing.outgoing_metadata(), (('x-trace-id', trace.trace_id),))
+        self.assertIsNone(tracing.current_trace_id())
+
+        record = tracer.recent[-1]
+        self.assertEqual(record['trace_id'], trace.trace_id)
+        self.assertEqual([s['name'] for s in record['spans']], ['mongo.find', 'hash.verify'])
+        self.assertEqual(record['spans'][0]['collection'], 'users')
+        self.assertGreaterEqual(record['breakdown_ms']['mongo'], 10)
+        self.assertEqual(set(record['breakdown_ms']), {'mongo', 'hash', 'other'})
+
+    def test_errors_are_recorded(self):
+        tracer = enabled_tracer()
+        with self.assertRaises(KeyError):
+            with tracer.trace('request'):
+                raise KeyError('user')
+        self.assertEqual(tracer.recent[-1]['error'], 'KeyError')
+
+    def test_sampling_and_incoming_ids(self):
+        tracer = enabled_tracer(sample_rate=0.5, random=lambda: 0.9)
+        self.assertIsNone(tracer.start('request'))
+        # A caller's id is always traced; malformed ones are not trusted
+        started = tracer.start('request', 'abc-123')
+        self.assertEqual(started[0].trace_id, 'abc-123')
+        tracer.finish(started)
+        self.assertIsNone(tracer.start('request', 'not valid; id'))
+
+    def test_bind_carries_the_trace_to_other_threads(self):
+        tracer = enabled_tracer()
+        with futures.ThreadPoolExecutor(max_workers=1) as executor:
+            with tracer.trace('request'):
+                executor.submit(tracing.bind(empty_span), 'redis.get').result()
+                executor.submit(empty_span, 'redis.set').result()
+        self.assertEqual([s['name'] for s in tracer.recent[-1]['spans']], ['redis.get'])
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(tracing.tracer, 'enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tracer = tracing.tracer
+
+    def test_mongo_commands(self):
+        listener, = tracing.mongo_listeners()
+        command = SimpleNamespace(command_name='find', command={'find': 'users'}, connection_id=('localhost', 1),
+                                  request_id=7, duration_micros=2500)
+        with self.tracer.trace('request'):
+            listener.started(command)
+            listener.succeeded(command)
+        span = self.tracer.recent[-1]['spans'][0]
+        self.assertEqual((span['name'], span['duration_ms'], span['collection']), ('mongo.find', 2.5, 'users'))
+        # Commands outside a trace aren't tracked
+        listener.started(command)
+        listener.succeeded(command)
+        self.assertEqual(listener._collections, {})
+
+    def test_redis_commands_and_pipelines(self):
+        client = tracing.trace_redis(fakeredis.FakeRedis())
+        with self.tracer.trace('request'):
+            client.set('key', 'value')
+            client.get('key')
+            with client.pipeline() as pipeline:
+                pipeline.get('key').expire('key', 60).execute()
+        spans = self.tracer.recent[-1]['spans']
+        self.assertEqual([s['name'] for s in spans], ['redis.set', 'redis.get', 'redis.pipeline'])
+        self.assertEqual(spans[2]['commands'], 2)
+
+    def test_disabled_clients_are_untouched(self):
+        with patch.object(tracing.tracer, 'enabled', False):
+            client = fakeredis.FakeRedis()
+            self.assertNotIn('execute_command', vars(tracing.trace_redis(client)))
+            self.assertEqual(tracing.mongo_listeners(), [])
+
+
+class TestFlask(unittest.TestCase):
+    def setUp(self):
+        self.tracer = enabled_tracer()
+        self.profiler = tracing.Profiler()
+        self.addCleanup(self.profiler.stop)
+        flask_app = Flask(__name__)
+        tracing.init_flask(flask_app, self.tracer, debug_endpoints=False)
+        flask_app.register_blueprint(tracing.debug_blueprint(self.tracer, self.profiler))
+
+        @flask_app.route('/users/<username>')
+        def get_user(username):
+            with tracing.span('mongo.find'):
+                pass
+            return jsonify({'username': username})
+        self.client = flask_app.test_client()
+
+    def test_requests_are_traced(self):
+        response = self.client.get('/users/john_doe', headers={'X-Trace-Id': 'from-gateway'})
+        self.assertEqual(response.headers['X-Trace-Id'], 'from-gateway')
+        generated = self.client.get('/users/jane_doe').headers['X-Trace-Id']
+        self.assertNotEqual(generated, 'from-gateway')
+
+        traces = self.client.get('/debug/traces').get_json()['traces']
+        self.assertEqual([t['trace_id'] for t in traces[:2]], ['from-gateway', generated])
+        self.assertEqual(traces[0]['name'], 'get_user')
+        self.assertEqual(traces[0]['path'], '/users/john_doe')
+        self.assertIn('mongo', traces[0]['breakdown_ms'])
+        self.assertIn('serialize', traces[0]['breakdown_ms'])
+
+    def test_profiler_endpoints(self):
+        stop = threading.Event()
+
+        def spin_in_a_recognizable_function():
+            while not stop.is_set():
+                sum(range(1000))
+        worker = threading.Thread(target=spin_in_a_recognizable_function, name='spinner')
+        worker.start()
+        try:
+            self.assertEqual(self.client.post('/debug/profiler/start?interval_ms=1').get_json()['interval_ms'], 1)
+            self.assertFalse(self.client.post('/debug/profiler/start').get_json()['started'])
+            time.sleep(0.2)
+            self.assertGreater(self.client.post('/debug/profiler/stop').get_json()['samples'], 0)
+        finally:
+            stop.set()
+            worker.join()
+
+        folded = self.client.get('/debug/profiler').get_data(as_text=True)
+        lines = [line for line in folded.splitlines() if line.startswith('spinner;')]
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertIn('spin_in_a_recognizable_function (test_tracing.py:', stack)
+        self.assertGreater(int(count), 0)
+        self.assertEqual(self.client.post('/debug/profiler/start?interval_ms=-1').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import socket
+import threading
+import time
+import unittest
+from concurrent import futures
+from unittest.mock import patch
+
+import fakeredis
+import grpc
+import app
+import user_service_pb2_grpc
+from test_app import UserLookupTestCase
+from sessions import SessionStore
+from user_client import UserClient, RetryBudget
+
+
+def unused_target():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return f'localhost:{s.getsockname()[1]}'
+
+
+class TestUserClient(UserLookupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        user_service_pb2_grpc.add_UserServiceServicer_to_server(app.UserServicer(), self.server)
+        self.target = f'localhost:{self.server.add_insecure_port("localhost:0")}'
+        self.server.start()
+        self.addCleanup(self.server.stop, None)
+
+    def client(self, targets, **kwargs):
+        client = UserClient(targets, timeout=5, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_lookups(self):
+        client = self.client([self.target])
+        self.assertEqual(client.get_user('john_doe').user_id, 'user_id_1')
+        self.assertIsNone(client.get_user('nobody'))
+        users = client.batch_get_users(['jane_doe', 'nobody'])
+        self.assertTrue(users['jane_doe'].found)
+        self.assertFalse(users['nobody'].found)
+
+    def test_validate_session(self):
+        store = SessionStore(fakeredis.FakeRedis())
+        token = store.create('user_id_1', 'john_doe')
+        client = self.client([self.target])
+        with patch('app.sessions', store):
+            self.assertEqual(client.validate_session(token), ('user_id_1', 'john_doe'))
+            self.assertIsNone(client.validate_session('forged'))
+
+    def test_retries_on_the_next_endpoint(self):
+        client = self.client([unused_target(), self.target])
+        for _ in range(4):
+            self.assertEqual(client.get_user('john_doe').email, 'john@example.com')
+
+    def test_retry_budget_limits_retries(self):
+        client = self.client([unused_target(), unused_target()], budget=RetryBudget(min_tokens=0))
+        with self.assertRaises(grpc.RpcError) as error:
+            client.get_user('john_doe')
+        self.assertEqual(error.exception.code(), grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(client.budget.tokens, 0.1)
+
+    def test_hedged_call_answers_from_the_faster_endpoint(self):
+        calls = []
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow_first_call(username):
+            calls.append(username)
+            if len(calls) == 1:
+                release.wait(1)
+            return {'id': 'user_id_1', 'username': username, 'email': 'john@example.com'}, 'database'
+
+        client = self.client([self.target], hedge_after=0.05)
+        with patch.object(app.profile_cache, 'get', side_effect=slow_first_call):
+            start = time.monotonic()
+            self.assertTrue(client.get_user('john_doe').found)
+            self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
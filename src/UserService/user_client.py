@@ -0,0 +1,153 @@
+import itertools
+import os
+import queue
+import threading
+import time
+
+import grpc
+import tracing
+import user_service_pb2
+import user_service_pb2_grpc
+
+# Reusable UserService client for other services.
+#
+# Channels are opened once per process and shared (get_client), so lookups
+# don't pay a TCP and HTTP/2 handshake each. Calls are spread round-robin over
+# every endpoint in USER_SERVICE_TARGETS and carry a deadline. Calls that fail
+# with UNAVAILABLE or RESOURCE_EXHAUSTED are retried on the next endpoint, as
+# long as the retry budget allows: retries may add at most RETRY_RATIO extra
+# calls on top of the normal traffic, so an outage isn't amplified into a
+# retry storm. With hedge_after set, a lookup that hasn't answered after that
+# many seconds is also sent to another endpoint and the first answer wins;
+# hedges are paid for from the same budget. Calls made during a trace (see
+# tracing.py) pass its id on in the metadata and are timed as spans.
+
+DEFAULT_TIMEOUT = 1.0
+MAX_ATTEMPTS = 3
+RETRY_RATIO = 0.1
+RETRYABLE = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+
+class RetryBudget:
+    # Every call earns `ratio` of a retry, up to `max_tokens`; a retry or
+    # hedge spends one. `min_tokens` keeps a few retries for quiet periods.
+    def __init__(self, ratio=RETRY_RATIO, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.tokens = float(min_tokens)
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class UserClient:
+    def __init__(self, targets, timeout=DEFAULT_TIMEOUT, max_attempts=MAX_ATTEMPTS, hedge_after=None,
+                 budget=None, options=None):
+        if not targets:
+            raise ValueError('At least one UserService target is required')
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.hedge_after = hedge_after
+        self.budget = budget or RetryBudget()
+        self.channels = [grpc.insecure_channel(target, options=options or []) for target in targets]
+        self.stubs = [user_service_pb2_grpc.UserServiceStub(channel) for channel in self.channels]
+        self._next = itertools.count()
+
+    def _stub(self):
+        return self.stubs[next(self._next) % len(self.stubs)]
+
+    def get_user(self, username, timeout=None):
+        # Returns the GetUserResponse, or None if there is no such user
+        request = user_service_pb2.GetUserRequest(username=username)
+        try:
+            return self._call('GetUser', request, timeout)
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.NOT_FOUND:
+                return None
+            raise
+
+    def batch_get_users(self, usernames, timeout=None):
+        # Returns {username: GetUserResponse}; check .found for unknown users
+        request = user_service_pb2.BatchGetUsersRequest(usernames=usernames)
+        response = self._call('BatchGetUsers', request, timeout)
+        return {user.username: user for user in response.users}
+
+    def validate_session(self, token, timeout=None):
+        # Returns (user_id, username) for a valid session token, or None
+        response = self._call('ValidateSession', user_service_pb2.ValidateSessionRequest(token=token), timeout)
+        return (response.user_id, response.username) if response.valid else None
+
+    def _call(self, method, request, timeout):
+        with tracing.span(f'grpc.{method}'):
+            return self._attempt(method, request, timeout, tracing.outgoing_metadata())
+
+    def _attempt(self, method, request, timeout, metadata):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if self.hedge_after is not None and self.hedge_after < remaining:
+                    return self._hedged(method, request, remaining, metadata)
+                return getattr(self._stub(), method)(request, timeout=remaining, metadata=metadata)
+            except grpc.RpcError as e:
+                if (e.code() not in RETRYABLE or attempt >= self.max_attempts
+                        or deadline - time.monotonic() <= 0 or not self.budget.withdraw()):
+                    raise
+                attempt += 1
+
+    def _hedged(self, method, request, timeout, metadata=None):
+        # Sends the call, and a second copy to another endpoint if the first
+        # hasn't answered within hedge_after; returns the first success
+        answers = queue.Queue()
+        calls = [getattr(self._stub(), method).future(request, timeout=timeout, metadata=metadata)]
+        calls[0].add_done_callback(answers.put)
+        try:
+            try:
+                first = answers.get(timeout=self.hedge_after)
+            except queue.Empty:
+                if not self.budget.withdraw():
+                    return calls[0].result()
+                hedge = getattr(self._stub(), method).future(request, timeout=timeout - self.hedge_after,
+                                                             metadata=metadata)
+                calls.append(hedge)
+                calls[1].add_done_callback(answers.put)
+                first = answers.get()
+            if first.exception() is None or len(calls) == 1:
+                return first.result()
+            # The first answer failed; the other call may still succeed
+            return answers.get().result()
+        finally:
+            for call in calls:
+                call.cancel()
+
+    def close(self):
+        for channel in self.channels:
+            channel.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(targets=None, **kwargs):
+    # The process-wide client for these targets (default: the comma-separated
+    # USER_SERVICE_TARGETS), created on first use
+    if targets is None:
+        targets = [t.strip() for t in os.getenv('USER_SERVICE_TARGETS', 'localhost:50051').split(',') if t.strip()]
+    key = tuple(targets)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = UserClient(list(targets), **kwargs)
+        return client
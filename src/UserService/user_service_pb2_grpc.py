@@ -26,7 +26,7 @@ if _version_not_supported:
 
 
 class UserServiceStub(object):
-    """The user service definition
+    """The user service definition
     """
 
     def __init__(self, channel):
@@ -40,10 +40,25 @@ class UserServiceStub(object):
                 request_serializer=user__service__pb2.GetUserRequest.SerializeToString,
                 response_deserializer=user__service__pb2.GetUserResponse.FromString,
                 _registered_method=True)
+        self.BatchGetUsers = channel.unary_unary(
+                '/user_service.UserService/BatchGetUsers',
+                request_serializer=user__service__pb2.BatchGetUsersRequest.SerializeToString,
+                response_deserializer=user__service__pb2.BatchGetUsersResponse.FromString,
+                _registered_method=True)
+        self.StreamGetUsers = channel.stream_stream(
+                '/user_service.UserService/StreamGetUsers',
+                request_serializer=user__service__pb2.GetUserRequest.SerializeToString,
+                response_deserializer=user__service__pb2.GetUserResponse.FromString,
+                _registered_method=True)
+        self.ValidateSession = channel.unary_unary(
+                '/user_service.UserService/ValidateSession',
+                request_serializer=user__service__pb2.ValidateSessionRequest.SerializeToString,
+                response_deserializer=user__service__pb2.ValidateSessionResponse.FromString,
+                _registered_method=True)
 
 
 class UserServiceServicer(object):
-    """The user service definition
+    """The user service definition
     """
 
     def GetUser(self, request, context):
@@ -52,6 +67,27 @@ class UserServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BatchGetUsers(self, request, context):
+        """Resolves many users with one lookup; the results follow the order of the request
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamGetUsers(self, request_iterator, context):
+        """Pipelined lookups over one stream, one response per request in order
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ValidateSession(self, request, context):
+        """Checks a session token issued by /login
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_UserServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -60,6 +96,21 @@ def add_UserServiceServicer_to_server(servicer, server):
                     request_deserializer=user__service__pb2.GetUserRequest.FromString,
                     response_serializer=user__service__pb2.GetUserResponse.SerializeToString,
             ),
+            'BatchGetUsers': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchGetUsers,
+                    request_deserializer=user__service__pb2.BatchGetUsersRequest.FromString,
+                    response_serializer=user__service__pb2.BatchGetUsersResponse.SerializeToString,
+            ),
+            'StreamGetUsers': grpc.stream_stream_rpc_method_handler(
+                    servicer.StreamGetUsers,
+                    request_deserializer=user__service__pb2.GetUserRequest.FromString,
+                    response_serializer=user__service__pb2.GetUserResponse.SerializeToString,
+            ),
+            'ValidateSession': grpc.unary_unary_rpc_method_handler(
+                    servicer.ValidateSession,
+                    request_deserializer=user__service__pb2.ValidateSessionRequest.FromString,
+                    response_serializer=user__service__pb2.ValidateSessionResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'user_service.UserService', rpc_method_handlers)
@@ -69,7 +120,7 @@ def add_UserServiceServicer_to_server(servicer, server):
 
  # This class is part of an EXPERIMENTAL API.
 class UserService(object):
-    """The user service definition
+    """The user service definition
     """
 
     @staticmethod
@@ -99,9 +150,90 @@ class UserService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def BatchGetUsers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/user_service.UserService/BatchGetUsers',
+            user__service__pb2.BatchGetUsersRequest.SerializeToString,
+            user__service__pb2.BatchGetUsersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamGetUsers(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/user_service.UserService/StreamGetUsers',
+            user__service__pb2.GetUserRequest.SerializeToString,
+            user__service__pb2.GetUserResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ValidateSession(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/user_service.UserService/ValidateSession',
+            user__service__pb2.ValidateSessionRequest.SerializeToString,
+            user__service__pb2.ValidateSessionResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class HealthStub(object):
-    """gRPC health check service
+    """gRPC health check service
     """
 
     def __init__(self, channel):
@@ -118,7 +250,7 @@ class HealthStub(object):
 
 
 class HealthServicer(object):
-    """gRPC health check service
+    """gRPC health check service
     """
 
     def Check(self, request, context):
@@ -144,7 +276,7 @@ def add_HealthServicer_to_server(servicer, server):
 
  # This class is part of an EXPERIMENTAL API.
 class Health(object):
-    """gRPC health check service
+    """gRPC health check service
     """
 
     @staticmethod
@@ -0,0 +1,82 @@
+import json
+import os
+
+# Benchmark results and baselines. A results file is
+#
+#   {"environment": {...}, "scenarios": {name: {metric: value}}}
+#
+# and a baseline is simply an earlier results file. A run regresses when a
+# metric is worse than the baseline by more than the threshold (a fraction:
+# 0.2 allows 20%).
+
+# Metrics compared against the baseline and whether a larger value is better
+COMPARED_METRICS = {
+    'throughput': True,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'alloc_peak_kib': False,
+}
+
+
+def percentile(ordered, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))]
+
+
+def summarize(latencies, elapsed, errors):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput': len(ordered) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+    }
+
+
+def compare(results, baseline, threshold):
+    # Returns a list of (scenario, metric, baseline value, current value)
+    # for every metric that regressed past the threshold
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in current or metric not in previous:
+                continue
+            before, after = previous[metric], current[metric]
+            if higher_is_better:
+                worse = after < before * (1 - threshold)
+            else:
+                worse = after > before * (1 + threshold)
+            if worse:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def environment_differences(results, baseline):
+    # Settings that make the two runs incomparable, as (key, baseline, current)
+    return [
+        (key, baseline['environment'].get(key), value)
+        for key, value in results['environment'].items()
+        if key in baseline.get('environment', {}) and baseline['environment'][key] != value
+    ]
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path, results):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,214 @@
+import argparse
+import contextlib
+import gc
+import itertools
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import results
+import services as service_setup
+from scenarios import HttpClient, SCENARIOS
+
+# End-to-end benchmark suite for both services: the REST endpoints, the gRPC
+# GetUser and the WebSocket join/contribute protocol, all served in this
+# process over real sockets, with mongomock and fakeredis standing in for
+# Mongo and Redis (or local servers with --mongo-uri / --redis-url). It needs
+# the requirements.txt and requirements-dev.txt of both services.
+#
+#   python src/benchmarks/run.py
+#   python src/benchmarks/run.py --save-baseline              # record a baseline
+#   python src/benchmarks/run.py --threshold 0.2              # fail on a >20% regression
+#   python src/benchmarks/run.py --scenarios user.get_user finance.ws_contribute
+#
+# Every scenario is warmed up, then --requests calls are made by --concurrency
+# closed-loop client threads, and throughput and p50/p95/p99 latency are
+# reported. Allocations are measured in a separate, sequential pass under
+# tracemalloc, which slows everything down: alloc_peak_kib is the median of
+# the most memory a single request had allocated at once (client and server
+# side), retained_b the growth of live memory per request over the pass.
+# Python has no count of allocations, so the peak stands in for it. REST
+# requests are sent straight to the WSGI app in this pass (see HttpClient).
+#
+# With a baseline file present (--baseline, default baselines/local.json next
+# to this script), the run exits with status 1 when a scenario's throughput,
+# latency or allocations got worse than the baseline by more than
+# --threshold. Baselines depend on the machine, so keep one per machine.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, 'baselines', 'local.json')
+
+
+def run_load(call, requests, concurrency):
+    counter = itertools.count()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        mine = []
+        failed = 0
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            try:
+                call(i)
+            except Exception:
+                failed += 1
+                continue
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results.summarize(latencies, time.perf_counter() - start, sum(errors))
+
+
+def measure_allocations(call, samples, offset):
+    HttpClient.in_process = True
+    # The first calls on this thread set up connections and caches
+    for i in range(offset, offset + 10):
+        call(i)
+    offset += 10
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        peaks = []
+        for i in range(offset, offset + samples):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            call(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        gc.collect()
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        HttpClient.in_process = False
+    return {
+        'alloc_peak_kib': statistics.median(peaks) / 1024,
+        'retained_b': (end - start) / samples,
+    }
+
+
+def run_scenario(factory, services, args):
+    call = factory(services, args)
+    try:
+        for i in range(args.warmup):
+            call(i)
+        result = run_load(call, args.requests, args.concurrency)
+        if args.alloc_samples:
+            result.update(measure_allocations(call, args.alloc_samples, args.requests))
+        return result
+    finally:
+        close = getattr(call, 'close', None)
+        if close is not None:
+            close()
+
+
+def print_results(scenario_results):
+    headers = ('scenario', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'peak KiB', 'retained B', 'errors')
+    rows = []
+    for name, r in scenario_results.items():
+        rows.append((name, f"{r['throughput']:.0f}", f"{r['p50_ms']:.2f}", f"{r['p95_ms']:.2f}", f"{r['p99_ms']:.2f}",
+                     f"{r['alloc_peak_kib']:.1f}" if 'alloc_peak_kib' in r else '-',
+                     f"{r['retained_b']:.0f}" if 'retained_b' in r else '-', r['errors']))
+    widths = [max(len(str(h)), *(len(str(row[i])) for row in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmarks of UserService and FinanceService')
+    parser.add_argument('--scenarios', nargs='+', help='scenarios to run (default: all); prefixes such as "user." work too')
+    parser.add_argument('--list', action='store_true', help='list the scenarios and exit')
+    parser.add_argument('--requests', type=int, default=2000, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--alloc-samples', type=int, default=200, help='requests measured under tracemalloc, 0 to skip')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated Mongo round trip of the stand-in')
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:1000', help='password hash used by the login scenario')
+    parser.add_argument('--mongo-uri', help='use a local Mongo instead of mongomock')
+    parser.add_argument('--redis-url', help='use a local Redis instead of fakeredis (its database is flushed)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed regression, as a fraction')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(SCENARIOS))
+        return 0
+    selected = [name for name in SCENARIOS
+                if not args.scenarios or any(name == s or name.startswith(s) for s in args.scenarios)]
+    if not selected:
+        raise SystemExit(f"No such scenario; choose from {', '.join(SCENARIOS)}")
+
+    # Keep the services' start-up output out of the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        services = SimpleNamespace(
+            user=service_setup.start_user_service(args) if any(n.startswith('user.') for n in selected) else None,
+            finance=service_setup.start_finance_service(args) if any(n.startswith('finance.') for n in selected) else None
+        )
+        try:
+            scenario_results = {}
+            for name in selected:
+                scenario_results[name] = run_scenario(SCENARIOS[name], services, args)
+                print(f"{name} done", file=sys.stderr)
+        finally:
+            for service in (services.user, services.finance):
+                if service is not None:
+                    service.stop()
+
+    run = {
+        'environment': {
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'mongo': 'local' if args.mongo_uri else 'mongomock',
+            'redis': 'local' if args.redis_url else 'fakeredis',
+            'latency_ms': args.latency_ms,
+            'concurrency': args.concurrency,
+            'hash_method': args.hash_method,
+        },
+        'scenarios': scenario_results,
+    }
+    print_results(scenario_results)
+    if args.output:
+        results.save(args.output, run)
+
+    if args.save_baseline:
+        results.save(args.baseline, run)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        return 0
+
+    baseline = results.load(args.baseline)
+    for key, before, after in results.environment_differences(run, baseline):
+        print(f"Warning: {key} was {before} in the baseline and is {after} now")
+    regressions = results.compare(run, baseline, args.threshold)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+        return 0
+    print(f"Regressions beyond {args.threshold:.0%} of {args.baseline}:")
+    for name, metric, before, after in regressions:
+        print(f"  {name} {metric}: {before:.2f} -> {after:.2f}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import http.client
+import json
+import threading
+
+import grpc
+from websockets.sync.client import connect
+
+import services as _service_paths  # noqa: F401 (puts both service directories on sys.path)
+import user_service_pb2
+import user_service_pb2_grpc
+
+# One benchmark per operation. Each factory gets the running services and
+# returns call(i), which performs request number i and raises if it failed.
+# Calls run concurrently from several threads; gRPC and WebSocket connections
+# are kept per thread and reused. The development server closes every HTTP
+# connection after its response.
+
+
+class HttpClient:
+    # With in_process set, requests go straight to the WSGI app through
+    # Flask's test client rather than over a socket. The allocation pass uses
+    # it: after every response the development server reads the socket with a
+    # 10 MB buffer, which would swamp what the service itself allocates.
+    in_process = False
+
+    def __init__(self, service):
+        self.port = service.http_port
+        self.app = service.app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None, expect=200):
+        if HttpClient.in_process:
+            response = self.app.test_client().open(path, method=method, json=body, headers=headers)
+            status, data = response.status_code, response.get_data()
+        else:
+            status, data = self._send(method, path, body, headers)
+        if status != expect:
+            raise RuntimeError(f'{method} {path} returned {status}: {data[:200]!r}')
+        return data
+
+    def _send(self, method, path, body, headers):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+def user_status(services, args):
+    client = HttpClient(services.user)
+    return lambda i: client.request('GET', '/status')
+
+
+def user_get_user(services, args):
+    # Profile reads, all served from the profile cache
+    client = HttpClient(services.user)
+    services.user.module.profile_cache.get_many([f'user{i}' for i in range(args.users)])
+    return lambda i: client.request('GET', f'/users/user{i % args.users}')
+
+
+def user_login(services, args):
+    client = HttpClient(services.user)
+    return lambda i: client.request('POST', '/login', {'username': f'user{i % args.users}', 'password': 'password'})
+
+
+def user_validate_session(services, args):
+    client = HttpClient(services.user)
+    tokens = [services.user.module.sessions.create(f'id{i}', f'user{i}') for i in range(args.users)]
+    return lambda i: client.request('GET', '/sessions/validate',
+                                    headers={'Authorization': f'Bearer {tokens[i % len(tokens)]}'})
+
+
+def user_grpc_get_user(services, args):
+    channel = grpc.insecure_channel(f'localhost:{services.user.grpc_port}')
+    stub = user_service_pb2_grpc.UserServiceStub(channel)
+
+    def call(i):
+        response = stub.GetUser(user_service_pb2.GetUserRequest(username=f'user{i % args.users}'), timeout=30)
+        if not response.found:
+            raise RuntimeError(f'GetUser user{i % args.users}: {response.message}')
+    return call
+
+
+def finance_status(services, args):
+    client = HttpClient(services.finance)
+    return lambda i: client.request('GET', '/status')
+
+
+def finance_create_transaction(services, args):
+    client = HttpClient(services.finance)
+    user_ids = [str(user_id) for user_id in services.finance.user_ids]
+    return lambda i: client.request('POST', '/transactions', {
+        'user_id': user_ids[i % len(user_ids)], 'amount': 10, 'transaction_type': 'expense', 'description': 'bench'
+    }, expect=201)
+
+
+def finance_get_transactions(services, args):
+    client = HttpClient(services.finance)
+    user_ids = [str(user_id) for user_id in services.finance.user_ids]
+    return lambda i: client.request('GET', f'/transactions/{user_ids[i % len(user_ids)]}?limit=20')
+
+
+def finance_summary(services, args):
+    client = HttpClient(services.finance)
+    user_ids = [str(user_id) for user_id in services.finance.user_ids]
+    # Every user gets a summary first, so none of the reads is a 404
+    for user_id in user_ids:
+        client.request('POST', '/transactions', {'user_id': user_id, 'amount': 1, 'transaction_type': 'income'},
+                       expect=201)
+    return lambda i: client.request('GET', f'/transactions/{user_ids[i % len(user_ids)]}/summary')
+
+
+def finance_ws_contribute(services, args):
+    # Every thread keeps a socket that joined a group once; a call is one
+    # contribute and its confirmation. Group updates pushed in between are
+    # skipped.
+    local = threading.local()
+    members = iter(range(1 << 30))
+    lock = threading.Lock()
+    sockets = []
+
+    def socket():
+        websocket = getattr(local, 'websocket', None)
+        if websocket is None:
+            with lock:
+                member = next(members)
+            websocket = local.websocket = connect(f'ws://127.0.0.1:{services.finance.websocket_port}')
+            with lock:
+                sockets.append(websocket)
+            username, group_name = f'user{member % args.users}', f'group{member % args.groups}'
+            websocket.send(json.dumps({'event': 'join', 'username': username, 'group_name': group_name}))
+            reply = websocket.recv(timeout=30)
+            if 'joined' not in reply:
+                raise RuntimeError(reply)
+        return websocket
+
+    def call(i):
+        websocket = socket()
+        websocket.send(json.dumps({'event': 'contribute', 'amount': 1}))
+        while True:
+            reply = websocket.recv(timeout=30)
+            if not reply.startswith('{'):
+                break
+        if 'contributed' not in reply:
+            raise RuntimeError(reply)
+
+    def close():
+        for websocket in sockets:
+            websocket.close()
+
+    call.close = close
+    return call
+
+
+SCENARIOS = {
+    'user.status': user_status,
+    'user.get_user': user_get_user,
+    'user.login': user_login,
+    'user.validate_session': user_validate_session,
+    'user.grpc_get_user': user_grpc_get_user,
+    'finance.status': finance_status,
+    'finance.create_transaction': finance_create_transaction,
+    'finance.get_transactions': finance_get_transactions,
+    'finance.summary': finance_summary,
+    'finance.ws_contribute': finance_ws_contribute,
+}
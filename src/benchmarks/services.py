@@ -0,0 +1,223 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+# Both services, loaded into this process with their Mongo and Redis replaced
+# by stand-ins (mongomock and fakeredis) or by local servers, and served on
+# real sockets: Werkzeug for REST, the service's own gRPC server, and the
+# FinanceService WebSocket handler on its own event loop.
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER_SERVICE = os.path.join(SRC, 'UserService')
+FINANCE_SERVICE = os.path.join(SRC, 'FinanceService')
+
+# Both services keep their helpers in modules named differently, so their
+# directories can share sys.path; only app.py clashes and is loaded under
+# these names (tracing.py and user_client.py are in both too, but the copies
+# are identical)
+for directory in (USER_SERVICE, FINANCE_SERVICE):
+    if directory not in sys.path:
+        sys.path.append(directory)
+
+from bench_support import mongo_database  # noqa: E402 (FinanceService)
+
+
+class LockedCursor:
+    # Cursor whose results are read under the collection's lock; sort(),
+    # limit() and the like chain as usual
+    def __init__(self, cursor, lock):
+        self._cursor = cursor
+        self._lock = lock
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return call
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._cursor))
+
+
+class StandInCollection:
+    # mongomock collection shared by request threads: it isn't thread-safe,
+    # so every call holds one lock, after sleeping for the simulated round
+    # trip outside of it
+    def __init__(self, collection, latency):
+        self.collection = collection
+        self.latency = latency
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                result = attr(*args, **kwargs)
+            if name in ('find', 'aggregate'):
+                return LockedCursor(result, self._lock)
+            return result
+        return call
+
+
+def standin_collection(db, name, latency_ms, mongo_uri=None):
+    # A real server is thread-safe and has its own round-trip time
+    if mongo_uri:
+        return db[name]
+    return StandInCollection(db[name], latency_ms / 1000.0)
+
+
+def load_app(name, directory):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(directory, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def redis_client(redis_url=None):
+    if redis_url:
+        import redis
+        return redis.Redis.from_url(redis_url)
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("The local Redis stand-in needs fakeredis: pip install -r src/UserService/requirements-dev.txt")
+    return fakeredis.FakeRedis()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve_http(wsgi_app):
+    server = make_server('127.0.0.1', 0, wsgi_app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_user_service(args):
+    from hashing import PasswordHasher
+    from sessions import SessionStore
+
+    user_app = load_app('user_app', USER_SERVICE)
+    logging.getLogger().setLevel(logging.WARNING)
+    users = mongo_database('bench_users', args.mongo_uri)['users']
+    users.drop()
+    # Logins are benchmarked with a cheap hash on the request thread and no
+    # admission limit; the hashing pool has its own benchmark (bench_hashing.py)
+    user_app.password_hasher = PasswordHasher(method=args.hash_method, workers=0, max_pending=1 << 20)
+    password = user_app.password_hasher.hash('password')
+    users.insert_many([
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': password} for i in range(args.users)
+    ])
+    user_app.mongo = SimpleNamespace(db=SimpleNamespace(users=standin_collection(
+        users.database, 'users', args.latency_ms, args.mongo_uri
+    )))
+
+    cache = redis_client(args.redis_url)
+    cache.flushdb()
+    user_app.cache = cache
+    user_app.profile_cache.redis = cache
+    user_app.sessions = SessionStore(cache)
+
+    http = serve_http(user_app.app)
+    grpc_port = free_port()
+    grpc_server = user_app.create_grpc_server(grpc_port)
+    grpc_server.start()
+    return SimpleNamespace(module=user_app, app=user_app.app, http_port=http.server_port, grpc_port=grpc_port,
+                           stop=lambda: (http.shutdown(), grpc_server.stop(None)))
+
+
+def start_finance_service(args):
+    import async_mongo
+    import websockets
+    from bson import ObjectId
+    from contributions import ContributionEngine
+
+    finance_app = load_app('finance_app', FINANCE_SERVICE)
+    finance_db = mongo_database('bench_finances', args.mongo_uri)
+    user_db = mongo_database('bench_finance_users', args.mongo_uri)
+    for db in (finance_db, user_db):
+        for name in db.list_collection_names():
+            db[name].drop()
+    user_ids = [ObjectId() for _ in range(args.users)]
+    user_db['users'].insert_many([{'_id': user_ids[i], 'username': f'user{i}'} for i in range(args.users)])
+    finance_db['groups'].insert_many([
+        {'group_name': f'group{i}', 'current_amount': 0} for i in range(args.groups)
+    ])
+    finance_db['transactions'].insert_many([
+        {'user_id': user_ids[i % args.users], 'amount': i, 'transaction_type': 'expense', 'description': f'item {i}'}
+        for i in range(args.users * 5)
+    ])
+
+    def collection(db, name):
+        return standin_collection(db, name, args.latency_ms, args.mongo_uri)
+
+    finance_app.contributions_collection = collection(finance_db, 'transactions')
+    finance_app.groups_collection = collection(finance_db, 'groups')
+    finance_app.summaries_collection = collection(finance_db, 'summaries')
+    finance_app.rollups_collection = collection(finance_db, 'rollups')
+    finance_app.users_collection = collection(user_db, 'users')
+    finance_app.async_contributions = async_mongo.AsyncCollection(finance_app.contributions_collection)
+    finance_app.async_groups = async_mongo.AsyncCollection(finance_app.groups_collection)
+    finance_app.async_summaries = async_mongo.AsyncCollection(finance_app.summaries_collection)
+    finance_app.async_rollups = async_mongo.AsyncCollection(finance_app.rollups_collection)
+    finance_app.async_users = async_mongo.AsyncCollection(finance_app.users_collection)
+    finance_app.contribution_engine = ContributionEngine(
+        finance_app.async_contributions, finance_app.async_groups, finance_app.async_summaries,
+        finance_app.async_rollups
+    )
+
+    http = serve_http(finance_app.app)
+
+    # The WebSocket server on its own loop and thread, as run_websocket_server
+    # runs it
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    ws = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(finance_app.group_rooms.start())
+        ws['server'] = loop.run_until_complete(
+            websockets.serve(finance_app.group_saving_goal_handler, '127.0.0.1', 0,
+                             **finance_app.websocket_server_options())
+        )
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+
+    def stop():
+        http.shutdown()
+        loop.call_soon_threadsafe(ws['server'].close)
+
+    return SimpleNamespace(module=finance_app, app=finance_app.app, http_port=http.server_port,
+                           websocket_port=ws['server'].sockets[0].getsockname()[1],
+                           user_ids=user_ids, stop=stop)
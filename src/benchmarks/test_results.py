@@ -0,0 +1,35 @@
+import unittest
+
+import results
+
+
+def run(**scenarios):
+    return {'environment': {'cpus': 1}, 'scenarios': scenarios}
+
+
+class TestResults(unittest.TestCase):
+    def test_summarize(self):
+        summary = results.summarize([i / 1000.0 for i in range(1, 101)], elapsed=2.0, errors=3)
+        self.assertEqual((summary['requests'], summary['errors'], summary['throughput']), (100, 3, 50.0))
+        self.assertAlmostEqual(summary['p50_ms'], 50.0)
+        self.assertAlmostEqual(summary['p95_ms'], 95.0)
+        self.assertAlmostEqual(summary['p99_ms'], 99.0)
+
+    def test_compare_flags_regressions_past_the_threshold(self):
+        baseline = run(a={'throughput': 1000, 'p99_ms': 10.0, 'alloc_peak_kib': 20.0},
+                       b={'throughput': 1000, 'p99_ms': 10.0})
+        current = run(a={'throughput': 850, 'p99_ms': 11.5, 'alloc_peak_kib': 30.0},
+                      b={'throughput': 700, 'p99_ms': 5.0},
+                      c={'throughput': 1.0})
+        regressions = results.compare(current, baseline, threshold=0.2)
+        self.assertEqual(regressions, [('a', 'alloc_peak_kib', 20.0, 30.0), ('b', 'throughput', 1000, 700)])
+        self.assertEqual(results.compare(current, baseline, threshold=0.6), [])
+
+    def test_environment_differences(self):
+        baseline = run()
+        current = {'environment': {'cpus': 4, 'python': '3.11.7'}, 'scenarios': {}}
+        self.assertEqual(results.environment_differences(current, baseline), [('cpus', 1, 4)])
+
+
+if __name__ == '__main__':
+    unittest.main()